@@ -1,12 +1,55 @@
-from django.core.cache import cache
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import models
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from account.models import Member
+from utils.bloom import BloomFilter
+from utils.caches import CacheInvalidationBus, LocalLRUCache, NamespacedCache
+
+logger = logging.getLogger(__name__)
 
 
 class TokenBlacklistCache:
-    """Token 黑名單快取管理"""
+    """
+    Token 黑名單快取管理
+
+    Redis 上每個 jti 一個 key（實際判斷依據），另以 ZSET 記錄 jti 與過期時間。
+    每個 process 維護一份黑名單的 Bloom filter：
+    - 每 SYNC_INTERVAL 秒以 ZRANGEBYSCORE 拉取新增的 jti（delta），每 REBUILD_INTERVAL 重建一次以移除過期的 jti
+    - 新增黑名單時透過 CacheInvalidationBus 通知所有 process 立即加入 filter
+    驗證 token 時只有 Bloom filter 命中才需要查詢 Redis；無法同步時退回每次查詢 Redis。
+
+    ZSET 上線前加入的 jti 只有 per-jti key，不在 ZSET 中。INDEX_READY_KEY 記錄 ZSET 從何時起
+    涵蓋所有黑名單：第一次同步時設為 now + CACHE_TIMEOUT（舊的 key 屆時都已過期），
+    執行 `python manage.py backfill_token_blacklist_index` 後提前為 backfill 開始的時間；
+    在此之前 Bloom filter 未命中仍會查詢 per-jti key。
+    """
 
     # Token 在黑名單中的存活時間 (24小時，與 access token 過期時間一致)
     CACHE_TIMEOUT = 60 * 60 * 24
     CACHE_KEY_PATTERN = 'token_blacklist:{token_jti}'
+    INDEX_KEY = 'token_blacklist_index'  # ZSET: jti -> 過期時間（unix timestamp）
+    INDEX_READY_KEY = 'token_blacklist_index:ready_at'  # ZSET 涵蓋所有黑名單的時間
+    INDEX_RETRIES = 2
+    LOCAL_NAMESPACE = 'token_blacklist'
+    REBUILD_INTERVAL = 60 * 60
+    CLOCK_SKEW = 60  # delta 拉取時往前多取的秒數，容忍各主機時間差
+
+    store = NamespacedCache(LOCAL_NAMESPACE, serializer='json')
+
+    _lock = threading.Lock()
+    _bloom = None
+    _synced_score = 0  # 已同步到的最大過期時間
+    _synced_at = 0
+    _rebuilt_at = 0
+    _index_ready_at = float('inf')
+    _pid = None
 
     @classmethod
     def _compose_cache_key(cls, token_jti: str) -> str:
@@ -18,11 +61,52 @@ class TokenBlacklistCache:
         """
         將 token 加入黑名單
 
+        先寫入 ZSET 再寫入 per-jti key，Bloom filter 不會漏掉已寫入的 jti；
+        ZSET 重試後仍失敗時將 ZSET 標記為未涵蓋所有黑名單，Bloom filter 未命中時退回查詢 per-jti key。
+
         Args:
             token_jti: JWT token 的 jti (JWT ID) claim
         """
+        cls._index_token(token_jti)
         cache_key = cls._compose_cache_key(token_jti)
-        cache.set(cache_key, True, cls.CACHE_TIMEOUT)
+        cls.store.set(cache_key, True, cls.CACHE_TIMEOUT)
+
+        CacheInvalidationBus.publish(cls.LOCAL_NAMESPACE, token_jti)
+
+    @classmethod
+    def _index_token(cls, token_jti: str) -> None:
+        for attempt in range(1, cls.INDEX_RETRIES + 1):
+            try:
+                now = time.time()
+                pipeline = get_redis_connection(settings.DEFAULT_ALIAS).pipeline()
+                pipeline.zadd(cls.INDEX_KEY, {token_jti: now + cls.CACHE_TIMEOUT})
+                pipeline.zremrangebyscore(cls.INDEX_KEY, '-inf', now)
+                pipeline.expire(cls.INDEX_KEY, cls.CACHE_TIMEOUT)
+                pipeline.execute()
+                return
+            except NotImplementedError:
+                return  # 非 Redis backend 沒有 Bloom filter，只以 per-jti key 判斷
+            except RedisError as e:
+                logger.warning(
+                    f"Failed to index blacklisted token {token_jti} "
+                    f"(attempt {attempt}): {e}"
+                )
+                if attempt == cls.INDEX_RETRIES:
+                    cls._mark_index_not_ready()
+
+    @classmethod
+    def _mark_index_not_ready(cls) -> None:
+        """
+        ZSET 漏掉的 jti 在 CACHE_TIMEOUT 後才會過期，在此之前 ZSET 不涵蓋所有黑名單：
+        目前的 process 立即停用 Bloom filter 的判斷，並延後 INDEX_READY_KEY 讓其他 process 同步後也停用
+        """
+        cls._index_ready_at = float('inf')
+        try:
+            get_redis_connection(settings.DEFAULT_ALIAS).set(
+                cls.INDEX_READY_KEY, time.time() + cls.CACHE_TIMEOUT
+            )
+        except (RedisError, NotImplementedError) as e:
+            logger.error(f"Failed to mark token blacklist index as not ready: {e}")
 
     @classmethod
     def is_token_blacklisted(cls, token_jti: str) -> bool:
@@ -35,8 +119,16 @@ class TokenBlacklistCache:
         Returns:
             bool: True 如果 token 在黑名單中
         """
+        bloom = cls._get_local_filter()
+        if (
+            bloom is not None
+            and time.time() >= cls._index_ready_at
+            and token_jti not in bloom
+        ):
+            return False
+
         cache_key = cls._compose_cache_key(token_jti)
-        return cache.get(cache_key, False)
+        return cls.store.get(cache_key, False)
 
     @classmethod
     def remove_token_from_blacklist(cls, token_jti: str) -> None:
@@ -47,4 +139,169 @@ class TokenBlacklistCache:
             token_jti: JWT token 的 jti (JWT ID) claim
         """
         cache_key = cls._compose_cache_key(token_jti)
-        cache.delete(cache_key)
+        cls.store.delete(cache_key)
+        try:
+            get_redis_connection(settings.DEFAULT_ALIAS).zrem(cls.INDEX_KEY, token_jti)
+        except (RedisError, NotImplementedError) as e:
+            logger.warning(f"Failed to unindex blacklisted token {token_jti}: {e}")
+
+    @classmethod
+    def _get_local_filter(cls):
+        """
+        取得目前 process 的 Bloom filter，超過 SYNC_INTERVAL 時先與 Redis 同步
+
+        Returns:
+            BloomFilter or None: None 表示無法同步，需直接查詢 Redis
+        """
+        CacheInvalidationBus.ensure_listener()
+        pid = os.getpid()
+        if (
+            cls._pid == pid
+            and time.monotonic() - cls._synced_at < settings.JWT_BLACKLIST_SYNC_INTERVAL
+        ):
+            return cls._bloom
+
+        with cls._lock:
+            now = time.monotonic()
+            if (
+                cls._pid == pid
+                and now - cls._synced_at < settings.JWT_BLACKLIST_SYNC_INTERVAL
+            ):
+                return cls._bloom
+            try:
+                client = get_redis_connection(settings.DEFAULT_ALIAS)
+                cls._sync_index_ready_at(client)
+                if (
+                    cls._pid != pid
+                    or cls._bloom is None
+                    or now - cls._rebuilt_at >= cls.REBUILD_INTERVAL
+                ):
+                    cls._rebuild_filter(client)
+                else:
+                    cls._pull_delta(client)
+            except (RedisError, NotImplementedError) as e:
+                logger.warning(f"Failed to sync token blacklist filter: {e}")
+                cls._bloom = None
+                cls._index_ready_at = float('inf')
+            cls._pid = pid
+            cls._synced_at = now
+        return cls._bloom
+
+    @classmethod
+    def _sync_index_ready_at(cls, client):
+        """讀取 ZSET 涵蓋所有黑名單的時間，第一次同步時（上線後）設為 now + CACHE_TIMEOUT"""
+        pipeline = client.pipeline()
+        pipeline.set(cls.INDEX_READY_KEY, time.time() + cls.CACHE_TIMEOUT, nx=True)
+        pipeline.get(cls.INDEX_READY_KEY)
+        _, ready_at = pipeline.execute()
+        cls._index_ready_at = float(ready_at)
+
+    @classmethod
+    def mark_index_ready(cls, ready_at: float) -> None:
+        """
+        backfill 完成後，標記 ZSET 自 ready_at 起涵蓋所有黑名單
+
+        Args:
+            ready_at: backfill 開始的時間（unix timestamp）
+        """
+        client = get_redis_connection(settings.DEFAULT_ALIAS)
+        current = client.get(cls.INDEX_READY_KEY)
+        if current is None or float(current) > ready_at:
+            client.set(cls.INDEX_READY_KEY, ready_at)
+
+    @classmethod
+    def _rebuild_filter(cls, client):
+        """以目前所有未過期的 jti 重建 Bloom filter"""
+        now = time.time()
+        entries = client.zrangebyscore(cls.INDEX_KEY, now, '+inf', withscores=True)
+        bloom = BloomFilter(
+            max(settings.JWT_BLACKLIST_BLOOM_CAPACITY, len(entries) * 2),
+            error_rate=settings.JWT_BLACKLIST_BLOOM_ERROR_RATE,
+        )
+        for token_jti, _ in entries:
+            bloom.add(token_jti.decode())
+        cls._bloom = bloom
+        cls._synced_score = max((score for _, score in entries), default=now)
+        cls._rebuilt_at = time.monotonic()
+
+    @classmethod
+    def _pull_delta(cls, client):
+        """拉取上次同步之後新增的 jti"""
+        entries = client.zrangebyscore(
+            cls.INDEX_KEY, cls._synced_score - cls.CLOCK_SKEW, '+inf', withscores=True
+        )
+        for token_jti, score in entries:
+            cls._bloom.add(token_jti.decode())
+            cls._synced_score = max(cls._synced_score, score)
+
+    @classmethod
+    def _on_blacklisted(cls, token_jti):
+        if token_jti is None:
+            # 重新訂閱期間可能漏接通知，下次檢查時重建
+            cls._rebuilt_at = 0
+            cls._synced_at = 0
+        elif cls._bloom is not None:
+            cls._bloom.add(token_jti)
+
+
+CacheInvalidationBus.subscribe(
+    TokenBlacklistCache.LOCAL_NAMESPACE, TokenBlacklistCache._on_blacklisted
+)
+
+
+class MemberAuthStatusCache:
+    """
+    Stateless JWT 認證用的 member 狀態快取（process 內，短 TTL）
+
+    保存 Member 的所有欄位與 User 的 is_active，讓 stateless 認證建立的 Member
+    不含 deferred 欄位（view 讀取 member 欄位時不會逐欄 lazy load），
+    Member 或 User 儲存、刪除時透過 CacheInvalidationBus 通知所有 process 清除。
+    """
+
+    LOCAL_NAMESPACE = 'member_auth_status'
+    MEMBER_FIELDS = tuple(
+        field.attname for field in Member._meta.concrete_fields if not field.primary_key
+    )
+    local_cache = LocalLRUCache(
+        maxsize=settings.JWT_MEMBER_STATUS_CACHE_SIZE,
+        ttl=settings.JWT_MEMBER_STATUS_CACHE_TIMEOUT,
+    )
+
+    @classmethod
+    def get_status(cls, member_id: int):
+        """
+        取得 member 的認證狀態，local cache 未命中時查詢 DB
+
+        Args:
+            member_id: Member ID
+
+        Returns:
+            dict or None: {Member 欄位 attname: 值, 'is_active': bool}，
+            member 不存在時回傳 None
+        """
+        CacheInvalidationBus.ensure_listener()
+        status = cls.local_cache.get(member_id)
+        if status is None:
+            status = (
+                Member.objects.filter(id=member_id)
+                .values(*cls.MEMBER_FIELDS, is_active=models.F('user__is_active'))
+                .first()
+            ) or {}
+            cls.local_cache.set(member_id, status)
+        return status or None
+
+    @classmethod
+    def invalidate(cls, member_id: int) -> None:
+        CacheInvalidationBus.publish(cls.LOCAL_NAMESPACE, member_id)
+
+    @classmethod
+    def _on_invalidate(cls, member_id):
+        if member_id is None:
+            cls.local_cache.clear()
+        else:
+            cls.local_cache.delete(member_id)
+
+
+CacheInvalidationBus.subscribe(
+    MemberAuthStatusCache.LOCAL_NAMESPACE, MemberAuthStatusCache._on_invalidate
+)
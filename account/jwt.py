@@ -1,12 +1,14 @@
 from datetime import timedelta
 
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS
 from rest_framework import authentication
 from rest_framework.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 
-from account.caches import TokenBlacklistCache
+from account.caches import MemberAuthStatusCache, TokenBlacklistCache
 from account.models import Member
 
 # JWT expires in seconds (1 day)
@@ -70,6 +72,9 @@ class JWTService:
             if not member_id:
                 return False, 'Token 中缺少 member 資訊'
 
+            if settings.JWT_STATELESS_AUTH:
+                return JWTService._build_member_from_claims(member_id)
+
             try:
                 member = Member.objects.select_related('user').get(id=member_id)
             except Member.DoesNotExist:
@@ -86,6 +91,42 @@ class JWTService:
         except Exception as e:
             return False, f"Token 驗證失敗: {str(e)}"
 
+    @staticmethod
+    def _build_member_from_claims(member_id):
+        """
+        Stateless 模式：以 token 中的 member_id 與 MemberAuthStatusCache 建立
+        Member / User instance，不查詢 DB
+
+        Member 載入所有欄位；User 只載入 id / is_active，其餘欄位（username 等）
+        讀取時會逐欄查詢 DB，view 應透過 request.user.member 取得資料，不讀取 User 的欄位。
+
+        Args:
+            member_id: token claim 中的 member_id
+
+        Returns:
+            tuple: (is_valid: bool, result: Member instance or error message)
+        """
+        status = MemberAuthStatusCache.get_status(member_id)
+        if not status:
+            return False, 'Member 不存在'
+        if not status['is_active']:
+            return False, '用戶已被停用'
+
+        # role 以狀態快取為準（token 內的 role claim 可能在簽發後被修改）
+        member = Member.from_db(
+            DEFAULT_DB_ALIAS,
+            ['id', *MemberAuthStatusCache.MEMBER_FIELDS],
+            [
+                member_id,
+                *(status[name] for name in MemberAuthStatusCache.MEMBER_FIELDS),
+            ],
+        )
+        user = User.from_db(
+            DEFAULT_DB_ALIAS, ['id', 'is_active'], [status['user_id'], True]
+        )
+        user.member = member
+        return True, member
+
     @staticmethod
     def refresh_access_token(refresh_token):
         """
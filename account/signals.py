@@ -0,0 +1,68 @@
+"""
+Account app signals
+
+Member / User 變更時清除 stateless JWT 認證使用的狀態快取
+（transaction commit 後才清除，避免其他 process 在 commit 前讀回舊狀態再次快取）
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from account.caches import MemberAuthStatusCache
+from account.models import Member
+
+
+def _invalidate_on_commit(member_ids):
+    member_ids = list(member_ids)
+    if not member_ids:
+        return
+
+    def invalidate():
+        for member_id in member_ids:
+            MemberAuthStatusCache.invalidate(member_id)
+
+    transaction.on_commit(invalidate)
+
+
+def _invalidate_user_members_on_commit(user_id):
+    _invalidate_on_commit(
+        Member.objects.filter(user_id=user_id).values_list('id', flat=True)
+    )
+
+
+@receiver(post_save, sender=Member)
+@receiver(post_delete, sender=Member)
+def clear_member_auth_status_on_member_change(sender, instance, **kwargs):
+    _invalidate_on_commit([instance.id])
+
+
+@receiver(post_init, sender=User)
+def track_user_is_active(sender, instance, **kwargs):
+    """記錄載入時的 is_active（deferred 時不記錄，避免額外查詢）"""
+    instance._loaded_is_active = instance.__dict__.get('is_active')
+
+
+@receiver(post_save, sender=User)
+def clear_member_auth_status_on_user_change(
+    sender, instance, created, update_fields=None, **kwargs
+):
+    """
+    User 停用 / 啟用（is_active 改變）時，對應的 member 需重新檢查
+
+    只更新其他欄位（例如登入時的 last_login）時不查詢 member
+    """
+    if created:
+        return
+    if update_fields is not None and 'is_active' not in update_fields:
+        return
+    if instance._loaded_is_active == instance.is_active:
+        return
+    instance._loaded_is_active = instance.is_active
+    _invalidate_user_members_on_commit(instance.id)
+
+
+@receiver(pre_delete, sender=User)
+def clear_member_auth_status_on_user_delete(sender, instance, **kwargs):
+    """User 刪除時（member 仍存在時先查詢），commit 後清除對應 member 的狀態"""
+    _invalidate_user_members_on_commit(instance.id)
@@ -1,3 +1,136 @@
-from django.test import TestCase
+import logging
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from redis.exceptions import RedisError
+from rest_framework.test import APIClient
+
+from account.caches import MemberAuthStatusCache, TokenBlacklistCache
+from account.jwt import JWTService
+from account.models import Member
+
+logger = logging.getLogger(__name__)
+
+
+class JWTStatelessAuthBenchmarkTests(TestCase):
+    REQUEST_COUNT = 100
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = Member.objects.create(email='member@example.com', name='member')
+
+    def setUp(self):
+        MemberAuthStatusCache.local_cache.clear()
+        self.client = APIClient()
+        access_token = JWTService.create_tokens(self.member)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access_token}")
+        self.url = reverse('playlist:playlist-list')
+
+    def _benchmark(self):
+        # 第一次 request 填入狀態快取
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        query_count = len(queries)
+
+        start = time.perf_counter()
+        for _ in range(self.REQUEST_COUNT):
+            self.client.get(self.url)
+        requests_per_second = self.REQUEST_COUNT / (time.perf_counter() - start)
+        return query_count, requests_per_second
+
+    def test_benchmark_playlist_list(self):
+        with override_settings(JWT_STATELESS_AUTH=False):
+            db_query_count, db_rps = self._benchmark()
+        with override_settings(JWT_STATELESS_AUTH=True):
+            stateless_query_count, stateless_rps = self._benchmark()
+
+        logger.info(
+            f"PlaylistViewSet.list: db auth {db_rps:.0f} req/s "
+            f"({db_query_count} queries), stateless auth {stateless_rps:.0f} req/s "
+            f"({stateless_query_count} queries)"
+        )
+        # Member + User 查詢被狀態快取取代
+        self.assertEqual(db_query_count - stateless_query_count, 1)
+
+    @override_settings(JWT_STATELESS_AUTH=True)
+    def test_deactivated_user_is_rejected(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+        user = self.member.user
+        user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+
+        self.assertNotEqual(self.client.get(self.url).status_code, 200)
+
+
+class MemberAuthStatusInvalidationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = Member.objects.create(email='member@example.com', name='member')
+
+    def setUp(self):
+        MemberAuthStatusCache.local_cache.clear()
+
+    def test_last_login_update_does_not_invalidate(self):
+        user = self.member.user
+        with self.captureOnCommitCallbacks() as callbacks, self.assertNumQueries(1):
+            user.save(update_fields=['last_login'])
+        self.assertEqual(callbacks, [])
+
+    def test_deactivation_invalidates_after_commit(self):
+        MemberAuthStatusCache.get_status(self.member.id)
+        user = User.objects.get(id=self.member.user_id)
+        user.is_active = False
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            user.save()
+            self.assertTrue(
+                MemberAuthStatusCache.get_status(self.member.id)['is_active']
+            )
+
+        for callback in callbacks:
+            callback()
+        self.assertFalse(MemberAuthStatusCache.get_status(self.member.id)['is_active'])
+
+    @override_settings(JWT_STATELESS_AUTH=True)
+    def test_stateless_member_has_no_deferred_fields(self):
+        access_token = JWTService.create_tokens(self.member)['access_token']
+        MemberAuthStatusCache.get_status(self.member.id)
+
+        with self.assertNumQueries(0):
+            is_valid, member = JWTService.validate_token(access_token)
+            self.assertTrue(is_valid)
+            self.assertEqual(member.get_deferred_fields(), set())
+            self.assertEqual(member.name, 'member')
+
+
+class TokenBlacklistIndexFailureTests(TestCase):
+    def setUp(self):
+        for name in ('_bloom', '_pid', '_synced_at', '_index_ready_at'):
+            self.addCleanup(
+                setattr, TokenBlacklistCache, name, getattr(TokenBlacklistCache, name)
+            )
+
+    def test_index_failure_falls_back_to_per_token_key(self):
+        client = mock.MagicMock()
+        client.pipeline.return_value.execute.side_effect = RedisError('down')
+
+        with mock.patch('account.caches.get_redis_connection', return_value=client):
+            TokenBlacklistCache.add_token_to_blacklist('unindexed-jti')
+
+            self.assertEqual(TokenBlacklistCache._index_ready_at, float('inf'))
+            self.assertTrue(TokenBlacklistCache.is_token_blacklisted('unindexed-jti'))
+
+        key, ready_at = client.set.call_args.args
+        self.assertEqual(key, TokenBlacklistCache.INDEX_READY_KEY)
+        self.assertGreater(
+            ready_at, time.time() + TokenBlacklistCache.CACHE_TIMEOUT - 60
+        )
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import HistoryPlayLog, HistoryPlayLogContext
+from .models import HistoryPlayLog, HistoryPlayLogContext, HistoryPlayLogWatermark
 
 
 @admin.register(HistoryPlayLogContext)
@@ -18,3 +18,10 @@ class HistoryPlayLogAdmin(admin.ModelAdmin):
     search_fields = ('member__username', 'track__name')
     readonly_fields = ('played_at',)
     date_hierarchy = 'played_at'
+
+
+@admin.register(HistoryPlayLogWatermark)
+class HistoryPlayLogWatermarkAdmin(admin.ModelAdmin):
+    list_display = ('member', 'provider', 'last_played_at', 'updated_at')
+    list_filter = ('provider',)
+    readonly_fields = ('created_at', 'updated_at')
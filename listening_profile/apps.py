@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ListeningProfileConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'listening_profile'
+
+    def ready(self):
+        """Import signals when Django starts"""
+        import listening_profile.signals  # noqa: F401
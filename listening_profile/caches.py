@@ -0,0 +1,114 @@
+import logging
+from typing import Iterable, List, Set
+
+from django.conf import settings
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+
+class PlaylistContextFetchCache:
+    """
+    Playlist context 向 Spotify 取得 details 時的跨 batch 協調
+
+    - in-flight：以 SET NX 標記正在取得的 playlist，其他 batch（例如 sweep 與重送的 task）
+      遇到已標記的直接略過，同一個 playlist 同時只會請求一次；標記在處理完後刪除，
+      worker 中斷時在 IN_FLIGHT_TIMEOUT 後自動過期
+    - not found：404（Spotify 官方 / 演算法歌單）記錄 PLAYLIST_NOT_FOUND_CACHE_TIMEOUT 秒，
+      期間內不再向 Spotify 確認
+
+    Redis 無法連線時 fail open：視為沒有其他 batch 在處理、也沒有 404 紀錄。
+    """
+
+    IN_FLIGHT_TIMEOUT = 60 * 5
+
+    @staticmethod
+    def compose_in_flight_key(external_id: str) -> str:
+        return f"playlist_context_fetch:in_flight:{external_id}"
+
+    @staticmethod
+    def compose_not_found_key(external_id: str) -> str:
+        return f"playlist_context_fetch:not_found:{external_id}"
+
+    @classmethod
+    def claim(cls, external_ids: Iterable[str]) -> List[str]:
+        """
+        標記為 in-flight
+
+        Args:
+            external_ids: Playlist external ID 列表
+
+        Returns:
+            List[str]: 這次成功標記（由呼叫端負責取得）的 external ID
+        """
+        external_ids = list(external_ids)
+        if not external_ids:
+            return []
+        try:
+            pipeline = get_redis_connection(settings.DEFAULT_ALIAS).pipeline()
+            for external_id in external_ids:
+                pipeline.set(
+                    cls.compose_in_flight_key(external_id),
+                    1,
+                    nx=True,
+                    ex=cls.IN_FLIGHT_TIMEOUT,
+                )
+            claimed = pipeline.execute()
+        except (RedisError, NotImplementedError) as e:
+            logger.warning(f"Failed to claim playlist contexts: {e}")
+            return external_ids
+        return [
+            external_id
+            for external_id, acquired in zip(external_ids, claimed)
+            if acquired
+        ]
+
+    @classmethod
+    def release(cls, external_ids: Iterable[str]) -> None:
+        keys = [cls.compose_in_flight_key(external_id) for external_id in external_ids]
+        if not keys:
+            return
+        try:
+            get_redis_connection(settings.DEFAULT_ALIAS).delete(*keys)
+        except (RedisError, NotImplementedError) as e:
+            logger.warning(f"Failed to release playlist contexts: {e}")
+
+    @classmethod
+    def get_not_found(cls, external_ids: Iterable[str]) -> Set[str]:
+        """
+        Returns:
+            Set[str]: 已記錄為 404 的 external ID
+        """
+        external_ids = list(external_ids)
+        if not external_ids:
+            return set()
+        try:
+            values = get_redis_connection(settings.DEFAULT_ALIAS).mget(
+                [cls.compose_not_found_key(external_id) for external_id in external_ids]
+            )
+        except (RedisError, NotImplementedError) as e:
+            logger.warning(f"Failed to read playlist not found cache: {e}")
+            return set()
+        return {
+            external_id
+            for external_id, value in zip(external_ids, values)
+            if value is not None
+        }
+
+    @classmethod
+    def set_not_found(cls, external_ids: Iterable[str]) -> None:
+        external_ids = list(external_ids)
+        if not external_ids:
+            return
+        try:
+            pipeline = get_redis_connection(settings.DEFAULT_ALIAS).pipeline()
+            for external_id in external_ids:
+                pipeline.set(
+                    cls.compose_not_found_key(external_id),
+                    1,
+                    ex=settings.PLAYLIST_NOT_FOUND_CACHE_TIMEOUT,
+                )
+            pipeline.execute()
+        except (RedisError, NotImplementedError) as e:
+            logger.warning(f"Failed to write playlist not found cache: {e}")
@@ -5,10 +5,10 @@ from typing import TYPE_CHECKING, Dict, List
 from django.db import models
 
 from listening_profile.schemas import PlayLogSchemas
+from utils.db import bulk_upsert
 
 if TYPE_CHECKING:
     from account.models import Member
-    from listening_profile.models import HistoryPlayLog, HistoryPlayLogContext
     from provider.models import Provider
     from track.models import Track
 
@@ -18,56 +18,63 @@ class HistoryPlayLogManager(models.Manager):
         self,
         playlogs_data: List[PlayLogSchemas.CreateData],
         tracks_map: Dict[str, Track],
-        context_map: Dict[tuple, HistoryPlayLogContext],
+        context_map: Dict[tuple, int],
         member: Member,
         provider: Provider,
-    ) -> List[HistoryPlayLog]:
+    ) -> PlayLogSchemas.BulkCreateResult:
         """
         批量創建 PlayLogs（自動去重）
 
+        以單一 INSERT ... ON CONFLICT (member, track, provider, played_at) DO NOTHING
+        RETURNING 寫入，已存在的記錄由 DB 略過，不需先查詢、也不會因並行收集而衝突。
+
         :param playlogs_data: List[PlayLogSchemas.CreateData]
         :param tracks_map: {external_id: Track} from Track.objects.bulk_create_from_data()
-        :param context_map: {(type, external_id): HistoryPlayLogContext}
+        :param context_map: {(type, external_id): HistoryPlayLogContext id}
         :param member: Member instance
         :param provider: Provider instance
-        :return: 創建的 HistoryPlayLog 對象列表
+        :return: PlayLogSchemas.BulkCreateResult（新增的對象列表與略過筆數）
         """
-        # 1. 查詢已存在的記錄
-        played_at_list = [data.played_at for data in playlogs_data]
-        existing_keys = set(
-            self.filter(
-                member=member,
-                provider=provider,
-                played_at__in=played_at_list,
-            ).values_list('member_id', 'track_id', 'provider_id', 'played_at')
-        )
-
-        # 2. 過濾出不存在的
+        # 1. 建立 model 實例
         to_create = []
         for data in playlogs_data:
             track = tracks_map.get(data.track_external_id)
             if not track:
                 continue
 
-            key = (member.id, track.id, provider.id, data.played_at)
-            if key not in existing_keys:
-                # 從 context_map 取得 context
-                context_obj = None
-                if data.context_type and data.context_external_id:
-                    context_key = (data.context_type, data.context_external_id)
-                    context_obj = context_map.get(context_key)
+            # 從 context_map 取得 context
+            context_id = None
+            if data.context_type and data.context_external_id:
+                context_key = (data.context_type, data.context_external_id)
+                context_id = context_map.get(context_key)
 
-                to_create.append(
-                    self.model(
-                        member=member,
-                        track=track,
-                        provider=provider,
-                        played_at=data.played_at,
-                        context=context_obj,
-                    )
+            to_create.append(
+                self.model(
+                    member=member,
+                    track=track,
+                    provider=provider,
+                    played_at=data.played_at,
+                    context_id=context_id,
                 )
+            )
 
-        # 3. 批量創建並返回對象列表
-        created = self.bulk_create(to_create)
+        # 2. 寫入，已存在的由 ON CONFLICT DO NOTHING 略過
+        upserted = bulk_upsert(
+            self.model,
+            to_create,
+            unique_fields=['member', 'track', 'provider', 'played_at'],
+        )
+
+        # 3. 帶回已載入的 track / member / provider，避免呼叫端逐筆查詢
+        tracks_by_id = {track.id: track for track in tracks_map.values()}
+        created = []
+        for play_log, _ in upserted:
+            play_log.track = tracks_by_id[play_log.track_id]
+            play_log.member = member
+            play_log.provider = provider
+            created.append(play_log)
 
-        return created
+        return PlayLogSchemas.BulkCreateResult(
+            created=created,
+            skipped_count=len(to_create) - len(created),
+        )
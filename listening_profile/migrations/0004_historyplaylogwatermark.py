@@ -0,0 +1,51 @@
+# Generated by Django 5.2.7 on 2026-10-17 05:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('account', '0004_experimentgroup_alter_member_experiment_group'),
+        ('listening_profile', '0003_historyplaylogcontext_historyplaylog_context'),
+        ('provider', '0004_remove_providerproxyaccount_is_available_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoryPlayLogWatermark',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                ('last_played_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                (
+                    'member',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='play_log_watermarks',
+                        to='account.member',
+                    ),
+                ),
+                (
+                    'provider',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='play_log_watermarks',
+                        to='provider.provider',
+                    ),
+                ),
+            ],
+            options={
+                'unique_together': {('member', 'provider')},
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:17
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def mark_complete_contexts_done(apps, schema_editor):
+    """只有缺少 details 的 playlist context 需要補齊"""
+    HistoryPlayLogContext = apps.get_model('listening_profile', 'HistoryPlayLogContext')
+    HistoryPlayLogContext.objects.exclude(
+        Q(type='playlist') & (Q(details__isnull=True) | Q(details={}))
+    ).update(enrichment_status='done', enrichment_next_attempt_at=None)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('listening_profile', '0004_historyplaylogwatermark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historyplaylogcontext',
+            name='enrichment_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='historyplaylogcontext',
+            name='enrichment_next_attempt_at',
+            field=models.DateTimeField(
+                blank=True, default=django.utils.timezone.now, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name='historyplaylogcontext',
+            name='enrichment_status',
+            field=models.CharField(
+                choices=[
+                    ('pending', 'Pending'),
+                    ('done', 'Done'),
+                    ('failed', 'Failed'),
+                ],
+                default='pending',
+                max_length=10,
+            ),
+        ),
+        migrations.RunPython(
+            mark_complete_contexts_done, reverse_code=migrations.RunPython.noop
+        ),
+        migrations.AddIndex(
+            model_name='historyplaylogcontext',
+            index=models.Index(
+                condition=models.Q(('enrichment_status__in', ['pending', 'failed'])),
+                fields=['enrichment_next_attempt_at'],
+                name='history_context_enrichment_due',
+            ),
+        ),
+    ]
@@ -4,9 +4,10 @@ from account.models import Member
 from listening_profile.managers import HistoryPlayLogManager
 from provider.models import Provider
 from track.models import Track
+from utils.models import EnrichmentModel, EnrichmentQuerySet, enrichment_due_index
 
 
-class HistoryPlayLogContext(models.Model):
+class HistoryPlayLogContext(EnrichmentModel):
     class TypeOptions(models.TextChoices):
         PLAYLIST = ('playlist', 'Playlist')
         ALBUM = ('album', 'Album')
@@ -18,10 +19,13 @@ class HistoryPlayLogContext(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = EnrichmentQuerySet.as_manager()
+
     class Meta:
         unique_together = ('type', 'external_id')
         indexes = [
             models.Index(fields=['type', 'external_id']),
+            enrichment_due_index('history_context_enrichment_due'),
         ]
 
     def __str__(self):
@@ -54,3 +58,27 @@ class HistoryPlayLog(models.Model):
 
     def __str__(self):
         return f"{self.member} - {self.track} ({self.provider.platform}) @ {self.played_at}"
+
+
+class HistoryPlayLogWatermark(models.Model):
+    """
+    每個 member / provider 已收集到的最新播放時間（high-water mark）
+
+    播放記錄收集只需向 provider 請求 watermark 之後的資料
+    """
+
+    member = models.ForeignKey(
+        Member, on_delete=models.CASCADE, related_name='play_log_watermarks'
+    )
+    provider = models.ForeignKey(
+        Provider, on_delete=models.CASCADE, related_name='play_log_watermarks'
+    )
+    last_played_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('member', 'provider')
+
+    def __str__(self):
+        return f"{self.member} - {self.provider.code} @ {self.last_played_at}"
@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Optional
+from typing import Any, List, Optional
 
 
 class PlayLogSchemas:
@@ -14,3 +14,14 @@ class PlayLogSchemas:
         played_at: datetime
         context_type: Optional[str] = None  # 'playlist', 'album', 'artist'
         context_external_id: Optional[str] = None
+
+    @dataclass
+    class BulkCreateResult:
+        """批量寫入 HistoryPlayLog 的結果"""
+
+        created: List[Any]  # 這次新增的 HistoryPlayLog
+        skipped_count: int = 0  # 已存在而略過的筆數
+
+        @property
+        def inserted_count(self) -> int:
+            return len(self.created)
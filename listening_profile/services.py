@@ -1,9 +1,15 @@
 import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
 
+from listening_profile.caches import PlaylistContextFetchCache
 from listening_profile.models import HistoryPlayLogContext
 from provider.exceptions import ProviderException
+from utils.caches import CacheInvalidationBus, LocalLRUCache
+from utils.db import bulk_upsert
 
 logger = logging.getLogger(__name__)
 
@@ -11,62 +17,123 @@ logger = logging.getLogger(__name__)
 class HistoryPlayLogContextService:
     """處理 HistoryPlayLogContext 的建立和查詢"""
 
+    # (type, external_id) -> pk，context 建立後不會變動，熱門的 playlist / album 不必再查 DB
+    # transaction commit 後才寫入；context 刪除時由 signal 經 CacheInvalidationBus
+    # 通知所有 process 清除
+    CONTEXT_ID_CACHE_NAMESPACE = 'history_play_log_context_id'
+    _context_id_cache = LocalLRUCache(
+        maxsize=settings.PLAYLOG_CONTEXT_CACHE_SIZE,
+        ttl=settings.PLAYLOG_CONTEXT_CACHE_TIMEOUT,
+    )
+
+    @staticmethod
+    def invalidate_context_id(context_type, external_id):
+        """通知所有 process 清除 context id cache 中的 (type, external_id)"""
+        CacheInvalidationBus.publish(
+            HistoryPlayLogContextService.CONTEXT_ID_CACHE_NAMESPACE,
+            [context_type, external_id],
+        )
+
+    @staticmethod
+    def _on_context_id_invalidate(key):
+        """
+        :param key: [type, external_id]（經 JSON 傳遞），None 表示清空
+        """
+        cache = HistoryPlayLogContextService._context_id_cache
+        if key is None:
+            cache.clear()
+        else:
+            cache.delete(tuple(key))
+
     @staticmethod
     def bulk_get_or_create_contexts(context_data_list):
         """
         批次取得或建立 contexts（避免 N+1 查詢）
 
+        1. 先查 process 內的 LRU cache
+        2. 未命中的以 INSERT ... ON CONFLICT DO NOTHING RETURNING 建立，取回新建的 id
+        3. 已存在的依 type 分組，以 external_id IN (...) 查詢 id
+
         :param context_data_list: List of dict with 'type' and 'external_id'
-        :return: dict mapping (type, external_id) -> HistoryPlayLogContext instance
+        :return: dict mapping (type, external_id) -> HistoryPlayLogContext id
         """
         if not context_data_list:
             return {}
 
         # 收集所有 unique contexts
         unique_contexts = set()
-        contexts_to_create = []
-
         for context_data in context_data_list:
             context_type = context_data.get('type')
             external_id = context_data.get('external_id')
 
             if not context_type or not external_id:
                 continue
+            unique_contexts.add((context_type, external_id))
 
-            key = (context_type, external_id)
-            if key not in unique_contexts:
-                unique_contexts.add(key)
-                contexts_to_create.append(
-                    HistoryPlayLogContext(
-                        type=context_type,
-                        external_id=external_id,
-                    )
+        CacheInvalidationBus.ensure_listener()
+        cache = HistoryPlayLogContextService._context_id_cache
+        context_map = cache.get_many(unique_contexts)
+        missing_contexts = unique_contexts - context_map.keys()
+        if not missing_contexts:
+            return context_map
+
+        # 批次建立（已存在的不回傳），只有 playlist 需要補齊 details
+        created = bulk_upsert(
+            HistoryPlayLogContext,
+            [
+                HistoryPlayLogContext(
+                    type=context_type,
+                    external_id=external_id,
+                    enrichment_status=(
+                        HistoryPlayLogContext.EnrichmentStatusOptions.PENDING
+                        if context_type == HistoryPlayLogContext.TypeOptions.PLAYLIST
+                        else HistoryPlayLogContext.EnrichmentStatusOptions.DONE
+                    ),
                 )
+                for context_type, external_id in missing_contexts
+            ],
+            unique_fields=['type', 'external_id'],
+        )
+        found_map = {(ctx.type, ctx.external_id): ctx.id for ctx, _ in created}
 
-        # 批次建立（忽略已存在的）
-        if contexts_to_create:
-            HistoryPlayLogContext.objects.bulk_create(
-                contexts_to_create, ignore_conflicts=True
-            )
+        # 批次查詢已存在的 contexts（依 type 分組，每個 type 一個 IN 條件）
+        existing_contexts = missing_contexts - found_map.keys()
+        if existing_contexts:
+            external_ids_by_type = defaultdict(list)
+            for context_type, external_id in existing_contexts:
+                external_ids_by_type[context_type].append(external_id)
 
-        # 批次查詢所有相關的 contexts
-        context_map = {}
-        if unique_contexts:
             filters = models.Q()
-            for context_type, external_id in unique_contexts:
-                filters |= models.Q(type=context_type, external_id=external_id)
+            for context_type, external_ids in external_ids_by_type.items():
+                filters |= models.Q(type=context_type, external_id__in=external_ids)
 
-            existing_contexts = HistoryPlayLogContext.objects.filter(filters)
-            for ctx in existing_contexts:
-                context_map[(ctx.type, ctx.external_id)] = ctx
+            for (
+                ctx_id,
+                context_type,
+                external_id,
+            ) in HistoryPlayLogContext.objects.filter(filters).values_list(
+                'id', 'type', 'external_id'
+            ):
+                found_map[(context_type, external_id)] = ctx_id
 
+        # rollback 時新建的 id 不存在，commit 後才放入 cache
+        transaction.on_commit(lambda: cache.set_many(found_map))
+        context_map.update(found_map)
         return context_map
 
+    # 只需要 name / owner / public，不下載整份歌單（含前 100 首 tracks）
+    PLAYLIST_DETAIL_FIELDS = 'name,owner(display_name),public'
+
     @staticmethod
     def update_playlist_details(context_ids, api_interface):
         """
         更新 playlist context 的 details（批次處理，減少 API 呼叫次數）
 
+        以有限大小的 thread pool 並行請求；其他 batch 正在取得的 playlist 略過（維持 lease），
+        已記錄為 404 的 playlist 不再請求。
+        成功（含 404 的官方歌單）標記為 done；其他錯誤標記為 failed 並以指數退避延後下次嘗試，
+        授權失效 / rate limit 不計入失敗，等 sweep 的 lease 到期後再試。
+
         :param context_ids: List of HistoryPlayLogContext IDs
         :param api_interface: SpotifyAPIProviderInterface instance
         :return: List of updated context IDs
@@ -83,26 +150,86 @@ class HistoryPlayLogContextService:
         # 建立 external_id -> context 的 mapping
         context_map = {ctx.external_id: ctx for ctx in contexts}
 
-        # 批次呼叫 API 並建立 external_id -> playlist_data 的 mapping
-        playlist_data_map = {}
-        official_playlist_ids = []
+        # 已知 404 的直接視為官方歌單，其餘只請求這次成功標記為 in-flight 的
+        cached_official_ids = PlaylistContextFetchCache.get_not_found(context_map)
+        claimed_ids = PlaylistContextFetchCache.claim(
+            external_id
+            for external_id in context_map
+            if external_id not in cached_official_ids
+        )
+        skipped_count = len(context_map) - len(cached_official_ids) - len(claimed_ids)
+        if skipped_count:
+            logger.info(f"Skipped {skipped_count} playlists in flight in other batches")
+        try:
+            return HistoryPlayLogContextService._update_playlist_details(
+                context_map, claimed_ids, cached_official_ids, api_interface
+            )
+        finally:
+            PlaylistContextFetchCache.release(claimed_ids)
+
+    @staticmethod
+    def _fetch_playlists(external_ids, api_interface):
+        """
+        並行取得 playlists
+
+        :return: List of (external_id, playlist_data, exception)
+        """
 
-        for context in contexts:
+        def fetch(external_id):
             try:
-                playlist_data = api_interface.get_playlist(context.external_id)
-                playlist_data_map[context.external_id] = playlist_data
-            except ProviderException as e:
+                playlist_data = api_interface.get_playlist(
+                    external_id,
+                    fields=HistoryPlayLogContextService.PLAYLIST_DETAIL_FIELDS,
+                )
+                return external_id, playlist_data, None
+            except Exception as e:
+                return external_id, None, e
+
+        if not external_ids:
+            return []
+        max_workers = min(
+            settings.PLAYLIST_CONTEXT_FETCH_MAX_WORKERS, len(external_ids)
+        )
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(fetch, external_ids))
+
+    @staticmethod
+    def _update_playlist_details(
+        context_map, external_ids, cached_official_ids, api_interface
+    ):
+        """
+        :param context_map: {external_id: HistoryPlayLogContext}
+        :param external_ids: 這次要向 Spotify 請求的 external ID
+        :param cached_official_ids: 已記錄為 404 的 external ID
+        :return: List of updated context IDs
+        """
+        playlist_data_map = {}
+        official_playlist_ids = list(cached_official_ids)
+        not_found_ids = []
+        failed_context_ids = []
+
+        results = HistoryPlayLogContextService._fetch_playlists(
+            external_ids, api_interface
+        )
+        for external_id, playlist_data, e in results:
+            if e is None:
+                playlist_data_map[external_id] = playlist_data
+            elif isinstance(e, ProviderException):
                 if e.status_code == 404:
-                    official_playlist_ids.append(context.external_id)
-                    logger.info(f"Playlist {context.external_id} is official (404)")
+                    not_found_ids.append(external_id)
+                    logger.info(f"Playlist {external_id} is official (404)")
                 else:
+                    if e.status_code not in {401, 403, 429}:
+                        failed_context_ids.append(context_map[external_id].id)
                     logger.warning(
-                        f"Failed to fetch playlist {context.external_id}: {e.status_code} {e}"
+                        f"Failed to fetch playlist {external_id}: {e.status_code} {e}"
                     )
-            except Exception as e:
-                logger.warning(
-                    f"Unexpected error fetching playlist {context.external_id}: {e}"
-                )
+            else:
+                failed_context_ids.append(context_map[external_id].id)
+                logger.warning(f"Unexpected error fetching playlist {external_id}: {e}")
+
+        PlaylistContextFetchCache.set_not_found(not_found_ids)
+        official_playlist_ids.extend(not_found_ids)
 
         # 批次更新 contexts
         contexts_to_update = []
@@ -133,7 +260,29 @@ class HistoryPlayLogContextService:
 
         # 批次儲存
         if contexts_to_update:
-            HistoryPlayLogContext.objects.bulk_update(contexts_to_update, ['details'])
+            for context in contexts_to_update:
+                context.enrichment_status = (
+                    HistoryPlayLogContext.EnrichmentStatusOptions.DONE
+                )
+                context.enrichment_next_attempt_at = None
+            HistoryPlayLogContext.objects.bulk_update(
+                contexts_to_update,
+                ['details', 'enrichment_status', 'enrichment_next_attempt_at'],
+            )
             logger.info(f"Bulk updated {len(contexts_to_update)} playlist contexts")
 
+        if failed_context_ids:
+            HistoryPlayLogContext.objects.filter(
+                id__in=failed_context_ids
+            ).mark_enrichment_failed()
+            logger.info(
+                f"Playlist context enrichment failed for {len(failed_context_ids)} contexts"
+            )
+
         return updated_ids
+
+
+CacheInvalidationBus.subscribe(
+    HistoryPlayLogContextService.CONTEXT_ID_CACHE_NAMESPACE,
+    HistoryPlayLogContextService._on_context_id_invalidate,
+)
@@ -0,0 +1,25 @@
+"""
+Listening profile app signals
+
+處理 HistoryPlayLogContext 相關的 signal，確保各 process 內 context id cache 的一致性
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from listening_profile.models import HistoryPlayLogContext
+from listening_profile.services import HistoryPlayLogContextService
+
+
+@receiver(post_delete, sender=HistoryPlayLogContext)
+def clear_context_id_cache_on_delete(sender, instance, **kwargs):
+    """
+    HistoryPlayLogContext 刪除後通知所有 process 清除 (type, external_id) -> pk 的快取，
+    避免之後的 play log 關聯到已不存在的 context id
+    """
+    context_type, external_id = instance.type, instance.external_id
+    transaction.on_commit(
+        lambda: HistoryPlayLogContextService.invalidate_context_id(
+            context_type, external_id
+        )
+    )
@@ -1,3 +1,260 @@
-from django.test import TestCase
+import logging
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+
+from listening_profile.models import HistoryPlayLogContext
+from listening_profile.services import HistoryPlayLogContextService
+from provider.exceptions import ProviderException
+from utils.caches import CacheInvalidationBus
+
+logger = logging.getLogger(__name__)
+
+
+class BulkGetOrCreateContextsBenchmarkTests(TestCase):
+    SIZES = (10, 100, 1000)
+
+    def setUp(self):
+        HistoryPlayLogContextService._context_id_cache.clear()
+
+    def tearDown(self):
+        HistoryPlayLogContextService._context_id_cache.clear()
+
+    def _build_context_data(self, size):
+        types = list(HistoryPlayLogContext.TypeOptions.values)
+        return [
+            {'type': types[i % len(types)], 'external_id': f"{size}-{i}"}
+            for i in range(size)
+        ]
+
+    def _run(self, context_data, expected_queries):
+        start = time.perf_counter()
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(
+            expected_queries
+        ):
+            context_map = HistoryPlayLogContextService.bulk_get_or_create_contexts(
+                context_data
+            )
+        return context_map, (time.perf_counter() - start) * 1000
+
+    def test_benchmark(self):
+        for size in self.SIZES:
+            with self.subTest(size=size):
+                context_data = self._build_context_data(size)
+
+                # 全部新建：1 個 INSERT ... ON CONFLICT DO NOTHING RETURNING
+                created_map, cold_ms = self._run(context_data, 1)
+                self.assertEqual(len(created_map), size)
+
+                # 全部已存在、LRU 未命中：INSERT（不回傳）+ 1 個依 type 分組的 SELECT
+                HistoryPlayLogContextService._context_id_cache.clear()
+                existing_map, existing_ms = self._run(context_data, 2)
+                self.assertEqual(existing_map, created_map)
+
+                # LRU 命中：不查 DB
+                cached_map, warm_ms = self._run(context_data, 0)
+                self.assertEqual(cached_map, created_map)
+
+                logger.info(
+                    f"bulk_get_or_create_contexts size={size} "
+                    f"create={cold_ms:.1f}ms existing={existing_ms:.1f}ms "
+                    f"cached={warm_ms:.1f}ms"
+                )
+
+    def test_partial_cache_hit_only_queries_missing(self):
+        context_data = self._build_context_data(10)
+        with self.captureOnCommitCallbacks(execute=True):
+            created_map = HistoryPlayLogContextService.bulk_get_or_create_contexts(
+                context_data[:5]
+            )
+
+        context_map, _ = self._run(context_data, 1)
+
+        self.assertEqual(len(context_map), 10)
+        for key, context_id in created_map.items():
+            self.assertEqual(context_map[key], context_id)
+        self.assertEqual(HistoryPlayLogContext.objects.count(), 10)
+
+    def test_rolled_back_contexts_are_not_cached(self):
+        context_data = self._build_context_data(5)
+        with self.captureOnCommitCallbacks() as callbacks:
+            HistoryPlayLogContextService.bulk_get_or_create_contexts(context_data)
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(len(HistoryPlayLogContextService._context_id_cache), 0)
+
+    def test_deleted_context_is_evicted(self):
+        context_data = self._build_context_data(1)
+        with self.captureOnCommitCallbacks(execute=True):
+            HistoryPlayLogContextService.bulk_get_or_create_contexts(context_data)
+        self.assertEqual(len(HistoryPlayLogContextService._context_id_cache), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            HistoryPlayLogContext.objects.all().delete()
+
+        self.assertEqual(len(HistoryPlayLogContextService._context_id_cache), 0)
+        context_map, _ = self._run(context_data, 1)
+        self.assertEqual(
+            context_map,
+            {
+                (ctx.type, ctx.external_id): ctx.id
+                for ctx in HistoryPlayLogContext.objects.all()
+            },
+        )
+
+    def test_invalidation_from_other_process_evicts_context(self):
+        context_data = self._build_context_data(1)
+        with self.captureOnCommitCallbacks(execute=True):
+            HistoryPlayLogContextService.bulk_get_or_create_contexts(context_data)
+
+        # 其他 process publish 的訊息經 JSON 傳遞，key 為 list
+        CacheInvalidationBus._dispatch(
+            HistoryPlayLogContextService.CONTEXT_ID_CACHE_NAMESPACE,
+            [context_data[0]['type'], context_data[0]['external_id']],
+        )
+
+        self.assertEqual(len(HistoryPlayLogContextService._context_id_cache), 0)
+
+
+@override_settings(PLAYLIST_CONTEXT_FETCH_MAX_WORKERS=8)
+class UpdatePlaylistDetailsTests(TestCase):
+    SIZE = 16
+    API_LATENCY = 0.05
+
+    class FakeAPIInterface:
+        def __init__(self, latency):
+            self.latency = latency
+            self.calls = []
+            self.active = 0
+            self.peak_concurrency = 0
+            self._lock = threading.Lock()
+
+        def get_playlist(self, playlist_id, fields=None):
+            with self._lock:
+                self.calls.append((playlist_id, fields))
+                self.active += 1
+                self.peak_concurrency = max(self.peak_concurrency, self.active)
+            time.sleep(self.latency)
+            with self._lock:
+                self.active -= 1
+            if playlist_id == 'official':
+                raise ProviderException(code='error', message='', status_code=404)
+            if playlist_id == 'broken':
+                raise ProviderException(code='error', message='', status_code=500)
+            return {
+                'name': playlist_id,
+                'owner': {'display_name': 'owner'},
+                'public': True,
+            }
+
+    class FakeFetchCache:
+        """取代 PlaylistContextFetchCache，不寫入 Redis"""
+
+        def __init__(self):
+            self.in_flight = set()
+            self.not_found = set()
+
+        def claim(self, external_ids):
+            claimed = [i for i in external_ids if i not in self.in_flight]
+            self.in_flight.update(claimed)
+            return claimed
+
+        def release(self, external_ids):
+            self.in_flight.difference_update(external_ids)
+
+        def get_not_found(self, external_ids):
+            return {i for i in external_ids if i in self.not_found}
+
+        def set_not_found(self, external_ids):
+            self.not_found.update(external_ids)
+
+    def setUp(self):
+        self.fetch_cache = self.FakeFetchCache()
+        patcher = mock.patch(
+            'listening_profile.services.PlaylistContextFetchCache', self.fetch_cache
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        HistoryPlayLogContextService._context_id_cache.clear()
+        self.addCleanup(HistoryPlayLogContextService._context_id_cache.clear)
+        external_ids = [f"playlist-{i}" for i in range(self.SIZE)]
+        external_ids += ['official', 'broken']
+        self.contexts = HistoryPlayLogContext.objects.bulk_create(
+            HistoryPlayLogContext(
+                type=HistoryPlayLogContext.TypeOptions.PLAYLIST, external_id=external_id
+            )
+            for external_id in external_ids
+        )
+
+    def _update(self):
+        api_interface = self.FakeAPIInterface(self.API_LATENCY)
+        updated = HistoryPlayLogContextService.update_playlist_details(
+            [context.id for context in self.contexts], api_interface
+        )
+        return updated, api_interface
+
+    def test_fetches_projected_fields_concurrently(self):
+        updated, api_interface = self._update()
+
+        self.assertEqual(len(updated), self.SIZE + 1)
+        self.assertGreater(api_interface.peak_concurrency, 1)
+        self.assertLessEqual(api_interface.peak_concurrency, 8)
+        self.assertEqual(
+            {fields for _, fields in api_interface.calls},
+            {HistoryPlayLogContextService.PLAYLIST_DETAIL_FIELDS},
+        )
+
+        statuses = dict(
+            HistoryPlayLogContext.objects.values_list(
+                'external_id', 'enrichment_status'
+            )
+        )
+        self.assertEqual(
+            statuses['official'], HistoryPlayLogContext.EnrichmentStatusOptions.DONE
+        )
+        self.assertEqual(
+            statuses['broken'], HistoryPlayLogContext.EnrichmentStatusOptions.FAILED
+        )
+        context = HistoryPlayLogContext.objects.get(external_id='playlist-0')
+        self.assertEqual(
+            context.details,
+            {
+                'name': 'playlist-0',
+                'owner_name': 'owner',
+                'is_public': True,
+                'resource_type': 'user',
+            },
+        )
+
+    def test_not_found_playlist_is_not_refetched(self):
+        self._update()
+        self.assertEqual(self.fetch_cache.not_found, {'official'})
+
+        updated, api_interface = self._update()
+
+        self.assertNotIn(
+            'official', {playlist_id for playlist_id, _ in api_interface.calls}
+        )
+        self.assertIn('official', updated)
+        self.assertEqual(
+            HistoryPlayLogContext.objects.get(external_id='official').enrichment_status,
+            HistoryPlayLogContext.EnrichmentStatusOptions.DONE,
+        )
+
+    def test_playlist_in_flight_elsewhere_is_skipped(self):
+        self.fetch_cache.in_flight.add('playlist-0')
+
+        updated, api_interface = self._update()
+
+        self.assertNotIn(
+            'playlist-0', {playlist_id for playlist_id, _ in api_interface.calls}
+        )
+        self.assertEqual(len(updated), self.SIZE)
+        self.assertEqual(self.fetch_cache.in_flight, {'playlist-0'})
+        context = HistoryPlayLogContext.objects.get(external_id='playlist-0')
+        self.assertEqual(
+            context.enrichment_status,
+            HistoryPlayLogContext.EnrichmentStatusOptions.PENDING,
+        )
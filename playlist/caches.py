@@ -1,6 +1,6 @@
 import json
 
-from django.core.cache import cache
+from utils.caches import CacheKeyIndex, NamespacedCache, SWRCache
 
 
 class SpotifyPlaylistOrderCache:
@@ -8,16 +8,22 @@ class SpotifyPlaylistOrderCache:
     Spotify 歌單順序快取管理
 
     用於在 validate 和 import 之間保持資料一致性
-    快取格式: spotify_playlist_order:{member_id}:{type}: [spotify_track_id1, spotify_track_id2, ...]
+    快取格式: spotify_playlist_order:{member_id}:{type}: "spotify_track_id1,spotify_track_id2,..."
 
     快取內容說明:
     - 存儲的是 Spotify track IDs (external_id)，不是資料庫的 Track model ID
     - track_ids 順序與 Spotify API 返回的順序一致（已去重）
     - 用於確保 validate 和 import 兩個操作獲取到相同的歌曲列表
+    - 每個 member 的 key 記錄在 CacheKeyIndex，delete_member_all_caches 不需 KEYS 掃描
+    - Spotify ID 為 base62，直接以逗號串接存成純文字，超過門檻才以 zlib 壓縮
     """
 
     CACHE_TIMEOUT = 60 * 30  # 30 分鐘
     CACHE_KEY_PATTERN = 'spotify_playlist_order:{member_id}:{playlist_type}'
+    INDEX_NAMESPACE = 'spotify_playlist_order'
+    SEPARATOR = ','
+
+    store = NamespacedCache(INDEX_NAMESPACE, serializer='text', compressor='zlib')
 
     @classmethod
     def _compose_cache_key(cls, member_id: int, playlist_type: str) -> str:
@@ -39,8 +45,10 @@ class SpotifyPlaylistOrderCache:
             spotify_track_ids: Spotify track IDs (external_id) 列表（已去重且按順序）
         """
         cache_key = cls._compose_cache_key(member_id, playlist_type)
-        # 使用 JSON 序列化保存 list
-        cache.set(cache_key, json.dumps(spotify_track_ids), cls.CACHE_TIMEOUT)
+        cls.store.set(
+            cache_key, cls.SEPARATOR.join(spotify_track_ids), cls.CACHE_TIMEOUT
+        )
+        CacheKeyIndex.add(cls.INDEX_NAMESPACE, member_id, cache_key, cls.CACHE_TIMEOUT)
 
     @classmethod
     def get_track_ids(cls, member_id: int, playlist_type: str) -> list[str] | None:
@@ -55,10 +63,13 @@ class SpotifyPlaylistOrderCache:
             list[str] | None: Spotify track IDs (external_id) 列表，如果不存在則返回 None
         """
         cache_key = cls._compose_cache_key(member_id, playlist_type)
-        cached_data = cache.get(cache_key)
+        cached_data = cls.store.get(cache_key)
         if cached_data is None:
             return None
-        return json.loads(cached_data)
+        if cached_data.startswith('['):
+            # 舊格式（JSON list），CACHE_TIMEOUT 後即不再出現
+            return json.loads(cached_data)
+        return cached_data.split(cls.SEPARATOR) if cached_data else []
 
     @classmethod
     def delete_cache(cls, member_id: int, playlist_type: str) -> None:
@@ -70,7 +81,8 @@ class SpotifyPlaylistOrderCache:
             playlist_type: 歌單類型
         """
         cache_key = cls._compose_cache_key(member_id, playlist_type)
-        cache.delete(cache_key)
+        cls.store.delete(cache_key)
+        CacheKeyIndex.remove(cls.INDEX_NAMESPACE, member_id, cache_key)
 
     @classmethod
     def delete_member_all_caches(cls, member_id: int) -> None:
@@ -80,7 +92,105 @@ class SpotifyPlaylistOrderCache:
         Args:
             member_id: Member ID
         """
-        pattern = f"spotify_playlist_order:{member_id}:*"
-        keys = cache.keys(pattern)
-        for key in keys:
-            cache.delete(key)
+        CacheKeyIndex.delete_all(cls.INDEX_NAMESPACE, member_id)
+
+
+class SpotifyPlaylistTracksCache:
+    """
+    Spotify 歌單曲目 payload 快取
+
+    validate 時從 Spotify 分頁取回的曲目，以 member + playlist + snapshot_id 為 key 暫存，
+    import 時只要 snapshot_id 沒變就直接使用，不必重新分頁請求 Spotify。
+    快取格式: spotify_playlist_tracks:{member_id}:{playlist_id}:{snapshot_id}: JSON（超過門檻以 zlib 壓縮）
+
+    只保留後續流程（驗證、格式化、建立 Artist/Track）會用到的欄位以縮小快取體積。
+    每個 member 的 key 記錄在 CacheKeyIndex，delete_member_all_caches 不需 KEYS 掃描。
+    """
+
+    CACHE_TIMEOUT = SpotifyPlaylistOrderCache.CACHE_TIMEOUT
+    CACHE_KEY_PATTERN = (
+        'spotify_playlist_tracks:{member_id}:{playlist_id}:{snapshot_id}'
+    )
+    INDEX_NAMESPACE = 'spotify_playlist_tracks'
+
+    store = NamespacedCache(INDEX_NAMESPACE, serializer='json', compressor='zlib')
+    # snapshot_id 相同內容就相同，soft TTL 與 hard TTL 一致
+    # 分頁請求大型歌單可能需要數秒，等待時間放寬
+    swr = SWRCache(
+        store,
+        soft_ttl=CACHE_TIMEOUT,
+        hard_ttl=CACHE_TIMEOUT,
+        lock_timeout=60,
+        wait_timeout=10,
+    )
+
+    @classmethod
+    def _compose_cache_key(
+        cls, member_id: int, playlist_id: str, snapshot_id: str
+    ) -> str:
+        """組成快取 key"""
+        return cls.CACHE_KEY_PATTERN.format(
+            member_id=member_id, playlist_id=playlist_id, snapshot_id=snapshot_id
+        )
+
+    @staticmethod
+    def _compact_track(track: dict) -> dict:
+        """只保留需要的欄位"""
+        album_images = (track.get('album') or {}).get('images') or []
+        compacted = {
+            'id': track.get('id'),
+            'name': track.get('name'),
+            'popularity': track.get('popularity'),
+            'is_playable': track.get('is_playable'),
+            'artists': [
+                {'id': artist.get('id'), 'name': artist.get('name')}
+                for artist in track.get('artists', [])
+            ],
+            'album': {
+                'images': [{'url': image.get('url')} for image in album_images[:2]]
+            },
+        }
+        isrc = (track.get('external_ids') or {}).get('isrc')
+        if isrc:
+            compacted['external_ids'] = {'isrc': isrc}
+        return compacted
+
+    @classmethod
+    def get_or_fetch_tracks(
+        cls, member_id: int, playlist_id: str, snapshot_id: str, fetch_tracks
+    ) -> list[dict]:
+        """
+        取得歌單曲目，快取沒有時呼叫 fetch_tracks 並寫入快取
+
+        同一份歌單同時被多個 request 讀取時（例如 validate 重複送出），只有一個會向 Spotify 分頁請求，
+        其餘等待結果。
+
+        Args:
+            member_id: Member ID
+            playlist_id: Spotify playlist ID
+            snapshot_id: Spotify playlist snapshot_id
+            fetch_tracks: callable()，回傳 Spotify API 的 track 列表
+
+        Returns:
+            list[dict]: 精簡後的 track 列表
+        """
+        cache_key = cls._compose_cache_key(member_id, playlist_id, snapshot_id)
+
+        def load():
+            tracks = [cls._compact_track(track) for track in fetch_tracks()]
+            CacheKeyIndex.add(
+                cls.INDEX_NAMESPACE, member_id, cache_key, cls.CACHE_TIMEOUT
+            )
+            return tracks
+
+        return cls.swr.get(cache_key, load)
+
+    @classmethod
+    def delete_member_all_caches(cls, member_id: int) -> None:
+        """
+        刪除指定 member 的所有歌單曲目快取
+
+        Args:
+            member_id: Member ID
+        """
+        CacheKeyIndex.delete_all(cls.INDEX_NAMESPACE, member_id)
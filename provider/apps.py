@@ -6,5 +6,6 @@ class ProviderConfig(AppConfig):
     name = 'provider'
 
     def ready(self):
-        """Import signals when Django starts"""
+        """Import signals and system checks when Django starts"""
+        import provider.checks  # noqa: F401
         import provider.signals  # noqa: F401
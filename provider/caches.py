@@ -1,48 +1,146 @@
-from typing import Literal
-
+import hashlib
+import logging
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Literal, Optional
+
+from celery import current_task
+from django.conf import settings
 from django.core.cache import cache
 from django.utils import timezone
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from provider.models import (
+    MemberAPIToken,
+    ProviderProxyAccount,
+    ProviderProxyAccountAPIToken,
+)
+from utils.caches import (
+    CacheEntry,
+    CacheInvalidationBus,
+    CacheKeyIndex,
+    LocalLRUCache,
+    NamespacedCache,
+    RedisScript,
+    SWRCache,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class BaseAPITokenCache:
+    """
+    Access token 的兩層 cache：process 內 L1（LRU + TTL）→ Redis L2 → DB
+
+    L1 TTL 不超過 PROVIDER_TOKEN_LOCAL_CACHE_TIMEOUT，且比 token 到期早 EXPIRE_IN_BUFFER 秒；
+    set / delete 時透過 CacheInvalidationBus 通知其他 process 清掉 L1。
+    L2 key 依 owner 記錄在 CacheKeyIndex，刪除 owner 所有 token 時不需 KEYS 掃描。
+    L2 為 SWRCache（hard TTL 為 token 剩餘效期）：同一個 token 同時 miss 時只查一次 DB，
+    沒有 token 的 owner 以 NEGATIVE_TTL 快取，不必每次都查 DB。
+    """
+
+    EXPIRE_IN_BUFFER = 60  # 與 BaseAuthProviderHandler.EXPIRE_IN_BUFFER 相同
+    SOFT_TTL = 60 * 5  # 超過後由一個 caller 重新讀取 DB
+    NEGATIVE_TTL = 30
+    LOCAL_NAMESPACE = None
+    local_cache = None
+    store = None
+    swr = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.store = NamespacedCache(cls.LOCAL_NAMESPACE, serializer='json')
+        cls.swr = SWRCache(
+            cls.store, soft_ttl=cls.SOFT_TTL, negative_ttl=cls.NEGATIVE_TTL
+        )
+        cls.local_cache = LocalLRUCache(
+            maxsize=settings.PROVIDER_TOKEN_LOCAL_CACHE_SIZE,
+            ttl=settings.PROVIDER_TOKEN_LOCAL_CACHE_TIMEOUT,
+        )
+        CacheInvalidationBus.subscribe(cls.LOCAL_NAMESPACE, cls._on_invalidate)
 
-from provider.models import MemberAPIToken, ProviderProxyAccountAPIToken
+    @classmethod
+    def _on_invalidate(cls, cache_key):
+        if cache_key is None:
+            cls.local_cache.clear()
+        else:
+            cls.local_cache.delete(cache_key)
 
+    @classmethod
+    def _get_cached(cls, cache_key, loader):
+        """
+        依序查 L1、L2，L2 沒有（或需要重算）時以 loader 查詢 DB，結果回填 L1
 
-class MemberAPITokenCache:
-    @staticmethod
-    def compose_cache_key(member_id, provider_code):
-        return f"member_api_token:{member_id}:{provider_code}"
+        :param loader: callable()，回傳 _build_entry() 的結果
+        """
+        CacheInvalidationBus.ensure_listener()
+        access_token = cls.local_cache.get(cache_key)
+        if access_token is not None:
+            return access_token
+
+        entry = cls.swr.get_entry(cache_key, loader)
+        if entry.value is not None:
+            cls._set_local(cache_key, entry.value, entry.hard_ttl)
+        return entry.value
 
     @classmethod
-    def set_token(cls, member_id, provider_code, token, timeout):
-        cache_key = cls.compose_cache_key(member_id, provider_code)
-        cache.set(cache_key, token, timeout=timeout)
+    def _get_stored(cls, cache_key, loader):
+        """
+        略過 L1 與 SWR，直接讀取 L2（沒有值時查詢 DB），不寫入 negative cache
+
+        等待其他 caller refresh 完成後使用：refresh 失敗時不會把 None 快取 NEGATIVE_TTL 秒
+
+        :param loader: callable()，回傳 _build_entry() 的結果
+        """
+        entry = cls.swr.peek(cache_key)
+        if entry is None or entry.value is None:
+            entry = loader()
+        return entry.value if entry else None
 
     @classmethod
-    def get_token(cls, member_id, provider_code):
-        cache_key = cls.compose_cache_key(member_id, provider_code)
-        access_token = cache.get(cache_key)
-        if access_token is not None:
-            return access_token
-        member_api_token = MemberAPIToken.objects.filter(
-            member_id=member_id, provider__code=provider_code
-        ).first()
-        if not member_api_token or cls._is_token_expired(member_api_token.expires_at):
+    def _build_entry(cls, owner, cache_key, api_token):
+        """
+        DB 的 token 轉為 CacheEntry，並記錄到 owner 的 index
+
+        :return: CacheEntry，token 不存在或已過期時為 None
+        """
+        if not api_token or cls._is_token_expired(api_token.expires_at):
             return None
-        access_token = member_api_token.access_token
-        timeout = cls._get_token_timeout(member_api_token.expires_at)
-        cls.set_token(member_id, provider_code, access_token, timeout)
-        return access_token
+        timeout = cls._get_token_timeout(api_token.expires_at)
+        CacheKeyIndex.add(cls.LOCAL_NAMESPACE, owner, cache_key, timeout)
+        return CacheEntry(api_token.access_token, hard_ttl=timeout)
 
     @classmethod
-    def delete_token(cls, member_id, provider_code):
-        cache_key = cls.compose_cache_key(member_id, provider_code)
-        cache.delete(cache_key)
+    def _set_cached(cls, owner, cache_key, token, timeout):
+        cls.swr.set(cache_key, token, hard_ttl=timeout)
+        CacheKeyIndex.add(cls.LOCAL_NAMESPACE, owner, cache_key, timeout)
+        CacheInvalidationBus.publish(cls.LOCAL_NAMESPACE, cache_key)
+        cls._set_local(cache_key, token, timeout)
 
     @classmethod
-    def delete_member_all_tokens(cls, member_id):
-        pattern = f"member_api_token:{member_id}:*"
-        keys = cache.keys(pattern)
-        for key in keys:
-            cache.delete(key)
+    def _delete_cached(cls, owner, cache_key):
+        cls.swr.delete(cache_key)
+        CacheKeyIndex.remove(cls.LOCAL_NAMESPACE, owner, cache_key)
+        CacheInvalidationBus.publish(cls.LOCAL_NAMESPACE, cache_key)
+
+    @classmethod
+    def _delete_owner_cached(cls, owner):
+        for cache_key in CacheKeyIndex.delete_all(cls.LOCAL_NAMESPACE, owner):
+            CacheInvalidationBus.publish(cls.LOCAL_NAMESPACE, cache_key)
+
+    @classmethod
+    def _set_local(cls, cache_key, token, timeout):
+        """
+        :param timeout: token 在 L2 的剩餘秒數，None 表示不過期
+        """
+        ttl = settings.PROVIDER_TOKEN_LOCAL_CACHE_TIMEOUT
+        if timeout is not None:
+            ttl = min(ttl, timeout - cls.EXPIRE_IN_BUFFER)
+        if ttl > 0:
+            cls.local_cache.set(cache_key, token, ttl=ttl)
 
     @classmethod
     def _is_token_expired(cls, expires_at):
@@ -58,7 +156,52 @@ class MemberAPITokenCache:
         return None  # None means no limit, timeout is forever
 
 
-class ProviderProxyAccountAPITokenCache:
+class MemberAPITokenCache(BaseAPITokenCache):
+    LOCAL_NAMESPACE = 'member_api_token'
+
+    @staticmethod
+    def compose_cache_key(member_id, provider_code):
+        return f"member_api_token:{member_id}:{provider_code}"
+
+    @classmethod
+    def set_token(cls, member_id, provider_code, token, timeout):
+        cache_key = cls.compose_cache_key(member_id, provider_code)
+        cls._set_cached(member_id, cache_key, token, timeout)
+
+    @classmethod
+    def get_token(cls, member_id, provider_code):
+        cache_key = cls.compose_cache_key(member_id, provider_code)
+        return cls._get_cached(cache_key, cls._loader(member_id, provider_code))
+
+    @classmethod
+    def get_stored_token(cls, member_id, provider_code):
+        cache_key = cls.compose_cache_key(member_id, provider_code)
+        return cls._get_stored(cache_key, cls._loader(member_id, provider_code))
+
+    @classmethod
+    def _loader(cls, member_id, provider_code):
+        cache_key = cls.compose_cache_key(member_id, provider_code)
+        return lambda: cls._build_entry(
+            member_id,
+            cache_key,
+            MemberAPIToken.objects.filter(
+                member_id=member_id, provider__code=provider_code
+            ).first(),
+        )
+
+    @classmethod
+    def delete_token(cls, member_id, provider_code):
+        cache_key = cls.compose_cache_key(member_id, provider_code)
+        cls._delete_cached(member_id, cache_key)
+
+    @classmethod
+    def delete_member_all_tokens(cls, member_id):
+        cls._delete_owner_cached(member_id)
+
+
+class ProviderProxyAccountAPITokenCache(BaseAPITokenCache):
+    LOCAL_NAMESPACE = 'proxy_account_api_token'
+
     @staticmethod
     def compose_cache_key(proxy_account_code, provider_code):
         return f"proxy_account_api_token:{proxy_account_code}:{provider_code}"
@@ -66,60 +209,62 @@ class ProviderProxyAccountAPITokenCache:
     @classmethod
     def set_token(cls, proxy_account_code, provider_code, token, timeout):
         cache_key = cls.compose_cache_key(proxy_account_code, provider_code)
-        cache.set(cache_key, token, timeout=timeout)
+        cls._set_cached(proxy_account_code, cache_key, token, timeout)
 
     @classmethod
     def get_token(cls, proxy_account_code, provider_code):
         cache_key = cls.compose_cache_key(proxy_account_code, provider_code)
-        access_token = cache.get(cache_key)
-        if access_token is not None:
-            return access_token
-
-        proxy_account_token = ProviderProxyAccountAPIToken.objects.filter(
-            proxy_account__code=proxy_account_code,
-            proxy_account__provider__code=provider_code,
-        ).first()
+        return cls._get_cached(
+            cache_key, cls._loader(proxy_account_code, provider_code)
+        )
 
-        if not proxy_account_token or cls._is_token_expired(
-            proxy_account_token.expires_at
-        ):
-            return None
+    @classmethod
+    def get_stored_token(cls, proxy_account_code, provider_code):
+        cache_key = cls.compose_cache_key(proxy_account_code, provider_code)
+        return cls._get_stored(
+            cache_key, cls._loader(proxy_account_code, provider_code)
+        )
 
-        access_token = proxy_account_token.access_token
-        timeout = cls._get_token_timeout(proxy_account_token.expires_at)
-        cls.set_token(proxy_account_code, provider_code, access_token, timeout)
-        return access_token
+    @classmethod
+    def _loader(cls, proxy_account_code, provider_code):
+        cache_key = cls.compose_cache_key(proxy_account_code, provider_code)
+        return lambda: cls._build_entry(
+            proxy_account_code,
+            cache_key,
+            ProviderProxyAccountAPIToken.objects.filter(
+                proxy_account__code=proxy_account_code,
+                proxy_account__provider__code=provider_code,
+            ).first(),
+        )
 
     @classmethod
     def delete_token(cls, proxy_account_code, provider_code):
         cache_key = cls.compose_cache_key(proxy_account_code, provider_code)
-        cache.delete(cache_key)
+        cls._delete_cached(proxy_account_code, cache_key)
 
     @classmethod
     def delete_proxy_account_all_tokens(cls, proxy_account_code):
-        pattern = f"proxy_account_api_token:{proxy_account_code}:*"
-        keys = cache.keys(pattern)
-        for key in keys:
-            cache.delete(key)
+        cls._delete_owner_cached(proxy_account_code)
 
-    @classmethod
-    def _is_token_expired(cls, expires_at):
-        return expires_at and expires_at < timezone.now()
 
-    @classmethod
-    def _get_token_timeout(cls, expires_at):
-        if expires_at:
-            delta = (expires_at - timezone.now()).total_seconds()
-            if delta <= 0:
-                return 0
-            return int(delta)
-        return None  # None means no limit, timeout is forever
+class MemberProviderProxyAccountCache:
+    """
+    Member 目前分配到的 proxy account（read-through SWRCache）
 
+    get_cache miss 時查詢 DB 的分配結果，沒有分配的 member 以 NEGATIVE_TTL 快取；
+    分配 / 釋放時由 service 與 signal 以 set_cache / delete_cache 直接覆寫。
+    """
 
-class MemberProviderProxyAccountCache:
     CACHE_TIMEOUT = 3600
+    SOFT_TTL = 60 * 10
+    NEGATIVE_TTL = 60
     LOCK_TIMEOUT = 10
 
+    store = NamespacedCache('member_proxy_account', serializer='json')
+    swr = SWRCache(
+        store, soft_ttl=SOFT_TTL, hard_ttl=CACHE_TIMEOUT, negative_ttl=NEGATIVE_TTL
+    )
+
     @staticmethod
     def compose_cache_key(platform: str, member_id: int) -> str:
         return f"member_proxy_account:{platform}:{member_id}"
@@ -130,9 +275,12 @@ class MemberProviderProxyAccountCache:
         return f"lock:member_proxy_account:{platform}:{member_id}"
 
     @classmethod
+    @swr.cached(
+        lambda cls, platform, member_id: cls.compose_cache_key(platform, member_id)
+    )
     def get_cache(cls, platform: str, member_id: int):
         """
-        取得快取的 proxy account 資訊
+        取得 member 分配到的 proxy account 資訊（快取沒有時查詢 DB）
 
         Args:
             platform: 平台類型
@@ -141,8 +289,19 @@ class MemberProviderProxyAccountCache:
         Returns:
             dict or None: {'proxy_account_code': str, 'provider_code': str} 或 None
         """
-        cache_key = cls.compose_cache_key(platform, member_id)
-        return cache.get(cache_key)
+        proxy_account = (
+            ProviderProxyAccount.objects.filter(
+                current_member_id=member_id, provider__platform=platform
+            )
+            .values('code', 'provider__code')
+            .first()
+        )
+        if not proxy_account:
+            return None
+        return {
+            'proxy_account_code': proxy_account['code'],
+            'provider_code': proxy_account['provider__code'],
+        }
 
     @classmethod
     def set_cache(
@@ -162,7 +321,7 @@ class MemberProviderProxyAccountCache:
             'proxy_account_code': proxy_account_code,
             'provider_code': provider_code,
         }
-        cache.set(cache_key, cache_value, timeout=cls.CACHE_TIMEOUT)
+        cls.swr.set(cache_key, cache_value)
 
     @classmethod
     def delete_cache(cls, platform: str, member_id: int) -> None:
@@ -174,7 +333,7 @@ class MemberProviderProxyAccountCache:
             member_id: member ID
         """
         cache_key = cls.compose_cache_key(platform, member_id)
-        cache.delete(cache_key)
+        cls.swr.delete(cache_key)
 
     @classmethod
     def acquire_lock(cls, platform: str, member_id: int) -> bool:
@@ -189,7 +348,7 @@ class MemberProviderProxyAccountCache:
             bool: True 表示成功獲取鎖，False 表示鎖已被佔用
         """
         lock_key = cls.compose_lock_key(platform, member_id)
-        return cache.add(lock_key, True, timeout=cls.LOCK_TIMEOUT)
+        return cls.store.add(lock_key, True, timeout=cls.LOCK_TIMEOUT)
 
     @classmethod
     def release_lock(cls, platform: str, member_id: int) -> None:
@@ -201,4 +360,425 @@ class MemberProviderProxyAccountCache:
             member_id: member ID
         """
         lock_key = cls.compose_lock_key(platform, member_id)
-        cache.delete(lock_key)
+        cls.store.delete(lock_key)
+
+
+class APITokenVerificationCache:
+    """
+    記錄 access token 最近一次通過 provider 驗證（例如 Spotify /me）
+
+    值為 token 的 fingerprint（不存明文 token），token 換掉後自然失效；
+    TTL 內重複驗證同一個 token 時可跳過對 provider 的 round-trip。
+    """
+
+    store = NamespacedCache('api_token_verified', serializer='text')
+
+    @staticmethod
+    def compose_cache_key(owner_key: str, provider_code: str) -> str:
+        return f"api_token_verified:{owner_key}:{provider_code}"
+
+    @staticmethod
+    def get_fingerprint(access_token: str) -> str:
+        return hashlib.sha256(access_token.encode()).hexdigest()
+
+    @classmethod
+    def mark_verified(
+        cls, owner_key: str, provider_code: str, access_token: str, timeout=None
+    ) -> None:
+        """
+        Args:
+            owner_key: 'member:{id}' 或 'proxy_account:{code}'
+            provider_code: provider code
+            access_token: 剛通過驗證的 access token
+            timeout: 秒數，預設 PROVIDER_TOKEN_VERIFY_TTL
+        """
+        cache_key = cls.compose_cache_key(owner_key, provider_code)
+        cls.store.set(
+            cache_key,
+            cls.get_fingerprint(access_token),
+            timeout=timeout or settings.PROVIDER_TOKEN_VERIFY_TTL,
+        )
+
+    @classmethod
+    def is_verified(cls, owner_key: str, provider_code: str, access_token: str) -> bool:
+        cache_key = cls.compose_cache_key(owner_key, provider_code)
+        return cls.store.get(cache_key) == cls.get_fingerprint(access_token)
+
+    @classmethod
+    def delete(cls, owner_key: str, provider_code: str) -> None:
+        cache_key = cls.compose_cache_key(owner_key, provider_code)
+        cls.store.delete(cache_key)
+
+
+class APITokenRefreshLockCache:
+    """
+    Token refresh 的 single-flight 鎖（每個 member / proxy account + provider 一把）
+
+    同一個 token 同時過期時，只有取得鎖的 caller 會呼叫 provider 的 token endpoint，
+    其餘 caller 等待鎖釋放後直接讀取新的 token，並記錄等待 / 合併次數。
+    """
+
+    LOCK_TIMEOUT = 30
+    METRIC_NAMES = ('refreshes', 'lock_waits', 'collapsed', 'wait_timeouts')
+
+    # 鎖的值為 acquire_lock 產生的 token，release_lock 以 delete_if_equal 比對 token 後才刪除
+    store = NamespacedCache('api_token_refresh_lock', serializer='json')
+
+    @staticmethod
+    def compose_lock_key(owner_key: str, provider_code: str) -> str:
+        return f"lock:api_token_refresh:{owner_key}:{provider_code}"
+
+    @staticmethod
+    def compose_metric_key(provider_code: str, name: str) -> str:
+        return f"api_token_refresh_metrics:{provider_code}:{name}"
+
+    @classmethod
+    def acquire_lock(cls, owner_key: str, provider_code: str) -> Optional[str]:
+        """
+        嘗試獲取鎖
+
+        Args:
+            owner_key: 'member:{id}' 或 'proxy_account:{code}'
+            provider_code: provider code
+
+        Returns:
+            str | None: 鎖的 token（釋放時需帶入），None 表示已有其他 caller 正在 refresh
+        """
+        lock_key = cls.compose_lock_key(owner_key, provider_code)
+        lock_token = uuid.uuid4().hex
+        if cls.store.add(lock_key, lock_token, timeout=cls.LOCK_TIMEOUT):
+            return lock_token
+        return None
+
+    @classmethod
+    def is_locked(cls, owner_key: str, provider_code: str) -> bool:
+        lock_key = cls.compose_lock_key(owner_key, provider_code)
+        return cls.store.get(lock_key) is not None
+
+    @classmethod
+    def release_lock(cls, owner_key: str, provider_code: str, lock_token: str) -> None:
+        """
+        釋放鎖；鎖已逾時並被其他 caller 取得時不會刪除對方的鎖
+
+        Args:
+            owner_key: 'member:{id}' 或 'proxy_account:{code}'
+            provider_code: provider code
+            lock_token: acquire_lock 回傳的 token
+        """
+        lock_key = cls.compose_lock_key(owner_key, provider_code)
+        cls.store.delete_if_equal(lock_key, lock_token)
+
+    @classmethod
+    def incr_metric(cls, provider_code: str, name: str) -> None:
+        """
+        累加計數（不過期），metrics 失敗不影響 refresh 流程
+
+        Args:
+            provider_code: provider code
+            name: METRIC_NAMES 其中之一
+        """
+        metric_key = cls.compose_metric_key(provider_code, name)
+        try:
+            cache.add(metric_key, 0, timeout=None)
+            cache.incr(metric_key)
+        except (RedisError, ValueError) as e:
+            logger.warning(f"Failed to record token refresh metric {metric_key}: {e}")
+
+    @classmethod
+    def get_metrics(cls, provider_code: str) -> dict:
+        """
+        Returns:
+            dict: {metric name: count}
+        """
+        keys = {
+            name: cls.compose_metric_key(provider_code, name)
+            for name in cls.METRIC_NAMES
+        }
+        values = cache.get_many(keys.values())
+        return {name: values.get(key, 0) for name, key in keys.items()}
+
+
+class ProviderAppTokenCache:
+    """
+    Provider（Spotify App）的 client credentials access token
+
+    不屬於任何使用者，只能呼叫 catalog API（artists / playlists 等）。
+    以 SWRCache 存放：token 到期前 REFRESH_AHEAD 秒起視為過期，由一個 caller 向
+    token endpoint 取得新 token，其餘 caller 繼續使用仍有效的舊 token，
+    token 在到期前就會被取代；同一個 provider 同時 miss 時只請求一次。
+    """
+
+    EXPIRE_IN_BUFFER = 60  # 與 BaseAuthProviderHandler.EXPIRE_IN_BUFFER 相同
+    REFRESH_AHEAD = 60 * 10
+
+    store = NamespacedCache('provider_app_token', serializer='json')
+    swr = SWRCache(store, soft_ttl=60 * 60, lock_timeout=30, wait_timeout=10)
+
+    @staticmethod
+    def compose_cache_key(provider_code: str) -> str:
+        return f"provider_app_token:{provider_code}"
+
+    @classmethod
+    def get_token(cls, provider_code: str, loader):
+        """
+        Args:
+            provider_code: provider code
+            loader: callable()，向 token endpoint 取得 token，回傳 build_entry() 的結果
+
+        Returns:
+            str | None: access token
+        """
+        return cls.swr.get(cls.compose_cache_key(provider_code), loader)
+
+    @classmethod
+    def build_entry(cls, access_token: str, expires_in: int) -> CacheEntry:
+        """
+        Args:
+            access_token: token endpoint 回傳的 access token
+            expires_in: token 效期（秒）
+
+        Returns:
+            CacheEntry: 到期前 REFRESH_AHEAD 秒開始重新取得，到期前 EXPIRE_IN_BUFFER 秒從 cache 移除
+        """
+        hard_ttl = max(0, expires_in - cls.EXPIRE_IN_BUFFER)
+        return CacheEntry(
+            access_token,
+            soft_ttl=max(0, expires_in - cls.REFRESH_AHEAD),
+            hard_ttl=hard_ttl,
+        )
+
+    @classmethod
+    def delete_token(cls, provider_code: str) -> None:
+        cls.swr.delete(cls.compose_cache_key(provider_code))
+
+
+class ProviderAppTokenPoolCache:
+    """
+    App token pool 的 round-robin 游標（所有 worker 共用）
+
+    每次取用時 INCR，依序輪流使用各 provider（Spotify App）的 rate limit 額度。
+    Redis 無法連線時改為隨機挑選。
+    """
+
+    CURSOR_KEY = 'provider_app_token_pool:cursor'
+
+    @classmethod
+    def next_index(cls, size: int) -> int:
+        """
+        Args:
+            size: pool 中的 provider 數量
+
+        Returns:
+            int: 0 ~ size - 1
+        """
+        try:
+            cursor = get_redis_connection(settings.DEFAULT_ALIAS).incr(cls.CURSOR_KEY)
+        except (RedisError, NotImplementedError) as e:
+            logger.warning(f"App token pool cursor unavailable: {e}")
+            cursor = random.randrange(size)
+        return cursor % size
+
+
+@dataclass(frozen=True)
+class RateLimitResult:
+    """ProviderRateLimitCache.acquire 的結果，可直接當作 bool 使用"""
+
+    acquired: bool
+    retry_after: float = 0.0  # 未取得時，bucket 回傳的需等待秒數
+
+    def __bool__(self):
+        return self.acquired
+
+
+class ProviderRateLimitCache:
+    """
+    Provider（Spotify App / client_id）層級的分散式 token bucket
+
+    所有 worker / web process 共用同一個 Redis bucket：
+    - 每次 API request 前 acquire 一個 token，不足時等待 refill
+    - 收到 429 時依 Retry-After 暫停整個 bucket，所有 caller 一起退讓
+    - bucket 狀態（tokens / paused_until）即為該 provider 目前的可用額度
+
+    Redis 無法連線時 fail open，不阻擋 API request。
+    """
+
+    KEY_TIMEOUT = 60 * 60
+
+    # KEYS[1]: bucket key
+    # ARGV: capacity, refill_rate (tokens/sec), key timeout
+    # return: {allowed (0/1), wait_seconds}
+    ACQUIRE_SCRIPT = RedisScript(
+        """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local redis_time = redis.call('TIME')
+local now = tonumber(redis_time[1]) + tonumber(redis_time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at', 'paused_until')
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+local paused_until = tonumber(bucket[3]) or 0
+
+if paused_until > now then
+    return {0, tostring(paused_until - now)}
+end
+
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = (1 - tokens) / rate
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now), 'paused_until', tostring(paused_until))
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return {allowed, tostring(wait)}
+"""
+    )
+
+    # KEYS[1]: bucket key
+    # ARGV: pause seconds, key timeout
+    PAUSE_SCRIPT = RedisScript(
+        """
+local redis_time = redis.call('TIME')
+local now = tonumber(redis_time[1]) + tonumber(redis_time[2]) / 1000000
+local paused_until = now + tonumber(ARGV[1])
+local current = tonumber(redis.call('HGET', KEYS[1], 'paused_until')) or 0
+if current > paused_until then
+    paused_until = current
+end
+redis.call('HSET', KEYS[1], 'tokens', '0', 'updated_at', tostring(paused_until), 'paused_until', tostring(paused_until))
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return tostring(paused_until - now)
+"""
+    )
+
+    @staticmethod
+    def compose_cache_key(rate_limit_key: str) -> str:
+        return f"provider_rate_limit:{rate_limit_key}"
+
+    @staticmethod
+    def get_rate_limit_key(provider) -> str:
+        """同一個 Spotify App（client_id）共用同一個 bucket"""
+        return (provider.auth_details or {}).get('client_id') or provider.code
+
+    @classmethod
+    def get_options(cls, provider) -> dict:
+        """
+        取得 provider 的 rate limit 設定，可在 provider.extra_details['rate_limit'] 覆寫
+
+        - refill_rate 不是正數（bucket 永遠不會補充）時記錄 error 並改用預設值
+        - 不在 Celery task 內（web request）時，max_wait 最多 PROVIDER_RATE_LIMIT_WEB_MAX_WAIT 秒，
+          不讓 request thread 長時間 sleep
+
+        Returns:
+            dict: {'capacity': float, 'refill_rate': float, 'max_wait': float}
+        """
+        options = {
+            'capacity': settings.PROVIDER_RATE_LIMIT_CAPACITY,
+            'refill_rate': settings.PROVIDER_RATE_LIMIT_REFILL_RATE,
+            'max_wait': settings.PROVIDER_RATE_LIMIT_MAX_WAIT,
+        }
+        options.update((provider.extra_details or {}).get('rate_limit', {}))
+        if not options['refill_rate'] > 0:
+            logger.error(
+                f"Provider {provider.code} rate limit refill_rate must be positive, "
+                f"got {options['refill_rate']}, using the default"
+            )
+            options['refill_rate'] = settings.PROVIDER_RATE_LIMIT_REFILL_RATE
+        if not cls._in_celery_task():
+            options['max_wait'] = min(
+                options['max_wait'], settings.PROVIDER_RATE_LIMIT_WEB_MAX_WAIT
+            )
+        return options
+
+    @staticmethod
+    def _in_celery_task() -> bool:
+        return bool(current_task) and not current_task.request.called_directly
+
+    @classmethod
+    def acquire(
+        cls, rate_limit_key: str, capacity: float, refill_rate: float, max_wait: float
+    ) -> RateLimitResult:
+        """
+        取得一個 request token，不足時等待（最多 max_wait 秒）
+
+        Args:
+            rate_limit_key: bucket key（provider client_id）
+            capacity: bucket 容量（允許的瞬間 burst）
+            refill_rate: 每秒補充的 token 數（需為正數，由 get_options / system check 驗證）
+            max_wait: 最長等待秒數
+
+        Returns:
+            RateLimitResult: acquired 為 False 表示等待超過 max_wait，
+            retry_after 為 bucket 回傳的需等待秒數
+        """
+        cache_key = cls.compose_cache_key(rate_limit_key)
+        deadline = time.monotonic() + max_wait
+        while True:
+            try:
+                allowed, wait = cls.ACQUIRE_SCRIPT(
+                    keys=[cache_key], args=[capacity, refill_rate, cls.KEY_TIMEOUT]
+                )
+            except (RedisError, NotImplementedError) as e:
+                logger.warning(f"Rate limiter unavailable for {rate_limit_key}: {e}")
+                return RateLimitResult(True)
+
+            if int(allowed):
+                return RateLimitResult(True)
+
+            wait = float(wait)
+            if time.monotonic() + wait > deadline:
+                return RateLimitResult(False, retry_after=wait)
+            time.sleep(wait)
+
+    @classmethod
+    def pause(cls, rate_limit_key: str, seconds: float) -> None:
+        """
+        暫停 bucket（收到 429 時呼叫），所有 worker 在暫停期間都不會送出 request
+
+        Args:
+            rate_limit_key: bucket key（provider client_id）
+            seconds: 暫停秒數（Retry-After）
+        """
+        cache_key = cls.compose_cache_key(rate_limit_key)
+        try:
+            cls.PAUSE_SCRIPT(keys=[cache_key], args=[seconds, cls.KEY_TIMEOUT])
+        except (RedisError, NotImplementedError) as e:
+            logger.warning(f"Rate limiter unavailable for {rate_limit_key}: {e}")
+            return
+        logger.warning(f"Rate limit bucket {rate_limit_key} paused for {seconds}s")
+
+    @classmethod
+    def get_budget(cls, rate_limit_key: str, capacity: float, refill_rate: float):
+        """
+        取得 bucket 目前的可用額度
+
+        Returns:
+            dict: {'tokens': float, 'capacity': float, 'paused_for': float}
+        """
+        cache_key = cls.compose_cache_key(rate_limit_key)
+        try:
+            client = get_redis_connection(settings.DEFAULT_ALIAS)
+            tokens, updated_at, paused_until = client.hmget(
+                cache_key, 'tokens', 'updated_at', 'paused_until'
+            )
+            seconds, microseconds = client.time()
+        except (RedisError, NotImplementedError) as e:
+            logger.warning(f"Rate limiter unavailable for {rate_limit_key}: {e}")
+            return None
+
+        now = seconds + microseconds / 1_000_000
+        paused_for = max(0.0, float(paused_until or 0) - now)
+        if tokens is None:
+            tokens = capacity
+        else:
+            elapsed = max(0.0, now - float(updated_at))
+            tokens = min(capacity, float(tokens) + elapsed * refill_rate)
+        return {
+            'tokens': 0.0 if paused_for else round(tokens, 2),
+            'capacity': capacity,
+            'paused_for': round(paused_for, 2),
+        }
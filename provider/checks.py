@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+
+@register()
+def check_rate_limit_settings(app_configs, **kwargs):
+    """啟動時檢查 token bucket 的補充速率，refill rate 不是正數時 bucket 永遠不會補充"""
+    errors = []
+    for name in ('PROVIDER_RATE_LIMIT_REFILL_RATE', 'PROVIDER_TOKEN_REFRESH_RATE'):
+        value = getattr(settings, name)
+        if not value > 0:
+            errors.append(
+                Error(
+                    f"{name} must be positive, got {value}",
+                    hint='Rate limit token buckets would never refill.',
+                    id='provider.E001',
+                )
+            )
+    return errors
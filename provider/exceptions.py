@@ -1,7 +1,8 @@
 class ProviderException(Exception):
-    def __init__(self, code, message, details=None, status_code=None):
+    def __init__(self, code, message, details=None, status_code=None, retry_after=None):
         super().__init__(message)
         self.code = code
         self.message = message
         self.details = details
         self.status_code = status_code
+        self.retry_after = retry_after
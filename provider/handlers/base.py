@@ -1,9 +1,16 @@
+import time
 from abc import ABC, abstractmethod
 from functools import wraps
 
+from asgiref.sync import sync_to_async
 from django.utils import timezone
 
-from provider.caches import MemberAPITokenCache, ProviderProxyAccountAPITokenCache
+from provider.caches import (
+    APITokenRefreshLockCache,
+    APITokenVerificationCache,
+    MemberAPITokenCache,
+    ProviderProxyAccountAPITokenCache,
+)
 from provider.exceptions import ProviderException
 from provider.models import MemberAPIToken, ProviderProxyAccountAPIToken
 from utils.constants import ResponseCode, ResponseMessage
@@ -52,6 +59,44 @@ def with_reauth(fn):
     return wrapper
 
 
+def async_with_reauth(fn):
+    """
+    with_reauth 的 async 版本，行為相同：收到 401 時 refresh token 後重試一次，
+    仍失敗則清除 DB + cache 並拋出 REAUTH_REQUIRED。
+    token 刷新與清除涉及 DB，透過 sync_to_async 執行。
+    """
+
+    @wraps(fn)
+    async def wrapper(self, *args, **kwargs):
+        try:
+            return await fn(self, *args, **kwargs)
+        except ProviderException as e:
+            if e.status_code not in TOKEN_INVALID_STATUS_CODES:
+                raise
+
+        await sync_to_async(self._invalidate_cache)()
+        try:
+            new_token = await sync_to_async(self.refresh_token)()
+        except ProviderException:
+            new_token = None
+
+        if new_token:
+            try:
+                return await fn(self, *args, **kwargs)
+            except ProviderException as e:
+                if e.status_code not in TOKEN_INVALID_STATUS_CODES:
+                    raise
+
+        await sync_to_async(self._invalidate_cache)()
+        await sync_to_async(self._invalidate_db)()
+        raise ProviderException(
+            code=ResponseCode.EXTERNAL_API_REAUTH_REQUIRED,
+            message=ResponseMessage.EXTERNAL_API_REAUTH_REQUIRED,
+        )
+
+    return wrapper
+
+
 class BaseAuthProviderHandler(ABC):
     EXPIRE_IN_BUFFER = 60  # 1 分鐘的 buffer，確保 cache 比實際 token 更早過期
 
@@ -178,10 +223,15 @@ class BaseAuthProviderHandler(ABC):
 
 
 class BaseAPIProviderHandler(ABC):
+    REFRESH_WAIT_TIMEOUT = 10  # 等待其他 caller refresh 的最長秒數
+    REFRESH_WAIT_INTERVAL = 0.1
+
     def __init__(self, provider, member=None, proxy_account=None):
         self.provider = provider
         self.member = member
         self.proxy_account = proxy_account
+        # api_interface 依目前的 access token 重用，token 變更時才重建
+        self._api_interface = None
 
         if bool(member) == bool(proxy_account):
             raise ValueError(
@@ -197,15 +247,7 @@ class BaseAPIProviderHandler(ABC):
         """
         獲取 access token，優先從 cache 獲取，如果沒有或過期則嘗試刷新
         """
-        if self.member:
-            access_token = MemberAPITokenCache.get_token(
-                self.member.id, self.provider.code
-            )
-        else:  # proxy_account
-            access_token = ProviderProxyAccountAPITokenCache.get_token(
-                self.proxy_account.code, self.provider.code
-            )
-
+        access_token = self._get_cached_access_token()
         if access_token:
             return access_token
 
@@ -226,10 +268,14 @@ class BaseAPIProviderHandler(ABC):
         取得 access token 並透過呼叫 provider API 驗證有效性。
         token 無效時嘗試 refresh，refresh 後仍無效則清除 DB + cache 並要求重新授權。
         5xx / 網路錯誤不視為 token 失效，直接往上拋。
+        同一個 token 在 PROVIDER_TOKEN_VERIFY_TTL 內驗證過則直接回傳，不再呼叫 provider。
         """
         access_token = self.get_access_token()
 
+        if self._is_token_recently_verified(access_token):
+            return access_token
         if self._is_token_valid(access_token):
+            self._mark_token_verified(access_token)
             return access_token
 
         # token 被 provider 拒絕，先清 cache 再嘗試 refresh
@@ -240,6 +286,7 @@ class BaseAPIProviderHandler(ABC):
             new_token = None
 
         if new_token and self._is_token_valid(new_token):
+            self._mark_token_verified(new_token)
             return new_token
 
         # refresh 失敗或 refresh 後的 token 仍無效，清除 DB + cache 要求重新授權
@@ -257,7 +304,45 @@ class BaseAPIProviderHandler(ABC):
         """
         raise NotImplementedError('Subclasses must implement _is_token_valid')
 
+    def _get_cached_access_token(self):
+        """從 token cache（miss 時 fallback 到 DB）取得尚未過期的 access token"""
+        if self.member:
+            return MemberAPITokenCache.get_token(self.member.id, self.provider.code)
+        return ProviderProxyAccountAPITokenCache.get_token(
+            self.proxy_account.code, self.provider.code
+        )
+
+    def _get_stored_access_token(self):
+        """
+        略過 negative cache 取得 token cache（miss 時 fallback 到 DB）中尚未過期的 access token
+
+        等待其他 caller refresh 後使用，refresh 失敗時不會讓 None 被快取
+        """
+        if self.member:
+            return MemberAPITokenCache.get_stored_token(
+                self.member.id, self.provider.code
+            )
+        return ProviderProxyAccountAPITokenCache.get_stored_token(
+            self.proxy_account.code, self.provider.code
+        )
+
+    def _get_owner_key(self):
+        if self.member:
+            return f"member:{self.member.id}"
+        return f"proxy_account:{self.proxy_account.code}"
+
+    def _is_token_recently_verified(self, access_token):
+        return APITokenVerificationCache.is_verified(
+            self._get_owner_key(), self.provider.code, access_token
+        )
+
+    def _mark_token_verified(self, access_token):
+        APITokenVerificationCache.mark_verified(
+            self._get_owner_key(), self.provider.code, access_token
+        )
+
     def _invalidate_cache(self):
+        APITokenVerificationCache.delete(self._get_owner_key(), self.provider.code)
         if self.member:
             MemberAPITokenCache.delete_token(self.member.id, self.provider.code)
         else:
@@ -276,10 +361,50 @@ class BaseAPIProviderHandler(ABC):
             ).delete()
 
     def refresh_token(self):
-        if self.member:
-            return self._refresh_token_member()
-        else:  # proxy_account
-            return self._refresh_token_proxy_account()
+        """
+        Refresh access token（single-flight）
+
+        同一個 member / proxy account 同時只有一個 caller 會呼叫 provider 的 token
+        endpoint，其餘 caller 等待鎖釋放後直接讀取新的 token；
+        等待超過 REFRESH_WAIT_TIMEOUT 時才自行 refresh。
+        """
+        owner_key = self._get_owner_key()
+        provider_code = self.provider.code
+
+        lock_token = APITokenRefreshLockCache.acquire_lock(owner_key, provider_code)
+        if not lock_token:
+            APITokenRefreshLockCache.incr_metric(provider_code, 'lock_waits')
+            if self._wait_for_refresh(owner_key):
+                access_token = self._get_stored_access_token()
+                if access_token:
+                    APITokenRefreshLockCache.incr_metric(provider_code, 'collapsed')
+                return access_token
+            APITokenRefreshLockCache.incr_metric(provider_code, 'wait_timeouts')
+
+        try:
+            APITokenRefreshLockCache.incr_metric(provider_code, 'refreshes')
+            if self.member:
+                return self._refresh_token_member()
+            else:  # proxy_account
+                return self._refresh_token_proxy_account()
+        finally:
+            if lock_token:
+                APITokenRefreshLockCache.release_lock(
+                    owner_key, provider_code, lock_token
+                )
+
+    def _wait_for_refresh(self, owner_key):
+        """
+        等待其他 caller 完成 refresh
+
+        :return: True 表示鎖已釋放，False 表示等待逾時
+        """
+        deadline = time.monotonic() + self.REFRESH_WAIT_TIMEOUT
+        while APITokenRefreshLockCache.is_locked(owner_key, self.provider.code):
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(self.REFRESH_WAIT_INTERVAL)
+        return True
 
     @abstractmethod
     def _refresh_token_member(self):
@@ -2,22 +2,30 @@ import logging
 from functools import cached_property
 from typing import Literal
 
+from asgiref.sync import sync_to_async
 from django.urls import reverse
 
-from provider.caches import ProviderProxyAccountAPITokenCache
+from provider.caches import (
+    ProviderAppTokenCache,
+    ProviderAppTokenPoolCache,
+    ProviderProxyAccountAPITokenCache,
+)
 from provider.decorators import member_only, proxy_account_only
 from provider.exceptions import ProviderException
 from provider.handlers.base import (
     TOKEN_INVALID_STATUS_CODES,
     BaseAPIProviderHandler,
     BaseAuthProviderHandler,
+    async_with_reauth,
     with_reauth,
 )
 from provider.interfaces.spotify import (
+    AsyncSpotifyAPIProviderInterface,
     SpotifyAPIProviderInterface,
     SpotifyAuthProviderInterface,
 )
-from provider.models import MemberAPIToken, ProviderProxyAccountAPIToken
+from provider.models import MemberAPIToken, Provider, ProviderProxyAccountAPIToken
+from utils.constants import ResponseCode, ResponseMessage
 from walrus import settings
 
 logger = logging.getLogger(__name__)
@@ -115,12 +123,18 @@ class SpotifyAPIProviderHandler(BaseAPIProviderHandler):
         """
         獲取 API Interface（唯一能創建 interface 的地方）
 
-        自動處理 token 管理（member/proxy_account）
+        自動處理 token 管理（member/proxy_account），同一個 token 重用同一個 interface
         """
-        return SpotifyAPIProviderInterface(
-            provider=self.provider,
-            access_token=self.get_access_token(),
-        )
+        access_token = self.get_access_token()
+        if (
+            self._api_interface is None
+            or self._api_interface.access_token != access_token
+        ):
+            self._api_interface = SpotifyAPIProviderInterface(
+                provider=self.provider,
+                access_token=access_token,
+            )
+        return self._api_interface
 
     # ===== API 封裝方法（API Gateway）=====
     # Handler 是唯一能訪問 Interface 的地方
@@ -145,7 +159,7 @@ class SpotifyAPIProviderHandler(BaseAPIProviderHandler):
     @with_reauth
     def fetch_playlist_tracks(self, playlist_id, market='TW'):
         """
-        獲取歌單中的所有歌曲（自動處理分頁）
+        獲取歌單中的所有歌曲（自動處理分頁，第一頁之後並行請求）
 
         :param playlist_id: Spotify playlist ID
         :param market: ISO 3166-1 alpha-2 country code
@@ -153,7 +167,7 @@ class SpotifyAPIProviderHandler(BaseAPIProviderHandler):
         """
         from provider.utils.spotify import SpotifyPaginationHelper
 
-        items = SpotifyPaginationHelper.fetch_all_items(
+        items = SpotifyPaginationHelper.fetch_all_items_concurrently(
             api_method=self.api_interface.get_playlist_tracks,
             total_limit=None,
             playlist_id=playlist_id,
@@ -170,6 +184,93 @@ class SpotifyAPIProviderHandler(BaseAPIProviderHandler):
 
         return tracks
 
+    @member_only
+    @with_reauth
+    def fetch_playlist_snapshot_id(self, playlist_id):
+        """
+        只取得歌單的 snapshot_id（輕量呼叫，用於判斷歌單內容是否變動）
+
+        :param playlist_id: Spotify playlist ID
+        :return: snapshot_id 或 None
+        """
+        data = self.api_interface.get_playlist(playlist_id, fields='snapshot_id')
+        return data.get('snapshot_id')
+
+    @with_reauth
+    def fetch_several_artists(self, artist_ids):
+        """
+        批次取得多個 artist 詳細資料
+
+        :param artist_ids: List[str]（max 50）
+        :return: Spotify API 原始回應
+        """
+        return self.api_interface.get_several_artists(artist_ids)
+
+    # ===== Async API 封裝方法 =====
+    # 與 sync 版相同的 token / reauth 行為，供需要大量 fan-out 的 I/O bound 流程使用
+
+    async def aget_api_interface(self):
+        """api_interface 的 async 版本"""
+        access_token = await sync_to_async(self.get_access_token)()
+        return AsyncSpotifyAPIProviderInterface(
+            provider=self.provider,
+            access_token=access_token,
+        )
+
+    @member_only
+    @async_with_reauth
+    async def afetch_recently_played_raw(self, after=None, before=None, limit=50):
+        """fetch_recently_played_raw 的 async 版本"""
+        api_interface = await self.aget_api_interface()
+        return await api_interface.get_recently_played(
+            after=after, before=before, limit=limit
+        )
+
+    @member_only
+    @async_with_reauth
+    async def afetch_playlist_tracks(self, playlist_id, market='TW'):
+        """fetch_playlist_tracks 的 async 版本"""
+        from provider.utils.spotify import SpotifyPaginationHelper
+
+        api_interface = await self.aget_api_interface()
+        items = await SpotifyPaginationHelper.afetch_all_items_concurrently(
+            api_method=api_interface.get_playlist_tracks,
+            total_limit=None,
+            playlist_id=playlist_id,
+            market=market,
+        )
+
+        return [
+            item['item']
+            for item in items
+            if item.get('item')
+            and item['item'].get('type') == 'track'
+            and item['item'].get('is_playable', False)
+        ]
+
+    @async_with_reauth
+    async def afetch_several_artists(self, artist_ids):
+        """
+        批次取得多個 artist 詳細資料（async）
+
+        :param artist_ids: List[str]（max 50）
+        :return: Spotify API 原始回應
+        """
+        api_interface = await self.aget_api_interface()
+        return await api_interface.get_several_artists(artist_ids)
+
+    @async_with_reauth
+    async def afetch_playlist(self, playlist_id, fields=None):
+        """
+        取得歌單資訊（async）
+
+        :param playlist_id: Spotify playlist ID
+        :param fields: 指定要返回的欄位（可選）
+        :return: Spotify API 原始回應
+        """
+        api_interface = await self.aget_api_interface()
+        return await api_interface.get_playlist(playlist_id, fields=fields)
+
     def _is_token_valid(self, access_token: str) -> bool:
         """
         透過呼叫 /me 驗證 token 是否有效。
@@ -238,3 +339,92 @@ class SpotifyAPIProviderHandler(BaseAPIProviderHandler):
             token_data=token_data, proxy_account_id=self.proxy_account.id
         )
         return result.get('access_token')
+
+
+class SpotifyAppAPIProviderHandler:
+    """
+    以 provider（Spotify App）的 client credentials token 呼叫 catalog API
+
+    artists / playlist 等 catalog 資料不需要使用者授權，不必借用 staff member 的 token；
+    from_pool() 在所有 Spotify App 間 round-robin，把 enrichment 的請求分散到
+    每個 App 各自的 rate limit 額度。token 由 ProviderAppTokenCache 在到期前更新。
+    """
+
+    def __init__(self, provider):
+        self.provider = provider
+        self._api_interface = None
+
+    @classmethod
+    def from_pool(cls):
+        """
+        從設定了 client_id / client_secret 的 Spotify provider 中輪流挑選一個
+
+        :return: SpotifyAppAPIProviderHandler，沒有可用的 provider 時為 None
+        """
+        providers = [
+            provider
+            for provider in Provider.objects.filter(
+                platform=Provider.PlatformOptions.SPOTIFY,
+                auth_type=Provider.AuthTypeOptions.OAUTH2,
+            ).order_by('id')
+            if (provider.auth_details or {}).get('client_id')
+            and (provider.auth_details or {}).get('client_secret')
+        ]
+        if not providers:
+            return None
+        return cls(providers[ProviderAppTokenPoolCache.next_index(len(providers))])
+
+    @property
+    def api_interface(self):
+        access_token = self.get_access_token()
+        if (
+            self._api_interface is None
+            or self._api_interface.access_token != access_token
+        ):
+            self._api_interface = SpotifyAPIProviderInterface(
+                provider=self.provider,
+                access_token=access_token,
+            )
+        return self._api_interface
+
+    def get_access_token(self):
+        access_token = ProviderAppTokenCache.get_token(
+            self.provider.code, self._request_token
+        )
+        if not access_token:
+            raise ProviderException(
+                code=ResponseCode.EXTERNAL_API_REAUTH_REQUIRED,
+                message=ResponseMessage.EXTERNAL_API_REAUTH_REQUIRED,
+            )
+        return access_token
+
+    def refresh_token(self):
+        """丟棄目前的 app token 並重新取得"""
+        self._invalidate_cache()
+        return self.get_access_token()
+
+    @with_reauth
+    def fetch_several_artists(self, artist_ids):
+        """
+        批次取得多個 artist 詳細資料
+
+        :param artist_ids: List[str]（max 50）
+        :return: Spotify API 原始回應
+        """
+        return self.api_interface.get_several_artists(artist_ids)
+
+    def _request_token(self):
+        auth_handler = SpotifyAuthProviderHandler(self.provider)
+        token_data = auth_handler.auth_interface.request_client_credentials_token()
+        return ProviderAppTokenCache.build_entry(
+            token_data.get('access_token'),
+            token_data.get('expires_in')
+            or self.provider.default_token_expiration
+            or 3600,
+        )
+
+    def _invalidate_cache(self):
+        ProviderAppTokenCache.delete_token(self.provider.code)
+
+    def _invalidate_db(self):
+        pass  # app token 只存在 cache
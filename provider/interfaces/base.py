@@ -1,14 +1,20 @@
+import asyncio
 import base64
 import logging
+import math
+import os
+import threading
 import time
 from abc import ABC, abstractmethod
-from urllib.parse import urlencode
+from urllib.parse import urlencode, urlsplit
 
 import jwt
 import requests
+from django.conf import settings
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+from provider.caches import ProviderRateLimitCache
 from provider.exceptions import ProviderException
 from utils.constants import ResponseCode, ResponseMessage
 
@@ -17,6 +23,8 @@ logger = logging.getLogger(__name__)
 RETRY_TOTAL = 3
 RETRY_BACKOFF_FACTOR = 5  # sleep: 0s, 5s, 10s between retries
 RETRY_STATUS_FORCELIST = [500, 502, 503, 504]
+RATE_LIMITED_STATUS_CODE = 429
+DEFAULT_RETRY_AFTER = 5  # 429 沒有帶 Retry-After header 時的預設等待秒數
 
 
 def _build_retry_session():
@@ -26,18 +34,114 @@ def _build_retry_session():
         backoff_factor=RETRY_BACKOFF_FACTOR,
         status_forcelist=RETRY_STATUS_FORCELIST,
         raise_on_status=False,
+        # 429 不在 thread 內依 Retry-After sleep 重試，交給 handle_error 暫停整個 bucket
+        respect_retry_after_header=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=settings.PROVIDER_HTTP_POOL_CONNECTIONS,
+        pool_maxsize=settings.PROVIDER_HTTP_POOL_MAXSIZE,
+        max_retries=retry,
     )
-    adapter = HTTPAdapter(max_retries=retry)
     session.mount('https://', adapter)
     session.mount('http://', adapter)
     return session
 
 
+class HttpSessionRegistry:
+    """
+    Process 層級的 requests.Session 註冊表
+
+    依 session key（provider / base_url）重用同一個 Session，保留 keep-alive 連線，
+    避免每次呼叫外部 API 都重新做 TCP + TLS handshake。
+
+    fork 之後（Celery prefork、gunicorn worker）子 process 會丟棄繼承來的 Session，
+    重新建立自己的連線池，不與 parent process 共用 socket。
+    """
+
+    _sessions = {}
+    _lock = threading.Lock()
+    _pid = os.getpid()
+
+    @classmethod
+    def get_session(cls, key):
+        """
+        取得 key 對應的 Session，不存在則建立
+
+        :param key: session key（例如 provider code + base_url）
+        :return: requests.Session
+        """
+        if cls._pid != os.getpid():
+            cls._reset_after_fork()
+
+        session = cls._sessions.get(key)
+        if session is not None:
+            return session
+
+        with cls._lock:
+            session = cls._sessions.get(key)
+            if session is None:
+                session = _build_retry_session()
+                cls._sessions[key] = session
+        return session
+
+    @classmethod
+    def get_stats(cls):
+        """
+        取得各 session 的連線統計
+
+        :return: {key: {'requests': int, 'connections_opened': int, 'connections_reused': int}}
+        """
+        stats = {}
+        for key, session in list(cls._sessions.items()):
+            requests_count = 0
+            opened_count = 0
+            for adapter in set(session.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for pool_key in pools.keys():
+                    pool = pools.get(pool_key)
+                    if pool is None:
+                        continue
+                    requests_count += pool.num_requests
+                    opened_count += pool.num_connections
+            stats[key] = {
+                'requests': requests_count,
+                'connections_opened': opened_count,
+                'connections_reused': max(0, requests_count - opened_count),
+            }
+        return stats
+
+    @classmethod
+    def close_all(cls):
+        """關閉目前 process 的所有 Session"""
+        with cls._lock:
+            sessions = list(cls._sessions.values())
+            cls._sessions = {}
+        for session in sessions:
+            session.close()
+
+    @classmethod
+    def _reset_after_fork(cls):
+        # 繼承自 parent 的 socket 不可在子 process 重用，也不主動 close 以免影響 parent
+        cls._sessions = {}
+        cls._lock = threading.Lock()
+        cls._pid = os.getpid()
+
+
+os.register_at_fork(after_in_child=HttpSessionRegistry._reset_after_fork)
+
+
 class BaseHttpClient(ABC):
+    # 用於 HttpSessionRegistry 的 key，None 時以請求 URL 的 host 作為 key
+    session_key = None
+
+    def get_session(self, url):
+        key = self.session_key or urlsplit(url).netloc
+        return HttpSessionRegistry.get_session(key)
+
     def handle_request(
         self, method, url, headers=None, params=None, data=None, json=None, **kwargs
     ):
-        session = _build_retry_session()
+        session = self.get_session(url)
         try:
             response = session.request(
                 method=method,
@@ -83,8 +187,18 @@ class BaseHttpClient(ABC):
             message=ResponseMessage.EXTERNAL_API_ERROR,
             details=error_data,
             status_code=http_status_code,
+            retry_after=self.get_retry_after(response),
         )
 
+    def get_retry_after(self, response):
+        """429 時回傳 Retry-After 秒數，其餘回傳 None"""
+        if response is None or response.status_code != RATE_LIMITED_STATUS_CODE:
+            return None
+        try:
+            return max(0, int(response.headers.get('Retry-After')))
+        except (TypeError, ValueError):
+            return DEFAULT_RETRY_AFTER
+
     def build_url_with_params(self, url, params):
         return f"{url}?{urlencode(params)}"
 
@@ -95,6 +209,7 @@ class BaseProviderAuthInterface(BaseHttpClient, ABC):
         self.auth_details = auth_details
         self.client_id = auth_details.get('client_id')
         self.client_secret = auth_details.get('client_secret')
+        self.session_key = f"auth:{self.client_id}"
 
     @abstractmethod
     def build_token_request_headers(self):
@@ -162,6 +277,29 @@ class BaseOAuth2ProviderAuthInterface(BaseProviderAuthInterface):
         )
         return response.json()
 
+    def request_client_credentials_token(self, extra_data=None, extra_headers=None):
+        """
+        以 client credentials 取得 app token（不屬於任何使用者，沒有 refresh token）
+
+        :return: {'access_token': str, 'token_type': str, 'expires_in': int}
+        """
+        data = {
+            'grant_type': 'client_credentials',
+            'client_id': self.client_id,
+            'client_secret': self.client_secret,
+        }
+        if extra_data:
+            data.update(extra_data)
+        headers = {
+            'Content-Type': 'application/x-www-form-urlencoded',
+        }
+        if extra_headers:
+            headers.update(extra_headers)
+        response = self.handle_request(
+            'POST', self.TOKEN_URL, data=data, headers=headers
+        )
+        return response.json()
+
 
 class BaseJWTProviderAuthInterface(BaseProviderAuthInterface):
     def build_token_request_headers(self):
@@ -178,9 +316,26 @@ class BaseJWTProviderAuthInterface(BaseProviderAuthInterface):
 
 
 class BaseAPIProviderInterface(BaseHttpClient):
-    def __init__(self, base_url, access_token):
+    def __init__(
+        self,
+        base_url,
+        access_token,
+        session_key=None,
+        rate_limit_key=None,
+        rate_limit_options=None,
+    ):
+        """
+        :param base_url: API base url
+        :param access_token: access token
+        :param session_key: HttpSessionRegistry key（預設為 base_url）
+        :param rate_limit_key: ProviderRateLimitCache bucket key，None 表示不限流
+        :param rate_limit_options: {'capacity', 'refill_rate', 'max_wait'}
+        """
         self.base_url = base_url.rstrip('/') + '/'
         self.access_token = access_token
+        self.session_key = session_key or self.base_url
+        self.rate_limit_key = rate_limit_key
+        self.rate_limit_options = rate_limit_options or {}
 
     def build_request_headers(self, extra_headers=None):
         key = 'Authorization'
@@ -193,8 +348,67 @@ class BaseAPIProviderInterface(BaseHttpClient):
     def build_url(self, endpoint):
         return f"{self.base_url}{endpoint.lstrip('/')}"
 
+    def acquire_rate_limit(self):
+        """送出 request 前向 provider 的 token bucket 取得額度"""
+        if not self.rate_limit_key:
+            return
+        result = ProviderRateLimitCache.acquire(
+            self.rate_limit_key, **self.rate_limit_options
+        )
+        if result:
+            return
+        raise ProviderException(
+            code=ResponseCode.EXTERNAL_API_ERROR,
+            message=ResponseMessage.EXTERNAL_API_ERROR,
+            details={'error': 'rate_limited', 'rate_limit_key': self.rate_limit_key},
+            status_code=RATE_LIMITED_STATUS_CODE,
+            retry_after=math.ceil(result.retry_after),
+        )
+
     def handle_request(self, method, endpoint, **kwargs):
         url = self.build_url(endpoint)
         headers = self.build_request_headers(kwargs.pop('headers', None))
+        self.acquire_rate_limit()
         response = super().handle_request(method, url, headers=headers, **kwargs)
         return response.json()
+
+    def handle_error(self, exception, response=None):
+        retry_after = self.get_retry_after(response)
+        if retry_after is not None and self.rate_limit_key:
+            # 429：暫停整個 provider 的 bucket，讓所有 worker 一起退讓
+            ProviderRateLimitCache.pause(self.rate_limit_key, retry_after)
+        super().handle_error(exception, response)
+
+
+class BaseAsyncAPIProviderInterface:
+    """
+    BaseAPIProviderInterface 的 asyncio 版本
+
+    專案沒有 async HTTP client 依賴，request 交由 thread 執行 sync interface，
+    因此與 sync 版共用 token、HttpSessionRegistry 連線池、rate limiter、retry 與
+    ProviderException 語意；同一個 interface 的同時 request 數以 semaphore 限制。
+    """
+
+    def __init__(self, sync_interface, max_concurrency=None):
+        """
+        :param sync_interface: BaseAPIProviderInterface instance
+        :param max_concurrency: 同時進行的 request 上限（預設 PROVIDER_HTTP_POOL_MAXSIZE）
+        """
+        self.sync_interface = sync_interface
+        self.semaphore = asyncio.Semaphore(
+            max_concurrency or settings.PROVIDER_HTTP_POOL_MAXSIZE
+        )
+
+    @property
+    def access_token(self):
+        return self.sync_interface.access_token
+
+    async def run(self, method, *args, **kwargs):
+        """在 thread 中執行 sync interface 的方法"""
+        async with self.semaphore:
+            return await asyncio.to_thread(method, *args, **kwargs)
+
+    async def handle_request(self, method, endpoint, **kwargs):
+        return await self.run(
+            self.sync_interface.handle_request, method, endpoint, **kwargs
+        )
@@ -1,6 +1,8 @@
+from provider.caches import ProviderRateLimitCache
 from provider.exceptions import ProviderException
 from provider.interfaces.base import (
     BaseAPIProviderInterface,
+    BaseAsyncAPIProviderInterface,
     BaseOAuth2ProviderAuthInterface,
 )
 from utils.constants import ResponseCode, ResponseMessage
@@ -51,10 +53,20 @@ class SpotifyAuthProviderInterface(BaseOAuth2ProviderAuthInterface):
             extra_headers=headers,
         )
 
+    def request_client_credentials_token(self):
+        headers = self.build_token_request_headers()
+        return super().request_client_credentials_token(extra_headers=headers)
+
 
 class SpotifyAPIProviderInterface(BaseAPIProviderInterface):
     def __init__(self, provider, access_token):
-        super().__init__(provider.base_url, access_token)
+        super().__init__(
+            provider.base_url,
+            access_token,
+            session_key=f"{provider.code}:{provider.base_url}",
+            rate_limit_key=ProviderRateLimitCache.get_rate_limit_key(provider),
+            rate_limit_options=ProviderRateLimitCache.get_options(provider),
+        )
 
     def get_me(self):
         """
@@ -146,3 +158,60 @@ class SpotifyAPIProviderInterface(BaseAPIProviderInterface):
         endpoint = 'me/top/tracks'
         params = {'time_range': time_range, 'limit': limit, 'offset': offset}
         return self.handle_request('GET', endpoint, params=params)
+
+
+class AsyncSpotifyAPIProviderInterface(BaseAsyncAPIProviderInterface):
+    """
+    SpotifyAPIProviderInterface 的 async 版本，參數與回傳值皆與 sync 版相同
+    """
+
+    def __init__(self, provider, access_token, max_concurrency=None):
+        super().__init__(
+            SpotifyAPIProviderInterface(provider, access_token),
+            max_concurrency=max_concurrency,
+        )
+
+    async def get_me(self):
+        return await self.run(self.sync_interface.get_me)
+
+    async def get_recently_played(self, after=None, before=None, limit=50):
+        return await self.run(
+            self.sync_interface.get_recently_played,
+            after=after,
+            before=before,
+            limit=limit,
+        )
+
+    async def get_several_artists(self, artist_ids):
+        return await self.run(self.sync_interface.get_several_artists, artist_ids)
+
+    async def get_playlist(self, playlist_id, fields=None):
+        return await self.run(
+            self.sync_interface.get_playlist, playlist_id, fields=fields
+        )
+
+    async def get_playlist_tracks(self, playlist_id, limit=50, offset=0, market=None):
+        return await self.run(
+            self.sync_interface.get_playlist_tracks,
+            playlist_id,
+            limit=limit,
+            offset=offset,
+            market=market,
+        )
+
+    async def search(self, query, search_type='playlist', limit=1, offset=0):
+        return await self.run(
+            self.sync_interface.search,
+            query,
+            search_type=search_type,
+            limit=limit,
+            offset=offset,
+        )
+
+    async def get_user_top_tracks(self, time_range='medium_term', limit=50, offset=0):
+        return await self.run(
+            self.sync_interface.get_user_top_tracks,
+            time_range=time_range,
+            limit=limit,
+            offset=offset,
+        )
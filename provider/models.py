@@ -79,19 +79,38 @@ class BaseAPIToken(models.Model):
 
     @property
     def access_token(self):
-        return decrypt_value(self._access_token) if self._access_token else None
+        return self._decrypt(self._access_token)
 
     @access_token.setter
     def access_token(self, value):
-        self._access_token = encrypt_value(value) if value else None
+        self._access_token = self._encrypt(value)
 
     @property
     def refresh_token(self):
-        return decrypt_value(self._refresh_token) if self._refresh_token else None
+        return self._decrypt(self._refresh_token)
 
     @refresh_token.setter
     def refresh_token(self, value):
-        self._refresh_token = encrypt_value(value) if value else None
+        self._refresh_token = self._encrypt(value)
+
+    @property
+    def _decrypted_values(self):
+        # {密文: 明文}，同一個 instance 重複讀取時不再解密；以密文為 key，欄位變更後自然失效
+        return self.__dict__.setdefault('_decrypted_values_cache', {})
+
+    def _decrypt(self, encrypted):
+        if not encrypted:
+            return None
+        if encrypted not in self._decrypted_values:
+            self._decrypted_values[encrypted] = decrypt_value(encrypted)
+        return self._decrypted_values[encrypted]
+
+    def _encrypt(self, value):
+        if not value:
+            return None
+        encrypted = encrypt_value(value)
+        self._decrypted_values[encrypted] = value
+        return encrypted
 
 
 class MemberAPIToken(BaseAPIToken):
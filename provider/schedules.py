@@ -5,6 +5,10 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'provider.tasks.check_and_update_missing_artist_details',
         'schedule': crontab(hour='*/4'),  # 每 4 小時（0, 4, 8, 12, 16, 20）
     },
+    'flush-artist-enrichment-buffer': {
+        'task': 'provider.tasks.flush_artist_enrichment_buffer',
+        'schedule': crontab(minute='*'),  # 每分鐘送出等待超過 deadline 的新 artists
+    },
     'check-and-update-missing-playlist-context-details': {
         'task': 'provider.tasks.check_and_update_missing_playlist_context_details',
         'schedule': crontab(
@@ -15,4 +19,8 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'provider.tasks.collect_all_members_recently_played_logs',
         'schedule': crontab(minute=0, hour='*'),  # 每小時整點
     },
+    'refresh-expiring-api-tokens': {
+        'task': 'provider.tasks.refresh_expiring_api_tokens',
+        'schedule': crontab(minute='*/5'),  # 每 5 分鐘
+    },
 }
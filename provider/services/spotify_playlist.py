@@ -140,16 +140,31 @@ class SpotifyPlaylistService:
         從 Spotify API 收集歌單中的所有歌曲
 
         使用 market='TW' 參數讓 Spotify API 直接返回台灣市場可用的歌曲
+        先以 snapshot_id 查詢 SpotifyPlaylistTracksCache，歌單未變動時直接使用快取，
+        避免 validate → import 之間重複分頁請求 Spotify
 
         :param spotify_playlist_id: Spotify playlist ID
         :return: track 列表
         """
-        # ✅ 通過 handler 調用 API（handler 已經處理了分頁和過濾）
-        tracks = self.handler.fetch_playlist_tracks(
-            playlist_id=spotify_playlist_id, market='TW'
-        )
+        from playlist.caches import SpotifyPlaylistTracksCache
+
+        snapshot_id = self.handler.fetch_playlist_snapshot_id(spotify_playlist_id)
+
+        def fetch_tracks():
+            # ✅ 通過 handler 調用 API（handler 已經處理了分頁和過濾）
+            return self.handler.fetch_playlist_tracks(
+                playlist_id=spotify_playlist_id, market='TW'
+            )
 
-        return tracks
+        if not snapshot_id:
+            return fetch_tracks()
+
+        return SpotifyPlaylistTracksCache.get_or_fetch_tracks(
+            member_id=self.member.id,
+            playlist_id=spotify_playlist_id,
+            snapshot_id=snapshot_id,
+            fetch_tracks=fetch_tracks,
+        )
 
     def _mark_tracks_as_duplicated(
         self, tracks_data: list, current_playlist_type: str
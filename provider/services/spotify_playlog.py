@@ -5,9 +5,11 @@ Spotify 播放記錄服務
 """
 import logging
 
+from django.db.models import Q
 from django.utils import timezone
 
-from listening_profile.models import HistoryPlayLog
+from listening_profile.models import HistoryPlayLog, HistoryPlayLogWatermark
+from listening_profile.schemas import PlayLogSchemas
 from provider.utils.spotify import (
     deduplicate_playlogs,
     parse_artists_from_tracks,
@@ -45,29 +47,37 @@ class SpotifyPlayLogService:
 
         self.handler = SpotifyAPIProviderHandler(provider, member=member)
 
-    def collect_recently_played_logs(self, days: int) -> list:
+    def collect_recently_played_logs(
+        self, days: int, recover: bool = False
+    ) -> PlayLogSchemas.BulkCreateResult:
         """
         收集最近播放記錄
 
         流程：
-        1. 從 Spotify API 獲取原始數據
+        1. 從 Spotify API 獲取 watermark 之後的原始數據
         2. 使用 utils 轉換為標準化數據
         3. 使用 Manager 創建 Artists/Tracks
         4. 使用 Manager 創建 PlayLogs
-        5. 觸發異步任務
+        5. 推進 watermark
 
-        :param days: 獲取最近幾天的數據
-        :return: 創建的 HistoryPlayLog 對象列表
+        沒有 watermark、watermark 早於 days 範圍（中間有缺口）或 recover=True 時，
+        改為請求完整的 days 範圍。
+
+        :param days: 完整範圍：獲取最近幾天的數據
+        :param recover: True 時忽略 watermark，重新收集完整範圍
+        :return: PlayLogSchemas.BulkCreateResult（新增的 HistoryPlayLog 與略過筆數）
         """
         # 1. Fetch data
+        start_ts = self._get_collection_start_ts(days, recover)
         logger.info(
-            f"Fetching recently played for member {self.member.id}, last {days} days"
+            f"Fetching recently played for member {self.member.id} "
+            f"after {start_ts} (window {days} days, recover={recover})"
         )
-        raw_items = self._fetch_all_recently_played(days)
+        raw_items = self._fetch_all_recently_played(start_ts)
 
         if not raw_items:
             logger.info(f"No recently played items found for member {self.member.id}")
-            return 0
+            return PlayLogSchemas.BulkCreateResult(created=[])
 
         logger.info(f"Fetched {len(raw_items)} raw items")
 
@@ -115,18 +125,72 @@ class SpotifyPlayLogService:
         logger.info(f"Created/found {len(context_map)} contexts")
 
         # 6. HistoryPlayLogs
-        created_logs = HistoryPlayLog.objects.bulk_create_deduplicated(
+        result = HistoryPlayLog.objects.bulk_create_deduplicated(
             playlogs_data,
             tracks_map,
             context_map,
             self.member,
             self.provider,
         )
-        logger.info(f"Created {len(created_logs)} new play logs")
+        logger.info(
+            f"Created {result.inserted_count} new play logs, "
+            f"skipped {result.skipped_count} existing"
+        )
+
+        # 7. Watermark（寫入成功後才推進，失敗時下次會重新請求同一段）
+        self._advance_watermark(playlogs_data)
 
-        return created_logs
+        return result
 
-    def _fetch_all_recently_played(self, days: int) -> list:
+    def _get_collection_start_ts(self, days: int, recover: bool) -> int:
+        """
+        計算這次收集的起始時間（Unix timestamp，毫秒）
+
+        :param days: 完整範圍的天數
+        :param recover: 是否忽略 watermark
+        :return: 起始時間
+        """
+        window_start = timezone.now() - timezone.timedelta(days=days)
+
+        watermark = None
+        if not recover:
+            watermark = (
+                HistoryPlayLogWatermark.objects.filter(
+                    member=self.member, provider=self.provider
+                )
+                .values_list('last_played_at', flat=True)
+                .first()
+            )
+
+        if watermark and watermark > window_start:
+            return int(watermark.timestamp() * 1000)
+        return int(window_start.timestamp() * 1000)
+
+    def _advance_watermark(self, playlogs_data: list) -> None:
+        """
+        將 watermark 推進到這次收集到的最新 played_at（只會往前推進）
+
+        :param playlogs_data: List[PlayLogSchemas.CreateData]
+        """
+        if not playlogs_data:
+            return
+
+        latest_played_at = max(data.played_at for data in playlogs_data)
+        _, created = HistoryPlayLogWatermark.objects.get_or_create(
+            member=self.member,
+            provider=self.provider,
+            defaults={'last_played_at': latest_played_at},
+        )
+        if created:
+            return
+        # 條件式 UPDATE：同時執行的收集不會以較舊的值覆蓋已推進的 watermark
+        HistoryPlayLogWatermark.objects.filter(
+            Q(last_played_at__isnull=True) | Q(last_played_at__lt=latest_played_at),
+            member=self.member,
+            provider=self.provider,
+        ).update(last_played_at=latest_played_at, updated_at=timezone.now())
+
+    def _fetch_all_recently_played(self, start_ts: int) -> list:
         """
         從 Spotify API 獲取所有播放記錄（處理分頁）
 
@@ -134,12 +198,9 @@ class SpotifyPlayLogService:
         第一頁用 after=起始時間 取得範圍內資料，
         後續頁用 cursors.before 往更舊的方向翻頁。
 
-        :param days: 獲取最近幾天的數據
+        :param start_ts: 起始時間（Unix timestamp，毫秒）
         :return: Spotify API 返回的 items 列表
         """
-        now = timezone.now()
-        start_ts = int((now - timezone.timedelta(days=days)).timestamp() * 1000)
-
         all_items = []
 
         data = self.handler.fetch_recently_played_raw(after=start_ts, limit=50)
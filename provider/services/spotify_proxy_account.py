@@ -29,12 +29,13 @@ class SpotifyProxyAccountService:
     def acquire_proxy_account(member) -> ServiceResult:
         platform = SpotifyProxyAccountService.PLATFORM
 
-        # 1. 檢查快取
+        # 1. 檢查快取（再確認 DB 上仍分配給此 member，避免使用已被釋放 / 轉移的快取）
         cached_data = MemberProviderProxyAccountCache.get_cache(platform, member.id)
         if cached_data:
             proxy_account = (
                 ProviderProxyAccount.objects.filter(
-                    code=cached_data['proxy_account_code']
+                    code=cached_data['proxy_account_code'],
+                    current_member_id=member.id,
                 )
                 .select_related('provider')
                 .first()
@@ -80,11 +81,8 @@ class SpotifyProxyAccountService:
                 )
 
                 if existing_proxy:
-                    MemberProviderProxyAccountCache.set_cache(
-                        platform,
-                        member.id,
-                        existing_proxy.code,
-                        existing_proxy.provider.code,
+                    SpotifyProxyAccountService._set_cache_on_commit(
+                        member.id, existing_proxy
                     )
                     proxy_account = existing_proxy
                 else:
@@ -101,11 +99,8 @@ class SpotifyProxyAccountService:
                     proxy_account.current_member = member
                     proxy_account.save()
 
-                    MemberProviderProxyAccountCache.set_cache(
-                        platform,
-                        member.id,
-                        proxy_account.code,
-                        proxy_account.provider.code,
+                    SpotifyProxyAccountService._set_cache_on_commit(
+                        member.id, proxy_account
                     )
 
             # 5. transaction 結束後取得並驗證 token（避免持 lock 期間做外部 HTTP call）
@@ -178,8 +173,12 @@ class SpotifyProxyAccountService:
                 proxy_account.current_member = None
                 proxy_account.save()
 
-                # 4. 刪除快取
-                MemberProviderProxyAccountCache.delete_cache(platform, member.id)
+                # 4. 刪除快取（commit 後，避免其他 request 在 commit 前讀回舊的分配）
+                transaction.on_commit(
+                    lambda: MemberProviderProxyAccountCache.delete_cache(
+                        platform, member.id
+                    )
+                )
 
             return ServiceResult(
                 success=True,
@@ -199,6 +198,18 @@ class SpotifyProxyAccountService:
             # 5. 釋放鎖
             MemberProviderProxyAccountCache.release_lock(platform, member.id)
 
+    @staticmethod
+    def _set_cache_on_commit(member_id, proxy_account):
+        """transaction commit 後才寫入快取，rollback 時不會留下不存在的分配"""
+        platform = SpotifyProxyAccountService.PLATFORM
+        proxy_account_code = proxy_account.code
+        provider_code = proxy_account.provider.code
+        transaction.on_commit(
+            lambda: MemberProviderProxyAccountCache.set_cache(
+                platform, member_id, proxy_account_code, provider_code
+            )
+        )
+
     @staticmethod
     def _mark_proxy_account_inactive_and_clear_cache(proxy_account, member_id):
         """
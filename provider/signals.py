@@ -5,7 +5,8 @@ Provider app signals
 """
 import logging
 
-from django.db.models.signals import pre_save
+from django.db import transaction
+from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 
 from provider.caches import MemberProviderProxyAccountCache
@@ -15,7 +16,32 @@ logger = logging.getLogger(__name__)
 
 
 @receiver(pre_save, sender=ProviderProxyAccount)
-def clear_proxy_account_cache_on_release(sender, instance, **kwargs):
+def track_proxy_account_member_change(sender, instance, **kwargs):
+    """
+    記錄 ProviderProxyAccount 儲存前的 current_member，供 post_save 判斷是否需要清除快取
+    """
+    instance._previous_member_state = None
+
+    # 如果是新建的實例，不需要處理
+    if instance.pk is None:
+        return
+
+    previous = (
+        ProviderProxyAccount.objects.filter(pk=instance.pk)
+        .values_list('current_member_id', 'provider__platform')
+        .first()
+    )
+    if previous is None:
+        # 理論上不應該發生，但為了安全起見
+        logger.warning(
+            f"ProviderProxyAccount with pk={instance.pk} not found in signal handler"
+        )
+        return
+    instance._previous_member_state = previous
+
+
+@receiver(post_save, sender=ProviderProxyAccount)
+def clear_proxy_account_cache_on_release(sender, instance, created, **kwargs):
     """
     當 ProviderProxyAccount 的 current_member 改變時清除快取
 
@@ -23,34 +49,31 @@ def clear_proxy_account_cache_on_release(sender, instance, **kwargs):
     - Admin 在 Django Admin 中手動 release proxy account
     - 其他直接修改 current_member 的情況
 
-    注意：Service 層的 release_proxy_account 已經處理快取清除，
-    這個 signal 主要是防止繞過 Service 層直接修改的情況
+    get_cache 為 read-through，transaction commit 前清除的話，其他 request 可能在
+    commit 前重新讀到舊的分配並寫回快取，因此在 transaction commit 後才清除。
     """
-    # 如果是新建的實例，不需要處理
-    if instance.pk is None:
+    previous = getattr(instance, '_previous_member_state', None)
+    if created or previous is None:
         return
 
-    try:
-        # 獲取資料庫中的舊值
-        old_instance = ProviderProxyAccount.objects.get(pk=instance.pk)
-        old_member = old_instance.current_member
-        new_member = instance.current_member
+    old_member_id, platform = previous
+    new_member_id = instance.current_member_id
 
-        # 如果 current_member 沒有改變，不需要處理
-        if old_member == new_member:
-            return
+    # 如果 current_member 沒有改變，不需要處理
+    if old_member_id == new_member_id:
+        return
 
+    def clear_cache():
         # 如果舊的 member 存在且被改變（釋放或轉移），清除該 member 的快取
-        if old_member:
-            platform = old_instance.provider.platform
-            MemberProviderProxyAccountCache.delete_cache(platform, old_member.id)
+        if old_member_id:
+            MemberProviderProxyAccountCache.delete_cache(platform, old_member_id)
             logger.info(
-                f"Cleared proxy account cache for member {old_member.id} "
+                f"Cleared proxy account cache for member {old_member_id} "
                 f"(platform: {platform}, proxy_account: {instance.code})"
             )
 
-    except ProviderProxyAccount.DoesNotExist:
-        # 理論上不應該發生，但為了安全起見
-        logger.warning(
-            f"ProviderProxyAccount with pk={instance.pk} not found in signal handler"
-        )
+        # 新的 member 可能有「沒有分配」的 negative cache，一併清除
+        if new_member_id:
+            MemberProviderProxyAccountCache.delete_cache(platform, new_member_id)
+
+    transaction.on_commit(clear_cache)
@@ -1,47 +1,80 @@
+from collections import defaultdict
+
 import sentry_sdk
 from celery import shared_task
 from celery.utils.log import get_task_logger
-from django.db.models import Q
+from django.conf import settings
+from django.utils import timezone
 
 from account.models import Member
 from listening_profile.models import HistoryPlayLogContext
+from provider.caches import ProviderRateLimitCache
 from provider.exceptions import ProviderException
-from provider.handlers.spotify import SpotifyAPIProviderHandler
-from provider.models import Provider
+from provider.handlers.spotify import (
+    SpotifyAPIProviderHandler,
+    SpotifyAppAPIProviderHandler,
+)
+from provider.models import MemberAPIToken, Provider, ProviderProxyAccountAPIToken
 from track.models import Artist
-from track.serializers import ArtistSerializer
-from track.services.model_helpers import bulk_create_genres
+from track.services.model_helpers import bulk_create_genres, sync_m2m_through_rows
 from utils.constants import ResponseCode
+from utils.utils import get_class_from_path
 
 logger = get_task_logger(__name__)
 
 
+def _get_catalog_handler(member_id=None):
+    """
+    取得呼叫 catalog API（artists / playlists）的 handler
+
+    :param member_id: 指定時使用該 member 的 token，否則從 app token pool 輪流挑選 provider
+    :return: SpotifyAPIProviderHandler 或 SpotifyAppAPIProviderHandler，沒有可用的 provider 時為 None
+    """
+    if member_id is None:
+        handler = SpotifyAppAPIProviderHandler.from_pool()
+        if not handler:
+            logger.error('No Spotify provider with client credentials configured')
+        return handler
+
+    member = Member.objects.select_related('spotify_provider').get(id=member_id)
+    if not member.spotify_provider:
+        logger.error(f"Member {member_id} has no spotify_provider assigned")
+        return None
+    return SpotifyAPIProviderHandler(member.spotify_provider, member=member)
+
+
 @shared_task(bind=True, max_retries=3, default_retry_delay=60, queue='playlog_q')
-def update_artists_details(self, artist_ids, member_id):
+def update_artists_details(self, artist_ids, member_id=None):
+    """
+    向 Spotify 補齊 artists 的 popularity / followers / genres
+
+    :param artist_ids: List of Artist external IDs（max 50）
+    :param member_id: 指定時使用該 member 的 token，預設使用 app token pool
+    """
     if not artist_ids:
         return []
 
-    member = Member.objects.get(id=member_id)
-    provider = member.spotify_provider
-
-    if not provider:
-        logger.error(f"Member {member_id} has no spotify_provider assigned")
+    handler = _get_catalog_handler(member_id)
+    if not handler:
         return []
+    provider = handler.provider
 
     try:
-        handler = SpotifyAPIProviderHandler(provider, member=member)
-        artists_data = handler.api_interface.get_several_artists(artist_ids)
+        artists_data = handler.fetch_several_artists(artist_ids)
     except ProviderException as e:
         if e.code == ResponseCode.EXTERNAL_API_REAUTH_REQUIRED or e.status_code in {
             401,
             403,
         }:
-            sentry_sdk.capture_exception(e, extras={'member_id': member_id})
+            sentry_sdk.capture_exception(
+                e, extras={'member_id': member_id, 'provider': provider.code}
+            )
             logger.error(
-                f"Member {member_id} Spotify auth invalid, skipping artist update"
+                f"Provider {provider.code} (member {member_id}) Spotify auth invalid, "
+                f"skipping artist update"
             )
             return []
-        raise self.retry(exc=e)
+        raise self.retry(exc=e, countdown=e.retry_after)
 
     artists_external_id_mapping = {
         artist.external_id: artist
@@ -51,69 +84,85 @@ def update_artists_details(self, artist_ids, member_id):
         )
     }
 
-    all_genre_dicts = []
-    for artist_data in artists_data.get('artists', []):
-        for genre_name in artist_data.get('genres', []):
-            all_genre_dicts.append({'name': genre_name, 'category': None})
+    # 查無此 artist 時 Spotify 會回傳 null，跳過後由下方標記為 failed
+    artists_payload = [data for data in artists_data.get('artists', []) if data]
 
+    # 只處理 DB 中存在且有名稱的 artist
+    artist_updates = []
+    for artist_data in artists_payload:
+        artist = artists_external_id_mapping.get(artist_data.get('id'))
+        if not artist:
+            continue
+        if not artist_data.get('name'):
+            logger.warning(f"Invalid artist data: {artist_data.get('id')} has no name")
+            continue
+        artist_updates.append((artist, artist_data))
+
+    all_genre_dicts = [
+        {'name': genre_name, 'category': None}
+        for _, artist_data in artist_updates
+        for genre_name in artist_data.get('genres', [])
+    ]
     genre_map = bulk_create_genres(all_genre_dicts, provider.id)
 
     artists_to_update = []
-    for artist_data in artists_data.get('artists', []):
-        serializer = ArtistSerializer(
-            data={
-                'external_id': artist_data.get('id'),
-                'name': artist_data.get('name', ''),
-                'popularity': artist_data.get('popularity'),
-                'followers_count': artist_data.get('followers', {}).get('total'),
-                'genres': artist_data.get('genres', []),
-            }
-        )
-        if serializer.is_valid():
-            artist = artists_external_id_mapping.get(artist_data.get('id'))
-            if artist:
-                artist.name = artist_data.get('name', '')
-                artist.popularity = artist_data.get('popularity')
-                artist.followers_count = artist_data.get('followers', {}).get('total')
-                genre_objs = [
-                    genre_map[name]
-                    for name in artist_data.get('genres', [])
-                    if name in genre_map
-                ]
-                if genre_objs:
-                    artist.genres.set(genre_objs)
-                artists_to_update.append(artist)
-        else:
-            logger.warning(f"Invalid artist data: {serializer.errors}")
+    desired_genre_pairs = {}
+    for artist, artist_data in artist_updates:
+        artist.name = artist_data['name']
+        artist.popularity = artist_data.get('popularity')
+        artist.followers_count = (artist_data.get('followers') or {}).get('total')
+        genre_ids = {
+            genre_map[name].id
+            for name in artist_data.get('genres', [])
+            if name in genre_map
+        }
+        # Spotify 沒有回傳 genres 時保留既有的關聯
+        if genre_ids:
+            desired_genre_pairs[artist.id] = genre_ids
+        artists_to_update.append(artist)
+
+    # 一次比對既有關聯，再以 bulk insert + bulk delete 同步（取代逐筆 genres.set()）
+    sync_m2m_through_rows(Artist.genres.through, 'artist', 'genre', desired_genre_pairs)
+
+    # Spotify 回傳完整資料的標記為 done；沒有回傳或欄位仍為 null 的以指數退避延後重試
+    done_external_ids = set()
+    for artist in artists_to_update:
+        if (
+            artist.name
+            and artist.popularity is not None
+            and artist.followers_count is not None
+        ):
+            artist.enrichment_status = Artist.EnrichmentStatusOptions.DONE
+            artist.enrichment_next_attempt_at = None
+            done_external_ids.add(artist.external_id)
+
     if artists_to_update:
         Artist.objects.bulk_update(
-            artists_to_update, ['name', 'popularity', 'followers_count']
+            artists_to_update,
+            [
+                'name',
+                'popularity',
+                'followers_count',
+                'enrichment_status',
+                'enrichment_next_attempt_at',
+            ],
         )
         logger.info(
             f"Bulk updated {len(artists_to_update)} artists with popularity, followers_count, and genres."
         )
     else:
         logger.info('No artists to bulk update.')
-    return [a.external_id for a in artists_to_update]
-
 
-def _get_valid_staff_member():
-    for candidate in Member.objects.filter(
-        role=Member.RoleOptions.STAFF,
-        spotify_provider__isnull=False,
-    ):
-        try:
-            handler = SpotifyAPIProviderHandler(
-                candidate.spotify_provider, member=candidate
-            )
-            if handler.refresh_token():
-                return candidate
-        except ProviderException as e:
-            logger.warning(
-                f"Staff member {candidate.id} token error ({e.code}), trying next candidate"
-            )
-            continue
-    return None
+    failed_external_ids = set(artists_external_id_mapping) - done_external_ids
+    if failed_external_ids:
+        Artist.objects.filter(
+            id__in=[
+                artists_external_id_mapping[external_id].id
+                for external_id in failed_external_ids
+            ]
+        ).mark_enrichment_failed()
+        logger.info(f"Artist enrichment failed for {len(failed_external_ids)} artists")
+    return [a.external_id for a in artists_to_update]
 
 
 @shared_task(queue='playlog_q')
@@ -121,23 +170,25 @@ def check_and_update_missing_artist_details():
     """
     檢查並更新缺少詳細資訊的 artists
 
-    分批處理以避免 Spotify API 限制（一次最多 50 個）
+    只挑選 enrichment 到期（pending 或退避時間已過的 failed）的 artists，
+    派送前先 lease，task 完成前下一次 sweep 不會重複派送。
+    分批處理以避免 Spotify API 限制（一次最多 50 個），每批由 task 從 app token pool 挑選 provider
     """
-    staff_member = _get_valid_staff_member()
-    if not staff_member:
-        logger.warning('No valid staff member found for updating artist details')
-        return
-
-    # 查詢所有 Spotify platform 缺少詳細資訊的 artists
-    artists = Artist.objects.filter(
-        provider__platform=Provider.PlatformOptions.SPOTIFY
-    ).filter(Q(popularity__isnull=True) | Q(followers_count__isnull=True) | Q(name=''))
-    artist_ids = list(artists.values_list('external_id', flat=True))
+    # 查詢所有 Spotify platform 待補齊的 artists
+    due_artists = list(
+        Artist.objects.due()
+        .filter(provider__platform=Provider.PlatformOptions.SPOTIFY)
+        .order_by('enrichment_next_attempt_at')
+        .values_list('id', 'external_id')
+    )
 
-    if not artist_ids:
+    if not due_artists:
         logger.info('No artists need updating')
         return
 
+    Artist.objects.filter(id__in=[pk for pk, _ in due_artists]).lease()
+    artist_ids = [external_id for _, external_id in due_artists]
+
     # Spotify API 一次最多支援 50 個 artists
     batch_size = 50
     total_batches = (len(artist_ids) + batch_size - 1) // batch_size
@@ -152,13 +203,42 @@ def check_and_update_missing_artist_details():
         end_idx = min((i + 1) * batch_size, len(artist_ids))
         batch_ids = artist_ids[start_idx:end_idx]
 
-        update_artists_details.s(batch_ids, staff_member.id).apply_async(
-            queue='playlog_q'
+        update_artists_details.s(batch_ids).apply_async(queue='playlog_q')
+
+
+@shared_task(queue='playlog_q')
+def flush_artist_enrichment_buffer():
+    """
+    將 ArtistEnrichmentBuffer 中新 artist 的 external_id 送去補齊資料
+
+    每批剛好 50 個（一次 get_several_artists），不滿一批的在最舊的 id 等待超過
+    ARTIST_ENRICHMENT_FLUSH_DEADLINE 秒後才送出；派送前與 sweep 相同先 lease。
+    """
+    from track.caches import ArtistEnrichmentBuffer
+
+    while True:
+        batch_ids = ArtistEnrichmentBuffer.pop_batch(
+            settings.ARTIST_ENRICHMENT_FLUSH_DEADLINE
         )
+        if not batch_ids:
+            return
+
+        Artist.objects.filter(
+            external_id__in=batch_ids,
+            provider__platform=Provider.PlatformOptions.SPOTIFY,
+        ).lease()
+        update_artists_details.s(batch_ids).apply_async(queue='playlog_q')
+        logger.info(f"Flushed {len(batch_ids)} buffered artists for enrichment")
 
 
 @shared_task(bind=True, max_retries=3, default_retry_delay=60, queue='playlog_q')
-def collect_member_recently_play_logs(self, member_id):
+def collect_member_recently_play_logs(self, member_id, recover=False):
+    """
+    收集單一 member 的播放記錄
+
+    :param member_id: Member ID
+    :param recover: True 時忽略 watermark，重新收集完整範圍（補資料用）
+    """
     try:
         member = Member.objects.get(id=member_id)
         provider = member.spotify_provider
@@ -171,8 +251,9 @@ def collect_member_recently_play_logs(self, member_id):
         from provider.services import SpotifyPlayLogService
 
         service = SpotifyPlayLogService(provider, member)
+        # 平常只請求 watermark 之後的資料；沒有 watermark 時才使用完整範圍
         # Spotify can only get up to 1 day of recently played logs
-        service.collect_recently_played_logs(days=3)
+        service.collect_recently_played_logs(days=3, recover=recover)
         logger.info(f"Collected logs for member {member.id}")
     except ProviderException as e:
         if e.code == ResponseCode.EXTERNAL_API_REAUTH_REQUIRED or e.status_code in {
@@ -185,7 +266,7 @@ def collect_member_recently_play_logs(self, member_id):
             )
             return
         logger.warning(f"Failed to collect logs for member {member_id}: {e}")
-        raise self.retry(exc=e)
+        raise self.retry(exc=e, countdown=e.retry_after)
     except Exception as e:
         logger.warning(f"Failed to collect logs for member {member_id}: {e}")
         raise self.retry(exc=e)
@@ -203,27 +284,24 @@ def collect_all_members_recently_played_logs():
 
 
 @shared_task(bind=True, max_retries=3, default_retry_delay=60, queue='playlog_q')
-def update_playlist_context_details(self, context_ids, member_id):
+def update_playlist_context_details(self, context_ids, member_id=None):
     """
     更新 playlist context 的 details（異步任務）
 
     :param context_ids: List of HistoryPlayLogContext IDs
-    :param member_id: Member ID (用於取得 access token)
+    :param member_id: 指定時使用該 member 的 token，預設使用 app token pool
     """
     from listening_profile.services import HistoryPlayLogContextService
 
     if not context_ids:
         return []
 
-    member = Member.objects.get(id=member_id)
-    provider = member.spotify_provider
-
-    if not provider:
-        logger.error(f"Member {member_id} has no spotify_provider assigned")
+    handler = _get_catalog_handler(member_id)
+    if not handler:
         return []
+    provider = handler.provider
 
     try:
-        handler = SpotifyAPIProviderHandler(provider, member=member)
         updated = HistoryPlayLogContextService.update_playlist_details(
             context_ids, handler.api_interface
         )
@@ -232,12 +310,15 @@ def update_playlist_context_details(self, context_ids, member_id):
             401,
             403,
         }:
-            sentry_sdk.capture_exception(e, extras={'member_id': member_id})
+            sentry_sdk.capture_exception(
+                e, extras={'member_id': member_id, 'provider': provider.code}
+            )
             logger.error(
-                f"Member {member_id} Spotify auth invalid, skipping context update"
+                f"Provider {provider.code} (member {member_id}) Spotify auth invalid, "
+                f"skipping context update"
             )
             return []
-        raise self.retry(exc=e)
+        raise self.retry(exc=e, countdown=e.retry_after)
 
     logger.info(f"Updated {len(updated)} playlist contexts")
     return updated
@@ -248,26 +329,23 @@ def check_and_update_missing_playlist_context_details():
     """
     檢查並更新缺少 details 的 playlist contexts
 
-    定期執行，批次處理需要更新的 contexts
+    定期執行，只挑選 enrichment 到期的 contexts，派送前先 lease，批次處理需要更新的 contexts，
+    每批由 task 從 app token pool 挑選 provider
     """
-    staff_member = _get_valid_staff_member()
-    if not staff_member:
-        logger.warning(
-            'No valid staff member found for updating playlist context details'
-        )
-        return
-
-    # 查詢所有 playlist 類型且缺少 details 的 contexts
-    contexts = HistoryPlayLogContext.objects.filter(
-        type=HistoryPlayLogContext.TypeOptions.PLAYLIST
-    ).filter(Q(details__isnull=True) | Q(details={}))
-
-    context_ids = list(contexts.values_list('id', flat=True))
+    # 查詢所有 playlist 類型且待補齊 details 的 contexts
+    context_ids = list(
+        HistoryPlayLogContext.objects.due()
+        .filter(type=HistoryPlayLogContext.TypeOptions.PLAYLIST)
+        .order_by('enrichment_next_attempt_at')
+        .values_list('id', flat=True)
+    )
 
     if not context_ids:
         logger.info('No playlist contexts need updating')
         return
 
+    HistoryPlayLogContext.objects.filter(id__in=context_ids).lease()
+
     # 批次大小設為 50（可以根據 API rate limit 調整）
     batch_size = 50
     total_batches = (len(context_ids) + batch_size - 1) // batch_size
@@ -282,6 +360,132 @@ def check_and_update_missing_playlist_context_details():
         end_idx = min((i + 1) * batch_size, len(context_ids))
         batch_ids = context_ids[start_idx:end_idx]
 
-        update_playlist_context_details.s(batch_ids, staff_member.id).apply_async(
-            queue='playlog_q'
+        update_playlist_context_details.s(batch_ids).apply_async(queue='playlog_q')
+
+
+@shared_task(queue='playlog_q')
+def refresh_expiring_api_tokens():
+    """
+    在 access token 到期前主動 refresh（member 與 proxy account）
+
+    找出 PROVIDER_TOKEN_REFRESH_AHEAD 秒內到期、且有 refresh token 的 token
+    （已過期超過 PROVIDER_TOKEN_REFRESH_GRACE 秒的不再處理），
+    依 provider 分組後分批交給 refresh_provider_api_tokens，
+    讓 cache 在到期前就被新 token 取代，請求路徑不需同步 refresh。
+    """
+    now = timezone.now()
+    threshold = now + timezone.timedelta(seconds=settings.PROVIDER_TOKEN_REFRESH_AHEAD)
+    grace_threshold = now - timezone.timedelta(
+        seconds=settings.PROVIDER_TOKEN_REFRESH_GRACE
+    )
+
+    member_token_ids = defaultdict(list)
+    for token_id, provider_id in MemberAPIToken.objects.filter(
+        expires_at__lte=threshold,
+        expires_at__gte=grace_threshold,
+        _refresh_token__isnull=False,
+    ).values_list('id', 'provider_id'):
+        member_token_ids[provider_id].append(token_id)
+
+    proxy_token_ids = defaultdict(list)
+    for token_id, provider_id in ProviderProxyAccountAPIToken.objects.filter(
+        expires_at__lte=threshold,
+        expires_at__gte=grace_threshold,
+        _refresh_token__isnull=False,
+        proxy_account__is_active=True,
+    ).values_list('id', 'proxy_account__provider_id'):
+        proxy_token_ids[provider_id].append(token_id)
+
+    provider_ids = set(member_token_ids) | set(proxy_token_ids)
+    if not provider_ids:
+        logger.info('No api tokens need refreshing')
+        return
+
+    batch_size = settings.PROVIDER_TOKEN_REFRESH_BATCH_SIZE
+    for provider_id in provider_ids:
+        logger.info(
+            f"Provider {provider_id}: refreshing "
+            f"{len(member_token_ids[provider_id])} member tokens, "
+            f"{len(proxy_token_ids[provider_id])} proxy account tokens"
         )
+        for i in range(0, len(member_token_ids[provider_id]), batch_size):
+            refresh_provider_api_tokens.s(
+                provider_id,
+                member_token_ids=member_token_ids[provider_id][i : i + batch_size],
+            ).apply_async(queue='playlog_q')
+        for i in range(0, len(proxy_token_ids[provider_id]), batch_size):
+            refresh_provider_api_tokens.s(
+                provider_id,
+                proxy_token_ids=proxy_token_ids[provider_id][i : i + batch_size],
+            ).apply_async(queue='playlog_q')
+
+
+@shared_task(queue='playlog_q')
+def refresh_provider_api_tokens(
+    provider_id, member_token_ids=None, proxy_token_ids=None
+):
+    """
+    refresh 同一個 provider 的一批 token（依 provider 限流）
+
+    refresh 結果透過 handler.refresh_token() → process_token 寫回 DB 與 token cache。
+    單一 token refresh 失敗只記錄 log，交由請求路徑的 reauth 流程處理；
+    refresh token 已被撤銷（invalid_grant）時與 with_reauth 相同清除 DB + cache，
+    避免每次排程都重新挑選到同一個 token。
+
+    :param provider_id: Provider ID
+    :param member_token_ids: List of MemberAPIToken IDs
+    :param proxy_token_ids: List of ProviderProxyAccountAPIToken IDs
+    :return: refresh 成功的 token 數量
+    """
+    provider = Provider.objects.filter(id=provider_id).first()
+    if not provider:
+        logger.error(f"Provider {provider_id} not found")
+        return 0
+
+    handler_class = get_class_from_path(provider.api_handler)
+    handlers = [
+        handler_class(provider, member=token.member)
+        for token in MemberAPIToken.objects.filter(
+            id__in=member_token_ids or [], provider=provider
+        ).select_related('member')
+    ] + [
+        handler_class(provider, proxy_account=token.proxy_account)
+        for token in ProviderProxyAccountAPIToken.objects.filter(
+            id__in=proxy_token_ids or [], proxy_account__provider=provider
+        ).select_related('proxy_account')
+    ]
+
+    # token endpoint 與 Web API 分開計算額度
+    rate_limit_key = (
+        f"{ProviderRateLimitCache.get_rate_limit_key(provider)}:token_refresh"
+    )
+    refreshed_count = 0
+    for handler in handlers:
+        owner = handler.member or handler.proxy_account
+        if not ProviderRateLimitCache.acquire(
+            rate_limit_key,
+            capacity=settings.PROVIDER_TOKEN_REFRESH_RATE,
+            refill_rate=settings.PROVIDER_TOKEN_REFRESH_RATE,
+            max_wait=settings.PROVIDER_RATE_LIMIT_MAX_WAIT,
+        ):
+            logger.warning(
+                f"Provider {provider.code} token refresh throttled, "
+                f"remaining tokens will be retried next run"
+            )
+            break
+        try:
+            if handler.refresh_token():
+                refreshed_count += 1
+        except ProviderException as e:
+            logger.warning(
+                f"Failed to refresh {owner.__class__.__name__} {owner.id} token "
+                f"for provider {provider.code}: {e.code} {e.status_code}"
+            )
+            if (e.details or {}).get('error') == 'invalid_grant':
+                handler._invalidate_cache()
+                handler._invalidate_db()
+
+    logger.info(
+        f"Provider {provider.code}: refreshed {refreshed_count}/{len(handlers)} tokens"
+    )
+    return refreshed_count
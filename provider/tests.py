@@ -1,3 +1,484 @@
-from django.test import TestCase
+import io
+import json
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from urllib3 import HTTPResponse
+
+from account.models import Member
+from listening_profile.models import HistoryPlayLogWatermark
+from provider import tasks
+from provider.caches import (
+    APITokenRefreshLockCache,
+    MemberAPITokenCache,
+    MemberProviderProxyAccountCache,
+    ProviderAppTokenCache,
+    ProviderRateLimitCache,
+)
+from provider.checks import check_rate_limit_settings
+from provider.exceptions import ProviderException
+from provider.handlers.spotify import (
+    SpotifyAPIProviderHandler,
+    SpotifyAppAPIProviderHandler,
+)
+from provider.interfaces.spotify import (
+    SpotifyAPIProviderInterface,
+    SpotifyAuthProviderInterface,
+)
+from provider.models import MemberAPIToken, Provider, ProviderProxyAccount
+from provider.services.spotify_playlog import SpotifyPlayLogService
+from track.models import Artist, Genre
+from utils.constants import ResponseCode
+
+
+class UpdateArtistsDetailsQueryCountTests(TestCase):
+    # artists + genres（provider / 既有 / bulk insert / 取回新增）
+    # + genre 關聯（既有 / bulk insert / bulk delete）+ bulk_update artists
+    BATCH_QUERY_COUNT = 9
+    BATCH_SIZE = 50
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.provider = Provider.objects.create(
+            name='spotify',
+            code='spotify',
+            platform=Provider.PlatformOptions.SPOTIFY,
+            category=Provider.CategoryOptions.MUSIC,
+            auth_type=Provider.AuthTypeOptions.OAUTH2,
+        )
+        stale_genre = Genre.objects.create(name='stale', provider=cls.provider)
+        for i in range(cls.BATCH_SIZE):
+            artist = Artist.objects.create(
+                external_id=f"artist-{i}", name='', provider=cls.provider
+            )
+            artist.genres.add(stale_genre)
+
+    def _update(self, size):
+        artist_ids = [f"artist-{i}" for i in range(size)]
+        response = {
+            'artists': [
+                {
+                    'id': external_id,
+                    'name': external_id,
+                    'popularity': 50,
+                    'followers': {'total': 100},
+                    'genres': [f"{external_id}-genre", 'pop'],
+                }
+                for external_id in artist_ids
+            ]
+        }
+        handler = mock.Mock(provider=self.provider)
+        handler.fetch_several_artists.return_value = response
+        with mock.patch.object(
+            tasks.SpotifyAppAPIProviderHandler, 'from_pool', return_value=handler
+        ), self.assertNumQueries(self.BATCH_QUERY_COUNT):
+            return tasks.update_artists_details(artist_ids)
+
+    def test_query_count_is_constant_per_batch(self):
+        self.assertEqual(len(self._update(self.BATCH_SIZE)), self.BATCH_SIZE)
+
+        artist = Artist.objects.get(external_id='artist-0')
+        self.assertEqual(
+            set(artist.genres.values_list('name', flat=True)),
+            {'artist-0-genre', 'pop'},
+        )
+        self.assertEqual(artist.enrichment_status, Artist.EnrichmentStatusOptions.DONE)
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        self.assertEqual(len(self._update(5)), 5)
+
+
+class SpotifyAppAPIProviderHandlerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.provider = Provider.objects.create(
+            name='spotify-app',
+            code='spotify-app',
+            platform=Provider.PlatformOptions.SPOTIFY,
+            category=Provider.CategoryOptions.MUSIC,
+            auth_type=Provider.AuthTypeOptions.OAUTH2,
+            auth_details={'client_id': 'id', 'client_secret': 'secret'},
+        )
+        Provider.objects.create(
+            name='spotify-no-credentials',
+            code='spotify-no-credentials',
+            platform=Provider.PlatformOptions.SPOTIFY,
+            category=Provider.CategoryOptions.MUSIC,
+            auth_type=Provider.AuthTypeOptions.OAUTH2,
+        )
+
+    def setUp(self):
+        ProviderAppTokenCache.delete_token(self.provider.code)
+
+    def test_pool_only_contains_providers_with_client_credentials(self):
+        for _ in range(3):
+            self.assertEqual(
+                SpotifyAppAPIProviderHandler.from_pool().provider, self.provider
+            )
+
+    def test_app_token_is_cached_until_refreshed(self):
+        with mock.patch.object(
+            SpotifyAuthProviderInterface,
+            'request_client_credentials_token',
+            return_value={'access_token': 'app-token', 'expires_in': 3600},
+        ) as request_token:
+            for _ in range(3):
+                handler = SpotifyAppAPIProviderHandler(self.provider)
+                self.assertEqual(handler.get_access_token(), 'app-token')
+
+            handler.refresh_token()
+        self.assertEqual(request_token.call_count, 2)
+
+
+class RefreshExpiringAPITokensTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.provider = Provider.objects.create(
+            name='spotify',
+            code='spotify',
+            platform=Provider.PlatformOptions.SPOTIFY,
+            category=Provider.CategoryOptions.MUSIC,
+            auth_type=Provider.AuthTypeOptions.OAUTH2,
+            api_handler='provider.handlers.spotify.SpotifyAPIProviderHandler',
+        )
+
+    def _create_token(self, name, expires_in):
+        member = Member.objects.create(email=f"{name}@example.com", name=name)
+        token = MemberAPIToken(
+            member=member,
+            provider=self.provider,
+            expires_at=timezone.now() + timezone.timedelta(seconds=expires_in),
+        )
+        token.access_token = 'access-token'
+        token.refresh_token = 'refresh-token'
+        token.save()
+        return token
+
+    def test_tokens_expired_beyond_grace_are_not_selected(self):
+        expiring = self._create_token('expiring', 60)
+        self._create_token('abandoned', -2 * 60 * 60 * 24)
+
+        with mock.patch.object(tasks.refresh_provider_api_tokens, 's') as signature:
+            tasks.refresh_expiring_api_tokens()
+
+        signature.assert_called_once_with(
+            self.provider.id, member_token_ids=[expiring.id]
+        )
+
+    def test_revoked_refresh_token_is_removed(self):
+        token = self._create_token('revoked', 60)
+        error = ProviderException(
+            'invalid_grant',
+            'Refresh token revoked',
+            details={'error': 'invalid_grant'},
+            status_code=400,
+        )
+
+        with mock.patch.object(
+            tasks.ProviderRateLimitCache, 'acquire', return_value=True
+        ), mock.patch.object(
+            SpotifyAPIProviderHandler, 'refresh_token', side_effect=error
+        ):
+            tasks.refresh_provider_api_tokens(
+                self.provider.id, member_token_ids=[token.id]
+            )
+
+        self.assertFalse(MemberAPIToken.objects.filter(id=token.id).exists())
+
+
+class ProxyAccountCacheInvalidationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.provider = Provider.objects.create(
+            name='spotify',
+            code='spotify',
+            platform=Provider.PlatformOptions.SPOTIFY,
+            category=Provider.CategoryOptions.MUSIC,
+            auth_type=Provider.AuthTypeOptions.OAUTH2,
+        )
+        cls.member = Member.objects.create(email='member@example.com', name='member')
+
+    def setUp(self):
+        self.platform = self.provider.platform
+        self.proxy_account = ProviderProxyAccount.objects.create(
+            name='proxy',
+            code='proxy',
+            provider=self.provider,
+            current_member=self.member,
+        )
+        MemberProviderProxyAccountCache.set_cache(
+            self.platform, self.member.id, self.proxy_account.code, self.provider.code
+        )
+        self.addCleanup(
+            MemberProviderProxyAccountCache.delete_cache, self.platform, self.member.id
+        )
+
+    def test_cache_is_cleared_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.proxy_account.current_member = None
+            self.proxy_account.save()
+            self.assertIsNotNone(
+                MemberProviderProxyAccountCache.get_cache(self.platform, self.member.id)
+            )
+
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertIsNone(
+            MemberProviderProxyAccountCache.get_cache(self.platform, self.member.id)
+        )
+
+    def test_unrelated_change_does_not_clear_cache(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.proxy_account.name = 'renamed'
+            self.proxy_account.save()
+
+        self.assertEqual(callbacks, [])
+
+
+class APITokenRefreshLockCacheTests(TestCase):
+    OWNER_KEY = 'member:1'
+    PROVIDER_CODE = 'spotify'
+
+    def _lock_key(self):
+        return APITokenRefreshLockCache.compose_lock_key(
+            self.OWNER_KEY, self.PROVIDER_CODE
+        )
+
+    def tearDown(self):
+        APITokenRefreshLockCache.store.delete(self._lock_key())
+
+    def test_release_does_not_delete_lock_taken_over_after_timeout(self):
+        expired_token = APITokenRefreshLockCache.acquire_lock(
+            self.OWNER_KEY, self.PROVIDER_CODE
+        )
+        self.assertIsNone(
+            APITokenRefreshLockCache.acquire_lock(self.OWNER_KEY, self.PROVIDER_CODE)
+        )
+
+        # 模擬鎖逾時後被其他 caller 取得
+        APITokenRefreshLockCache.store.delete(self._lock_key())
+        current_token = APITokenRefreshLockCache.acquire_lock(
+            self.OWNER_KEY, self.PROVIDER_CODE
+        )
+
+        APITokenRefreshLockCache.release_lock(
+            self.OWNER_KEY, self.PROVIDER_CODE, expired_token
+        )
+        self.assertTrue(
+            APITokenRefreshLockCache.is_locked(self.OWNER_KEY, self.PROVIDER_CODE)
+        )
+
+        APITokenRefreshLockCache.release_lock(
+            self.OWNER_KEY, self.PROVIDER_CODE, current_token
+        )
+        self.assertFalse(
+            APITokenRefreshLockCache.is_locked(self.OWNER_KEY, self.PROVIDER_CODE)
+        )
+
+
+class ProviderRateLimitCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.provider = Provider.objects.create(
+            name='spotify',
+            code='spotify',
+            platform=Provider.PlatformOptions.SPOTIFY,
+            category=Provider.CategoryOptions.MUSIC,
+            auth_type=Provider.AuthTypeOptions.OAUTH2,
+            extra_details={'rate_limit': {'refill_rate': 0, 'max_wait': 60}},
+        )
+
+    @override_settings(
+        PROVIDER_RATE_LIMIT_REFILL_RATE=3,
+        PROVIDER_RATE_LIMIT_MAX_WAIT=30,
+        PROVIDER_RATE_LIMIT_WEB_MAX_WAIT=2,
+    )
+    def test_get_options_rejects_non_positive_refill_rate_and_caps_web_wait(self):
+        with self.assertLogs('provider.caches', level='ERROR'):
+            options = ProviderRateLimitCache.get_options(self.provider)
+
+        self.assertEqual(options['refill_rate'], 3)
+        self.assertEqual(options['max_wait'], 2)
+
+    @override_settings(PROVIDER_RATE_LIMIT_MAX_WAIT=30)
+    def test_get_options_keeps_long_wait_in_celery_task(self):
+        self.provider.extra_details = {}
+        with mock.patch.object(
+            ProviderRateLimitCache, '_in_celery_task', return_value=True
+        ):
+            options = ProviderRateLimitCache.get_options(self.provider)
+
+        self.assertEqual(options['max_wait'], 30)
+
+    @override_settings(PROVIDER_RATE_LIMIT_REFILL_RATE=0)
+    def test_system_check_rejects_non_positive_refill_rate(self):
+        errors = check_rate_limit_settings(None)
+
+        self.assertEqual(
+            [error.id for error in errors if 'REFILL_RATE' in error.msg],
+            ['provider.E001'],
+        )
+
+    def test_rate_limited_request_retries_after_bucket_wait(self):
+        interface = SpotifyAPIProviderInterface.__new__(SpotifyAPIProviderInterface)
+        interface.rate_limit_key = 'client-id'
+        interface.rate_limit_options = {
+            'capacity': 10,
+            'refill_rate': 3,
+            'max_wait': 2,
+        }
+        with mock.patch.object(
+            ProviderRateLimitCache, 'ACQUIRE_SCRIPT', return_value=[0, '4.2']
+        ):
+            with self.assertRaises(ProviderException) as cm:
+                interface.acquire_rate_limit()
+
+        self.assertEqual(cm.exception.retry_after, 5)
+
+
+class AsyncSpotifyAPIProviderHandlerTests(TestCase):
+    """
+    afetch_* 經由 AsyncSpotifyAPIProviderInterface 在 thread 中執行 sync interface，
+    以 urllib3 層的假回應確認 retry、429 暫停與 reauth 都沿用 sync 版的行為
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.provider = Provider.objects.create(
+            name='spotify',
+            code='spotify',
+            platform=Provider.PlatformOptions.SPOTIFY,
+            category=Provider.CategoryOptions.MUSIC,
+            auth_type=Provider.AuthTypeOptions.OAUTH2,
+            auth_details={'client_id': 'id', 'client_secret': 'secret'},
+            base_url='https://api.spotify.test/v1',
+        )
+        cls.member = Member.objects.create(email='async@example.com', name='async')
+
+    def setUp(self):
+        token = MemberAPIToken(
+            member=self.member,
+            provider=self.provider,
+            expires_at=timezone.now() + timezone.timedelta(hours=1),
+        )
+        token.access_token = 'old-token'
+        token.refresh_token = 'refresh-token'
+        token.save()
+        MemberAPITokenCache.delete_token(self.member.id, self.provider.code)
+        self.handler = SpotifyAPIProviderHandler(self.provider, member=self.member)
+        self.requests = []
+
+    def _mock_transport(self, *responses):
+        """依序回傳 (status, headers, body)，並記錄每次 request 的 headers"""
+        responses = list(responses)
+
+        def make_request(conn, method, url, body=None, headers=None, **kwargs):
+            self.requests.append(headers)
+            status, response_headers, data = responses.pop(0)
+            return HTTPResponse(
+                body=io.BytesIO(json.dumps(data).encode()),
+                headers={'Content-Type': 'application/json', **response_headers},
+                status=status,
+                preload_content=False,
+            )
+
+        return mock.patch(
+            'urllib3.connectionpool.HTTPConnectionPool._make_request',
+            side_effect=make_request,
+        )
+
+    async def test_server_error_is_retried(self):
+        with mock.patch.object(
+            SpotifyAPIProviderHandler, 'get_access_token', return_value='old-token'
+        ), self._mock_transport(
+            (503, {}, {'error': 'unavailable'}),
+            (200, {}, {'artists': []}),
+        ):
+            result = await self.handler.afetch_several_artists(['artist'])
+
+        self.assertEqual(result, {'artists': []})
+        self.assertEqual(len(self.requests), 2)
+
+    async def test_rate_limited_response_pauses_bucket(self):
+        with mock.patch.object(
+            SpotifyAPIProviderHandler, 'get_access_token', return_value='old-token'
+        ), mock.patch.object(
+            ProviderRateLimitCache, 'pause'
+        ) as pause, self._mock_transport(
+            (429, {'Retry-After': '7'}, {'error': 'rate_limited'})
+        ):
+            with self.assertRaises(ProviderException) as cm:
+                await self.handler.afetch_several_artists(['artist'])
+
+        self.assertEqual(cm.exception.status_code, 429)
+        self.assertEqual(cm.exception.retry_after, 7)
+        pause.assert_called_once_with('id', 7)
+
+    async def test_unauthorized_response_refreshes_token_and_retries(self):
+        with mock.patch.object(
+            SpotifyAPIProviderHandler,
+            'get_access_token',
+            side_effect=['old-token', 'new-token'],
+        ), mock.patch.object(
+            SpotifyAPIProviderHandler, 'refresh_token', return_value='new-token'
+        ), self._mock_transport(
+            (401, {}, {'error': 'invalid_token'}),
+            (200, {}, {'artists': []}),
+        ):
+            result = await self.handler.afetch_several_artists(['artist'])
+
+        self.assertEqual(result, {'artists': []})
+        self.assertEqual(
+            [headers['Authorization'] for headers in self.requests],
+            ['Bearer old-token', 'Bearer new-token'],
+        )
+
+    async def test_repeated_unauthorized_response_requires_reauth(self):
+        with mock.patch.object(
+            SpotifyAPIProviderHandler, 'get_access_token', return_value='old-token'
+        ), mock.patch.object(
+            SpotifyAPIProviderHandler, 'refresh_token', return_value='new-token'
+        ), self._mock_transport(
+            (401, {}, {'error': 'invalid_token'}),
+            (401, {}, {'error': 'invalid_token'}),
+        ):
+            with self.assertRaises(ProviderException) as cm:
+                await self.handler.afetch_several_artists(['artist'])
+
+        self.assertEqual(cm.exception.code, ResponseCode.EXTERNAL_API_REAUTH_REQUIRED)
+        token_exists = await sync_to_async(
+            MemberAPIToken.objects.filter(member=self.member).exists
+        )()
+        self.assertFalse(token_exists)
+
+
+class PlayLogWatermarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.provider = Provider.objects.create(
+            name='spotify',
+            code='spotify',
+            platform=Provider.PlatformOptions.SPOTIFY,
+            category=Provider.CategoryOptions.MUSIC,
+            auth_type=Provider.AuthTypeOptions.OAUTH2,
+        )
+        cls.member = Member.objects.create(email='watermark@example.com', name='wm')
+
+    def _advance(self, played_at):
+        service = SpotifyPlayLogService(self.provider, self.member)
+        service._advance_watermark([SimpleNamespace(played_at=played_at)])
+        return HistoryPlayLogWatermark.objects.get(
+            member=self.member, provider=self.provider
+        ).last_played_at
+
+    def test_watermark_only_moves_forward(self):
+        now = timezone.now()
+
+        self.assertEqual(self._advance(now), now)
+        # 較慢完成的收集帶著較舊的 played_at，不會把 watermark 往回寫
+        self.assertEqual(self._advance(now - timezone.timedelta(hours=1)), now)
+        later = now + timezone.timedelta(minutes=5)
+        self.assertEqual(self._advance(later), later)
@@ -3,7 +3,9 @@ Spotify 資料轉換工具
 
 純函數：將 Spotify API 原始資料轉換為標準化的 dataclass
 """
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 
 from django.utils import timezone
@@ -250,6 +252,7 @@ class SpotifyPaginationHelper:
     """處理 Spotify API pagination 的通用工具類"""
 
     API_LIMIT = 50  # Spotify API 的預設請求限制
+    MAX_WORKERS = 5  # 並行請求時的 thread pool 上限（需 <= PROVIDER_HTTP_POOL_MAXSIZE）
 
     @staticmethod
     def fetch_all_items(api_method, total_limit=None, start_offset=0, **kwargs):
@@ -289,3 +292,136 @@ class SpotifyPaginationHelper:
                 break
 
         return all_items
+
+    @staticmethod
+    def _first_page_limit(total_limit):
+        if total_limit is None:
+            return SpotifyPaginationHelper.API_LIMIT
+        return min(SpotifyPaginationHelper.API_LIMIT, total_limit)
+
+    @staticmethod
+    def _plan_remaining_pages(first_page, first_limit, start_offset, total_limit):
+        """
+        依第一頁回傳的 total 算出剩下要請求的頁面
+
+        :return: [(offset, limit), ...]；API 沒有回傳 total 時回傳 None
+        """
+        first_items = first_page.get('items', [])
+        if len(first_items) < first_limit:
+            return []
+
+        total = first_page.get('total')
+        if total is None:
+            return None
+
+        end_offset = total
+        if total_limit is not None:
+            end_offset = min(total, start_offset + total_limit)
+
+        api_limit = SpotifyPaginationHelper.API_LIMIT
+        return [
+            (offset, min(api_limit, end_offset - offset))
+            for offset in range(start_offset + len(first_items), end_offset, api_limit)
+        ]
+
+    @staticmethod
+    def fetch_all_items_concurrently(
+        api_method,
+        total_limit=None,
+        start_offset=0,
+        max_workers=MAX_WORKERS,
+        **kwargs,
+    ):
+        """
+        並行版本的 fetch_all_items
+
+        第一頁回傳 total 後，剩下的 offset 都已知，改用有限大小的 thread pool 同時請求，
+        最後依 offset 順序組回。每個 request 仍會經過 provider 的 rate limiter。
+        API 沒有回傳 total 時退回逐頁請求。
+
+        :param api_method: API 方法 (例如: api_interface.get_playlist_tracks)
+        :param total_limit: 總共需要的資料筆數，None 表示獲取所有資料
+        :param start_offset: 起始 offset（預設 0）
+        :param max_workers: 同時請求的最大數量
+        :param kwargs: 傳給 API 方法的其他參數
+        :return: 所有收集到的 items（依 offset 排序）
+        """
+        first_limit = SpotifyPaginationHelper._first_page_limit(total_limit)
+        if first_limit <= 0:
+            return []
+
+        first_page = api_method(limit=first_limit, offset=start_offset, **kwargs)
+        all_items = list(first_page.get('items', []))
+        pages = SpotifyPaginationHelper._plan_remaining_pages(
+            first_page, first_limit, start_offset, total_limit
+        )
+
+        if pages is None:
+            return all_items + SpotifyPaginationHelper.fetch_all_items(
+                api_method,
+                total_limit=None
+                if total_limit is None
+                else total_limit - len(all_items),
+                start_offset=start_offset + len(all_items),
+                **kwargs,
+            )
+        if not pages:
+            return all_items
+
+        def fetch_page(page):
+            offset, limit = page
+            return api_method(limit=limit, offset=offset, **kwargs).get('items', [])
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(pages))) as executor:
+            for items in executor.map(fetch_page, pages):
+                all_items.extend(items)
+        return all_items
+
+    @staticmethod
+    async def afetch_all_items_concurrently(
+        api_method, total_limit=None, start_offset=0, **kwargs
+    ):
+        """
+        fetch_all_items_concurrently 的 async 版本
+
+        :param api_method: async API 方法 (例如: async_api_interface.get_playlist_tracks)
+        :param total_limit: 總共需要的資料筆數，None 表示獲取所有資料
+        :param start_offset: 起始 offset（預設 0）
+        :param kwargs: 傳給 API 方法的其他參數
+        :return: 所有收集到的 items（依 offset 排序）
+        """
+        first_limit = SpotifyPaginationHelper._first_page_limit(total_limit)
+        if first_limit <= 0:
+            return []
+
+        first_page = await api_method(limit=first_limit, offset=start_offset, **kwargs)
+        all_items = list(first_page.get('items', []))
+        pages = SpotifyPaginationHelper._plan_remaining_pages(
+            first_page, first_limit, start_offset, total_limit
+        )
+
+        if pages is None:
+            # 沒有 total，只能逐頁請求
+            offset = start_offset + len(all_items)
+            while total_limit is None or len(all_items) < total_limit:
+                limit = SpotifyPaginationHelper._first_page_limit(
+                    None if total_limit is None else total_limit - len(all_items)
+                )
+                items = (await api_method(limit=limit, offset=offset, **kwargs)).get(
+                    'items', []
+                )
+                all_items.extend(items)
+                offset += len(items)
+                if len(items) < limit:
+                    break
+            return all_items
+
+        results = await asyncio.gather(
+            *(
+                api_method(limit=limit, offset=offset, **kwargs)
+                for offset, limit in pages
+            )
+        )
+        for data in results:
+            all_items.extend(data.get('items', []))
+        return all_items
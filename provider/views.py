@@ -7,6 +7,7 @@ from rest_framework.permissions import AllowAny
 
 from account.models import Member
 from account.permissions import IsMember, IsStaff
+from provider.caches import APITokenRefreshLockCache, ProviderRateLimitCache
 from provider.exceptions import ProviderException
 from provider.handlers.spotify import SpotifyAPIProviderHandler
 from provider.models import MemberAPIToken, Provider, ProviderProxyAccount
@@ -197,14 +198,14 @@ class SpotifyPlayLogViewSet(viewsets.ViewSet):
                 )
 
             service = SpotifyPlayLogService(provider, member)
-            played_logs = service.collect_recently_played_logs(days=3)
+            result = service.collect_recently_played_logs(days=3)
 
             data = [
                 {
                     'track': pl.track.name,
                     'played_at': pl.played_at,
                 }
-                for pl in played_logs
+                for pl in result.created
             ]
 
             return APISuccessResponse(data=data)
@@ -289,3 +290,33 @@ class ProviderViewSet(mixins.ListModelMixin, BaseGenericViewSet):
     permission_classes = [IsStaff]
     queryset = Provider.objects.all()
     serializer_class = ProviderSerializer
+
+    @action(detail=False, methods=['get'], url_path='rate-limits')
+    def rate_limits(self, request):
+        """各 provider 目前的 API rate limit 額度"""
+        data = []
+        for provider in self.get_queryset():
+            options = ProviderRateLimitCache.get_options(provider)
+            data.append(
+                {
+                    'provider': provider.code,
+                    'budget': ProviderRateLimitCache.get_budget(
+                        ProviderRateLimitCache.get_rate_limit_key(provider),
+                        capacity=options['capacity'],
+                        refill_rate=options['refill_rate'],
+                    ),
+                }
+            )
+        return APISuccessResponse(data=data)
+
+    @action(detail=False, methods=['get'], url_path='token-refresh-metrics')
+    def token_refresh_metrics(self, request):
+        """各 provider 的 token refresh 次數、鎖等待與合併次數"""
+        data = [
+            {
+                'provider': provider.code,
+                'metrics': APITokenRefreshLockCache.get_metrics(provider.code),
+            }
+            for provider in self.get_queryset()
+        ]
+        return APISuccessResponse(data=data)
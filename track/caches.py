@@ -0,0 +1,107 @@
+import logging
+import time
+from typing import List, Optional, Sequence
+
+from django.conf import settings
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from utils.caches import RedisScript
+
+logger = logging.getLogger(__name__)
+
+
+class ArtistEnrichmentBuffer:
+    """
+    新 artist 等待補齊資料（enrichment）的 Redis 緩衝區
+
+    以 ZSET 存放 external_id，score 為第一次加入的時間（ZADD NX，重複加入不會延後），
+    flusher 以 pop_batch() 取出：
+    - 累積滿 BATCH_SIZE 個時立即取出一批（剛好一次 get_several_artists 的上限）
+    - 不滿一批但最舊的 id 已等待超過 deadline 秒時，取出剩下的全部
+    取出在 Lua script 內完成，多個 flusher 同時執行也不會重複取到同一個 id。
+
+    Redis 無法連線時 fail open：artist 仍為 pending，交由定期 sweep 補齊。
+    """
+
+    BUFFER_KEY = 'artist_enrichment_buffer'
+    BATCH_SIZE = 50  # Spotify get_several_artists 一次最多 50 個
+
+    # KEYS[1]: buffer key
+    # ARGV: batch size, deadline（秒）, now
+    # return: 這次取出的 external_id 列表（未到期時為空）
+    POP_SCRIPT = RedisScript(
+        """
+local batch_size = tonumber(ARGV[1])
+local size = redis.call('ZCARD', KEYS[1])
+if size == 0 then
+    return {}
+end
+if size < batch_size then
+    local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+    if tonumber(oldest[2]) > tonumber(ARGV[3]) - tonumber(ARGV[2]) then
+        return {}
+    end
+end
+local items = redis.call('ZRANGE', KEYS[1], 0, batch_size - 1)
+redis.call('ZREM', KEYS[1], unpack(items))
+return items
+"""
+    )
+
+    @classmethod
+    def push(cls, external_ids: Sequence[str]) -> Optional[int]:
+        """
+        加入等待補齊的 artist external_id
+
+        Args:
+            external_ids: Artist external_id 列表
+
+        Returns:
+            int | None: 加入後緩衝區的大小，Redis 無法使用時為 None
+        """
+        if not external_ids:
+            return None
+        now = time.time()
+        try:
+            client = get_redis_connection(settings.DEFAULT_ALIAS)
+            pipeline = client.pipeline()
+            pipeline.zadd(
+                cls.BUFFER_KEY,
+                {external_id: now for external_id in external_ids},
+                nx=True,
+            )
+            pipeline.zcard(cls.BUFFER_KEY)
+            _, size = pipeline.execute()
+        except (RedisError, NotImplementedError) as e:
+            logger.warning(f"Failed to buffer {len(external_ids)} artists: {e}")
+            return None
+        return size
+
+    @classmethod
+    def pop_batch(cls, deadline: float) -> List[str]:
+        """
+        取出一批到期的 external_id
+
+        Args:
+            deadline: 不滿一批時，最舊的 id 等待超過此秒數才取出
+
+        Returns:
+            List[str]: 最多 BATCH_SIZE 個 external_id，沒有到期的批次時為空
+        """
+        try:
+            items = cls.POP_SCRIPT(
+                keys=[cls.BUFFER_KEY], args=[cls.BATCH_SIZE, deadline, time.time()]
+            )
+        except (RedisError, NotImplementedError) as e:
+            logger.warning(f"Failed to pop artist enrichment buffer: {e}")
+            return []
+        return [item.decode() if isinstance(item, bytes) else item for item in items]
+
+    @classmethod
+    def size(cls) -> int:
+        try:
+            return get_redis_connection(settings.DEFAULT_ALIAS).zcard(cls.BUFFER_KEY)
+        except (RedisError, NotImplementedError) as e:
+            logger.warning(f"Failed to read artist enrichment buffer: {e}")
+            return 0
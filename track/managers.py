@@ -1,31 +1,39 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Dict, List
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence
 
-from django.db import models
+from django.db import models, transaction
 
 from track.schemas import ArtistSchemas, TrackSchemas
+from utils.db import bulk_upsert
+from utils.models import EnrichmentQuerySet
 
 if TYPE_CHECKING:
     from provider.models import Provider
     from track.models import Artist, Track
 
 
-class ArtistManager(models.Manager):
+class ArtistManager(models.Manager.from_queryset(EnrichmentQuerySet)):
+    # upsert 時以新資料覆蓋的欄位
+    # track 內嵌的 simplified artist 沒有 popularity / followers，避免覆蓋掉補齊過的資料
+    UPSERT_UPDATE_FIELDS = ('name', 'updated_at')
+
     def bulk_create_from_data(
         self,
         artists_data: List[ArtistSchemas.CreateData],
         provider: Provider,
+        update_fields: Optional[Sequence[str]] = None,
     ) -> Dict[str, Artist]:
         """
-        批量創建 Artists
+        批量創建 Artists（已存在則刷新 update_fields）
 
         :param artists_data: List[ArtistSchemas.CreateData]
         :param provider: Provider instance
+        :param update_fields: 已存在時要刷新的欄位，預設 UPSERT_UPDATE_FIELDS，空列表表示不刷新
         :return: {external_id: Artist} mapping
         """
         # 1. 創建 Model 實例
-        artists_to_create = [
+        artists_to_upsert = [
             self.model(
                 external_id=data.external_id,
                 provider=provider,
@@ -36,37 +44,70 @@ class ArtistManager(models.Manager):
             for data in artists_data
         ]
 
-        # 2. 批量插入（忽略衝突）
-        self.bulk_create(artists_to_create, ignore_conflicts=True)
-
-        # 3. 查詢所有（包含已存在的）
-        external_ids = [data.external_id for data in artists_data]
-        all_artists = self.filter(
-            external_id__in=external_ids,
-            provider=provider,
+        # 2. 單一 statement upsert 並取回所有 row
+        upserted = bulk_upsert(
+            self.model,
+            artists_to_upsert,
+            unique_fields=['external_id', 'provider'],
+            update_fields=(
+                update_fields
+                if update_fields is not None
+                else self.UPSERT_UPDATE_FIELDS
+            ),
+            return_existing=True,
         )
 
+        # 3. 只有這次新增的 artist 需要補齊資料，commit 後放入 enrichment 緩衝區
+        inserted_external_ids = [
+            artist.external_id for artist, inserted in upserted if inserted
+        ]
+        if (
+            inserted_external_ids
+            and provider.platform == provider.PlatformOptions.SPOTIFY
+        ):
+            transaction.on_commit(
+                lambda: self._buffer_for_enrichment(inserted_external_ids)
+            )
+
         # 4. 返回 mapping
-        return {artist.external_id: artist for artist in all_artists}
+        return {artist.external_id: artist for artist, _ in upserted}
+
+    @staticmethod
+    def _buffer_for_enrichment(external_ids: List[str]) -> None:
+        """
+        放入 ArtistEnrichmentBuffer，累積滿一批時立即觸發 flusher，
+        不滿一批的由排程的 flusher 在 deadline 到期後送出
+        """
+        from provider.tasks import flush_artist_enrichment_buffer
+        from track.caches import ArtistEnrichmentBuffer
+
+        size = ArtistEnrichmentBuffer.push(external_ids)
+        if size is not None and size >= ArtistEnrichmentBuffer.BATCH_SIZE:
+            flush_artist_enrichment_buffer.apply_async(queue='playlog_q')
 
 
 class TrackManager(models.Manager):
+    # upsert 時以新資料覆蓋的欄位
+    UPSERT_UPDATE_FIELDS = ('name', 'popularity', 'is_playable', 'updated_at')
+
     def bulk_create_from_data(
         self,
         tracks_data: List[TrackSchemas.CreateData],
         artists_map: Dict[str, Artist],
         provider: Provider,
+        update_fields: Optional[Sequence[str]] = None,
     ) -> Dict[str, Track]:
         """
-        批量創建 Tracks 並關聯 Artists
+        批量創建 Tracks（已存在則刷新 update_fields）並關聯 Artists
 
         :param tracks_data: List[TrackSchemas.CreateData]
         :param artists_map: {external_id: Artist} from Artist.objects.bulk_create_from_data()
         :param provider: Provider instance
+        :param update_fields: 已存在時要刷新的欄位，預設 UPSERT_UPDATE_FIELDS，空列表表示不刷新
         :return: {external_id: Track} mapping
         """
         # 1. 創建 Track 實例
-        tracks_to_create = [
+        tracks_to_upsert = [
             self.model(
                 external_id=data.external_id,
                 provider=provider,
@@ -78,30 +119,36 @@ class TrackManager(models.Manager):
             for data in tracks_data
         ]
 
-        # 2. 批量插入
-        self.bulk_create(tracks_to_create, ignore_conflicts=True)
+        # 2. 單一 statement upsert 並取回所有 row
+        upserted = bulk_upsert(
+            self.model,
+            tracks_to_upsert,
+            unique_fields=['external_id', 'provider'],
+            update_fields=(
+                update_fields
+                if update_fields is not None
+                else self.UPSERT_UPDATE_FIELDS
+            ),
+            return_existing=True,
+        )
+        tracks_map = {track.external_id: track for track, _ in upserted}
 
-        # 3. 查詢所有 Track
-        external_ids = [data.external_id for data in tracks_data]
-        tracks_map = {
-            track.external_id: track
-            for track in self.filter(
-                external_id__in=external_ids,
-                provider=provider,
-            )
-        }
+        # 3. 以集合比對一次同步 M2M 關聯（避免逐筆 track.artists.set()）
+        from track.services.model_helpers import sync_m2m_through_rows
 
-        # 4. 設置 M2M 關聯
+        desired_pairs = {}
         for data in tracks_data:
             track = tracks_map.get(data.external_id)
             if not track:
                 continue
 
-            artist_objs = [
-                artists_map[artist_id]
+            desired_pairs[track.id] = {
+                artists_map[artist_id].id
                 for artist_id in data.artist_external_ids
                 if artist_id in artists_map
-            ]
-            track.artists.set(artist_objs)
+            }
+        sync_m2m_through_rows(
+            self.model.artists.through, 'track', 'artist', desired_pairs
+        )
 
         return tracks_map
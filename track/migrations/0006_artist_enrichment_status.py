@@ -0,0 +1,59 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:17
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def mark_complete_artists_done(apps, schema_editor):
+    """已有 popularity / followers_count / name 的 artist 不需要再補齊"""
+    Artist = apps.get_model('track', 'Artist')
+    Artist.objects.exclude(
+        Q(popularity__isnull=True) | Q(followers_count__isnull=True) | Q(name='')
+    ).update(enrichment_status='done', enrichment_next_attempt_at=None)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('provider', '0004_remove_providerproxyaccount_is_available_and_more'),
+        ('track', '0005_artist_updated_at_track_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artist',
+            name='enrichment_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='artist',
+            name='enrichment_next_attempt_at',
+            field=models.DateTimeField(
+                blank=True, default=django.utils.timezone.now, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name='artist',
+            name='enrichment_status',
+            field=models.CharField(
+                choices=[
+                    ('pending', 'Pending'),
+                    ('done', 'Done'),
+                    ('failed', 'Failed'),
+                ],
+                default='pending',
+                max_length=10,
+            ),
+        ),
+        migrations.RunPython(
+            mark_complete_artists_done, reverse_code=migrations.RunPython.noop
+        ),
+        migrations.AddIndex(
+            model_name='artist',
+            index=models.Index(
+                condition=models.Q(('enrichment_status__in', ['pending', 'failed'])),
+                fields=['enrichment_next_attempt_at'],
+                name='track_artist_enrichment_due',
+            ),
+        ),
+    ]
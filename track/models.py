@@ -3,6 +3,7 @@ from django.db import models
 
 from provider.models import Provider
 from track.managers import ArtistManager, TrackManager
+from utils.models import EnrichmentModel, enrichment_due_index
 
 
 class Genre(models.Model):
@@ -19,7 +20,7 @@ class Genre(models.Model):
         return f"{self.name} ({self.provider})"
 
 
-class Artist(models.Model):
+class Artist(EnrichmentModel):
     external_id = models.CharField(max_length=255)
     provider = models.ForeignKey(
         Provider, on_delete=models.PROTECT, related_name='artists'
@@ -35,6 +36,7 @@ class Artist(models.Model):
 
     class Meta:
         unique_together = ('external_id', 'provider')
+        indexes = [enrichment_due_index('track_artist_enrichment_due')]
 
     def __str__(self):
         return self.name
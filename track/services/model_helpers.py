@@ -34,3 +34,49 @@ def bulk_create_genres(genre_dicts, provider_id):
         )
 
     return genre_map
+
+
+def sync_m2m_through_rows(through_model, source_field, target_field, desired_pairs):
+    """
+    以集合比對的方式同步 M2M through table（取代逐筆呼叫 .set()）
+
+    固定 1 次查詢既有關聯，再視需要 1 次 bulk insert + 1 次 bulk delete，
+    查詢次數與 source 數量無關。
+
+    :param through_model: M2M through model（例如 Track.artists.through）
+    :param source_field: through model 指向 source 的欄位名稱（例如 'track'）
+    :param target_field: through model 指向 target 的欄位名稱（例如 'artist'）
+    :param desired_pairs: {source_id: Iterable[target_id]}，
+        每個 source 同步後的完整 target 集合（空集合代表清除該 source 的所有關聯）
+    :return: (created_count, deleted_count)
+    """
+    if not desired_pairs:
+        return 0, 0
+
+    source_column = f"{source_field}_id"
+    target_column = f"{target_field}_id"
+
+    wanted = {
+        (source_id, target_id)
+        for source_id, target_ids in desired_pairs.items()
+        for target_id in target_ids
+    }
+    existing = {
+        (source_id, target_id): pk
+        for pk, source_id, target_id in through_model.objects.filter(
+            **{f"{source_column}__in": list(desired_pairs.keys())}
+        ).values_list('pk', source_column, target_column)
+    }
+
+    rows_to_create = [
+        through_model(**{source_column: source_id, target_column: target_id})
+        for source_id, target_id in wanted - existing.keys()
+    ]
+    pks_to_delete = [pk for pair, pk in existing.items() if pair not in wanted]
+
+    if rows_to_create:
+        through_model.objects.bulk_create(rows_to_create, ignore_conflicts=True)
+    if pks_to_delete:
+        through_model.objects.filter(pk__in=pks_to_delete).delete()
+
+    return len(rows_to_create), len(pks_to_delete)
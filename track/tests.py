@@ -1,3 +1,218 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from provider.models import Provider
+from track.caches import ArtistEnrichmentBuffer
+from track.models import Artist, Track
+from track.schemas import ArtistSchemas, TrackSchemas
+
+
+class TrackBulkCreateFromDataTests(TestCase):
+    # upsert tracks + 查詢既有關聯 + bulk insert 關聯
+    CREATE_QUERY_COUNT = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.provider = Provider.objects.create(
+            name='spotify',
+            code='spotify',
+            platform=Provider.PlatformOptions.SPOTIFY,
+            category=Provider.CategoryOptions.MUSIC,
+            auth_type=Provider.AuthTypeOptions.OAUTH2,
+        )
+
+    def _build_data(self, size, prefix='track'):
+        artists_data = [
+            ArtistSchemas.CreateData(external_id=f"{prefix}-artist-{i}", name=str(i))
+            for i in range(size + 1)
+        ]
+        tracks_data = [
+            TrackSchemas.CreateData(
+                external_id=f"{prefix}-{i}",
+                name=str(i),
+                artist_external_ids=[
+                    f"{prefix}-artist-{i}",
+                    f"{prefix}-artist-{i + 1}",
+                ],
+            )
+            for i in range(size)
+        ]
+        artists_map = Artist.objects.bulk_create_from_data(artists_data, self.provider)
+        return tracks_data, artists_map
+
+    def test_query_count_is_constant_per_batch(self):
+        for size in (10, 100):
+            tracks_data, artists_map = self._build_data(size, prefix=f"batch{size}")
+            with self.assertNumQueries(self.CREATE_QUERY_COUNT):
+                tracks_map = Track.objects.bulk_create_from_data(
+                    tracks_data, artists_map, self.provider
+                )
+            self.assertEqual(len(tracks_map), size)
+            self.assertEqual(
+                Track.artists.through.objects.filter(
+                    track__in=tracks_map.values()
+                ).count(),
+                size * 2,
+            )
+
+    def test_relink_replaces_stale_artists(self):
+        tracks_data, artists_map = self._build_data(10)
+        Track.objects.bulk_create_from_data(tracks_data, artists_map, self.provider)
+
+        for data in tracks_data:
+            data.artist_external_ids = data.artist_external_ids[:1]
+        # upsert tracks（沒變動的 row 同一個 statement 取回）+ 查詢既有關聯 + bulk delete
+        with self.assertNumQueries(3):
+            tracks_map = Track.objects.bulk_create_from_data(
+                tracks_data, artists_map, self.provider
+            )
+
+        for data in tracks_data:
+            self.assertEqual(
+                list(
+                    tracks_map[data.external_id].artists.values_list(
+                        'external_id', flat=True
+                    )
+                ),
+                data.artist_external_ids,
+            )
+
+    def test_unchanged_rows_are_not_rewritten(self):
+        tracks_data, artists_map = self._build_data(1)
+        first_map = Track.objects.bulk_create_from_data(
+            tracks_data, artists_map, self.provider
+        )
+
+        # upsert（不寫入，同一個 statement 取回）+ 查詢既有關聯
+        with self.assertNumQueries(2):
+            second_map = Track.objects.bulk_create_from_data(
+                tracks_data, artists_map, self.provider
+            )
+        self.assertEqual(
+            second_map['track-0'].updated_at, first_map['track-0'].updated_at
+        )
+
+        tracks_data[0].name = 'renamed'
+        third_map = Track.objects.bulk_create_from_data(
+            tracks_data, artists_map, self.provider, update_fields=[]
+        )
+        self.assertEqual(third_map['track-0'].name, '0')
+
+    def test_upsert_refreshes_existing_rows(self):
+        tracks_data, artists_map = self._build_data(1)
+        Artist.objects.filter(external_id='track-artist-0').update(popularity=70)
+        first_map = Track.objects.bulk_create_from_data(
+            tracks_data, artists_map, self.provider
+        )
+
+        tracks_data[0].name = 'renamed'
+        tracks_data[0].popularity = 42
+        tracks_data[0].is_playable = False
+        artists_map = Artist.objects.bulk_create_from_data(
+            [ArtistSchemas.CreateData(external_id='track-artist-0', name='new name')],
+            self.provider,
+        )
+        second_map = Track.objects.bulk_create_from_data(
+            tracks_data, artists_map, self.provider
+        )
+
+        track = second_map['track-0']
+        self.assertEqual(track.id, first_map['track-0'].id)
+        self.assertEqual(
+            (track.name, track.popularity, track.is_playable), ('renamed', 42, False)
+        )
+        artist = Artist.objects.get(external_id='track-artist-0')
+        # simplified artist 沒有 popularity，不應覆蓋既有值
+        self.assertEqual((artist.name, artist.popularity), ('new name', 70))
+
+
+@override_settings(
+    ENRICHMENT_LEASE_SECONDS=3600,
+    ENRICHMENT_RETRY_BASE_DELAY=60,
+    ENRICHMENT_RETRY_MAX_DELAY=600,
+    ENRICHMENT_MAX_ATTEMPTS=5,
+)
+class ArtistEnrichmentStatusTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.provider = Provider.objects.create(
+            name='spotify',
+            code='spotify',
+            platform=Provider.PlatformOptions.SPOTIFY,
+            category=Provider.CategoryOptions.MUSIC,
+            auth_type=Provider.AuthTypeOptions.OAUTH2,
+        )
+
+    def setUp(self):
+        self.artist = Artist.objects.create(
+            external_id='artist', name='', provider=self.provider
+        )
+
+    def _refresh(self):
+        self.artist.refresh_from_db()
+        return self.artist
+
+    def test_new_artist_is_due(self):
+        self.assertEqual(
+            self.artist.enrichment_status, Artist.EnrichmentStatusOptions.PENDING
+        )
+        self.assertTrue(Artist.objects.due().filter(id=self.artist.id).exists())
+
+    def test_lease_hides_artist_from_sweep(self):
+        Artist.objects.filter(id=self.artist.id).lease()
+        self.assertFalse(Artist.objects.due().filter(id=self.artist.id).exists())
+        later = timezone.now() + timedelta(seconds=3601)
+        self.assertTrue(Artist.objects.due(later).filter(id=self.artist.id).exists())
+
+    def test_failures_back_off_exponentially_until_max_attempts(self):
+        delays = []
+        for _ in range(4):
+            now = timezone.now()
+            Artist.objects.filter(id=self.artist.id).mark_enrichment_failed(now)
+            artist = self._refresh()
+            delays.append(
+                round((artist.enrichment_next_attempt_at - now).total_seconds())
+            )
+        self.assertEqual(delays, [60, 120, 240, 480])
+        self.assertEqual(
+            artist.enrichment_status, Artist.EnrichmentStatusOptions.FAILED
+        )
+
+        Artist.objects.filter(id=self.artist.id).mark_enrichment_failed()
+        artist = self._refresh()
+        self.assertEqual(artist.enrichment_attempts, 5)
+        self.assertIsNone(artist.enrichment_next_attempt_at)
+        self.assertFalse(
+            Artist.objects.due(timezone.now() + timedelta(days=365)).exists()
+        )
+
+    @override_settings(ENRICHMENT_MAX_ATTEMPTS=10)
+    def test_backoff_is_capped(self):
+        Artist.objects.filter(id=self.artist.id).update(enrichment_attempts=6)
+        now = timezone.now()
+        Artist.objects.filter(id=self.artist.id).mark_enrichment_failed(now)
+        artist = self._refresh()
+        self.assertEqual(
+            round((artist.enrichment_next_attempt_at - now).total_seconds()), 600
+        )
+
+    def test_done_leaves_partial_index(self):
+        Artist.objects.filter(id=self.artist.id).mark_enrichment_done()
+        artist = self._refresh()
+        self.assertEqual(artist.enrichment_status, Artist.EnrichmentStatusOptions.DONE)
+        self.assertIsNone(artist.enrichment_next_attempt_at)
+        self.assertFalse(Artist.objects.due().exists())
+
+    def test_only_inserted_artists_are_buffered(self):
+        artists_data = [
+            ArtistSchemas.CreateData(external_id=external_id, name=external_id)
+            for external_id in ('artist', 'new-artist')
+        ]
+        with mock.patch.object(
+            ArtistEnrichmentBuffer, 'push', return_value=1
+        ) as push, self.captureOnCommitCallbacks(execute=True):
+            Artist.objects.bulk_create_from_data(artists_data, self.provider)
+        push.assert_called_once_with(['new-artist'])
@@ -0,0 +1,43 @@
+import hashlib
+import math
+
+
+class BloomFilter:
+    """
+    簡易 Bloom filter（不支援刪除）
+
+    `item in bloom` 為 False 時保證不存在；為 True 時可能誤判（機率約為 error_rate），
+    呼叫端需再向實際資料來源確認。
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        """
+        :param capacity: 預期存放的元素數量
+        :param error_rate: 元素數量未超過 capacity 時的誤判率
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(
+            8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        )  # bit 數
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+    def _positions(self, item):
+        # double hashing：以兩個 64-bit hash 組合出 hash_count 個位置
+        digest = hashlib.blake2b(str(item).encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
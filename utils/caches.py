@@ -0,0 +1,922 @@
+import functools
+import json
+import logging
+import math
+import os
+import pickle
+import random
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django_redis import get_redis_connection
+from django_redis.serializers.base import BaseSerializer
+from redis.exceptions import RedisError
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+
+class LocalLRUCache:
+    """
+    Process 內的 LRU cache（thread-safe）
+
+    適合存放「建立後不會變動」的小型 mapping（例如 natural key -> pk），
+    讓熱門資料不必每次都查 DB / Redis。每個 process 各自一份，不跨 process 同步。
+    """
+
+    def __init__(self, maxsize, ttl=None):
+        """
+        :param maxsize: 最多保留的 key 數量，超過時淘汰最久未使用的
+        :param ttl: 每個 key 的存活秒數，None 表示不過期
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._get(key, default, time.monotonic())
+
+    def get_many(self, keys):
+        """
+        :return: {key: value}，只包含命中的 key
+        """
+        now = time.monotonic()
+        result = {}
+        missing = object()
+        with self._lock:
+            for key in keys:
+                value = self._get(key, missing, now)
+                if value is not missing:
+                    result[key] = value
+        return result
+
+    def set(self, key, value, ttl=None):
+        self.set_many({key: value}, ttl=ttl)
+
+    def set_many(self, mapping, ttl=None):
+        """
+        :param mapping: {key: value}
+        :param ttl: 覆寫預設 ttl（秒）
+        """
+        ttl = ttl if ttl is not None else self.ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            for key, value in mapping.items():
+                self._data[key] = (value, expires_at)
+                self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def _get(self, key, default, now):
+        item = self._data.get(key)
+        if item is None:
+            return default
+        value, expires_at = item
+        if expires_at is not None and expires_at <= now:
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+
+class RedisScript:
+    """
+    在 class 層級宣告一次的 Lua script
+
+    第一次執行時才以 register_script 建立 redis-py 的 Script（只計算一次 SHA1），
+    之後都以 EVALSHA 執行；Redis 重啟後遇到 NOSCRIPT 時由 redis-py 自動重新載入。
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self._script = None
+        self._lock = threading.Lock()
+
+    def __call__(self, keys=(), args=(), alias=None):
+        """
+        :param keys: KEYS
+        :param args: ARGV
+        :param alias: django-redis 的 cache alias，預設 DEFAULT_ALIAS
+        :raise NotImplementedError: 非 Redis backend
+        """
+        client = get_redis_connection(alias or settings.DEFAULT_ALIAS)
+        if self._script is None:
+            with self._lock:
+                if self._script is None:
+                    self._script = client.register_script(self.source)
+        return self._script(keys=keys, args=args, client=client)
+
+
+class CacheInvalidationBus:
+    """
+    跨 process 的 local cache 失效通知（Redis pub/sub）
+
+    各 process 以 namespace 註冊 callback，任一 process publish 後，
+    所有 process 的 listener thread 會以 key 呼叫該 namespace 的 callback。
+    讀取 local cache 前呼叫 ensure_listener()，listener 才會在目前 process 啟動
+    （fork 後的子 process 會自行重新啟動）；
+    (重新)訂閱時以 key=None 通知 callback 清空整個 local cache，避免漏接訊息。
+    """
+
+    CHANNEL = 'local_cache_invalidation'
+    RECONNECT_INTERVAL = 1
+
+    _callbacks = {}
+    _lock = threading.Lock()
+    _listener_pid = None
+    _origin = None  # 目前 process 的 id，listener 略過自己 publish 的訊息
+
+    @classmethod
+    def subscribe(cls, namespace, callback):
+        """
+        :param namespace: local cache 名稱
+        :param callback: callable(key)，key 為 None 時代表清空整個 namespace
+        """
+        with cls._lock:
+            cls._callbacks.setdefault(namespace, []).append(callback)
+
+    @classmethod
+    def publish(cls, namespace, key):
+        """
+        通知所有 process 讓 namespace 的 key 失效（本 process 立即生效）
+
+        :param namespace: local cache 名稱
+        :param key: 失效的 key
+        """
+        cls._dispatch(namespace, key)
+        try:
+            get_redis_connection(settings.DEFAULT_ALIAS).publish(
+                cls.CHANNEL,
+                json.dumps({'namespace': namespace, 'key': key, 'origin': cls._origin}),
+            )
+        except (RedisError, NotImplementedError) as e:
+            logger.warning(f"Failed to publish cache invalidation {namespace}: {e}")
+
+    @classmethod
+    def _dispatch(cls, namespace, key):
+        for callback in list(cls._callbacks.get(namespace, [])):
+            try:
+                callback(key)
+            except Exception as e:
+                logger.warning(f"Cache invalidation callback failed {namespace}: {e}")
+
+    @classmethod
+    def _dispatch_all(cls):
+        for namespace in list(cls._callbacks):
+            cls._dispatch(namespace, None)
+
+    @classmethod
+    def ensure_listener(cls):
+        """確保目前 process 的 listener thread 已啟動"""
+        pid = os.getpid()
+        if cls._listener_pid == pid:
+            return
+        with cls._lock:
+            if cls._listener_pid == pid:
+                return
+            cls._listener_pid = pid
+            cls._origin = uuid.uuid4().hex
+            thread = threading.Thread(
+                target=cls._listen, name='cache-invalidation-listener', daemon=True
+            )
+            thread.start()
+
+    @classmethod
+    def _listen(cls):
+        while True:
+            pubsub = None
+            try:
+                pubsub = get_redis_connection(settings.DEFAULT_ALIAS).pubsub(
+                    ignore_subscribe_messages=True
+                )
+                pubsub.subscribe(cls.CHANNEL)
+                # 訂閱前可能漏接的訊息無法補回，直接清空 local cache
+                cls._dispatch_all()
+                while True:
+                    message = pubsub.get_message(timeout=cls.RECONNECT_INTERVAL)
+                    if not message:
+                        continue
+                    payload = json.loads(message['data'])
+                    if payload.get('origin') == cls._origin:
+                        continue
+                    cls._dispatch(payload['namespace'], payload['key'])
+            except NotImplementedError:
+                # 非 Redis cache backend（例如測試環境），不啟動 listener
+                return
+            except Exception as e:
+                logger.warning(f"Cache invalidation listener error: {e}")
+                cls._dispatch_all()
+                time.sleep(cls.RECONNECT_INTERVAL)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+
+class CacheKeyIndex:
+    """
+    以 Redis SET 記錄每個 owner 底下的 cache key，取代 KEYS pattern 掃描
+
+    set cache 時以 add() 將 key 加入 owner 的 index（index 的 TTL 取成員中最長者），
+    刪除 owner 的所有 cache 時以 delete_all() 做一次 SMEMBERS + UNLINK，
+    不必用 KEYS 掃描整個 keyspace（KEYS 會阻塞與 Celery 共用的 Redis）。
+    index 中的 key 可能已過期或被個別刪除，UNLINK 不存在的 key 沒有副作用。
+    非 Redis backend 或 Redis 無法連線時只記錄 warning，不影響 cache 本身的讀寫。
+    """
+
+    INDEX_KEY_PATTERN = 'cache_index:{namespace}:{owner}'
+
+    # KEYS[1]: index key
+    # ARGV: cache key, timeout（秒，-1 表示不過期）
+    ADD_SCRIPT = RedisScript(
+        """
+local existed = redis.call('EXISTS', KEYS[1])
+local ttl = redis.call('TTL', KEYS[1])
+local timeout = tonumber(ARGV[2])
+redis.call('SADD', KEYS[1], ARGV[1])
+if timeout < 0 then
+    redis.call('PERSIST', KEYS[1])
+elseif existed == 0 or (ttl >= 0 and ttl < timeout) then
+    redis.call('EXPIRE', KEYS[1], timeout)
+end
+return 1
+"""
+    )
+
+    @classmethod
+    def compose_index_key(cls, namespace, owner):
+        return caches[settings.RAW_CACHE_ALIAS].make_key(
+            cls.INDEX_KEY_PATTERN.format(namespace=namespace, owner=owner)
+        )
+
+    @classmethod
+    def add(cls, namespace, owner, cache_key, timeout=None):
+        """
+        :param namespace: cache 名稱
+        :param owner: index 的擁有者（例如 member_id）
+        :param cache_key: 要記錄的 cache key（未經 make_key 的原始 key）
+        :param timeout: cache key 的存活秒數，None 表示不過期
+        """
+        if timeout is not None and timeout <= 0:
+            return
+        index_key = cls.compose_index_key(namespace, owner)
+        try:
+            cls.ADD_SCRIPT(
+                keys=[index_key],
+                args=[cache_key, -1 if timeout is None else int(timeout)],
+            )
+        except (RedisError, NotImplementedError) as e:
+            logger.warning(f"Failed to index cache key {cache_key}: {e}")
+
+    @classmethod
+    def remove(cls, namespace, owner, cache_key):
+        """個別刪除 cache key 時一併移出 index"""
+        index_key = cls.compose_index_key(namespace, owner)
+        try:
+            get_redis_connection(settings.DEFAULT_ALIAS).srem(index_key, cache_key)
+        except (RedisError, NotImplementedError) as e:
+            logger.warning(f"Failed to unindex cache key {cache_key}: {e}")
+
+    @classmethod
+    def delete_all(cls, namespace, owner):
+        """
+        刪除 owner 在 index 中記錄的所有 cache key
+
+        只移出這次讀到的成員，期間新加入的 key 仍保留在 index 中。
+
+        :return: 被刪除的 cache key 列表（原始 key）
+        """
+        index_key = cls.compose_index_key(namespace, owner)
+        try:
+            client = get_redis_connection(settings.DEFAULT_ALIAS)
+            members = client.smembers(index_key)
+            if not members:
+                return []
+            cache_keys = [
+                member.decode() if isinstance(member, bytes) else member
+                for member in members
+            ]
+            pipeline = client.pipeline()
+            backend = caches[settings.RAW_CACHE_ALIAS]
+            pipeline.unlink(*[backend.make_key(cache_key) for cache_key in cache_keys])
+            pipeline.srem(index_key, *members)
+            pipeline.execute()
+        except (RedisError, NotImplementedError) as e:
+            logger.warning(f"Failed to delete indexed cache keys of {owner}: {e}")
+            return []
+        return cache_keys
+
+
+class BytesSerializer(BaseSerializer):
+    """
+    django-redis serializer：原樣存取 bytes
+
+    給 RAW_CACHE_ALIAS 使用，序列化與壓縮交由 NamespacedCache 依 namespace 決定。
+    """
+
+    def dumps(self, value):
+        return value
+
+    def loads(self, value):
+        return value
+
+
+def _dumps_json(value):
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def _dumps_pickle(value):
+    return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+SERIALIZERS = {
+    # name: (dumps, loads)
+    'raw': (bytes, bytes),
+    'text': (str.encode, bytes.decode),
+    'json': (_dumps_json, json.loads),
+    'pickle': (_dumps_pickle, pickle.loads),
+}
+if msgpack is not None:
+    SERIALIZERS['msgpack'] = (msgpack.packb, msgpack.unpackb)
+
+# 每個值的第一個 byte 標示壓縮方式
+FLAG_PLAIN = b'\x00'
+COMPRESSORS = {
+    # name: (flag, compress)
+    'none': (FLAG_PLAIN, None),
+    'zlib': (b'\x01', zlib.compress),
+}
+DECOMPRESSORS = {b'\x01': zlib.decompress}
+if lz4 is not None:
+    COMPRESSORS['lz4'] = (b'\x02', lz4.frame.compress)
+    DECOMPRESSORS[b'\x02'] = lz4.frame.decompress
+
+
+class NamespacedCache:
+    """
+    依 namespace 決定序列化 / 壓縮方式的 cache facade
+
+    預設 cache 對所有值都做 pickle + zlib，對 access token、bool flag、lock 這類
+    小值只是白花 CPU。NamespacedCache 透過 RAW_CACHE_ALIAS（bytes 原樣存取）讀寫，
+    每個 namespace 自行指定：
+    - serializer: raw（bytes）/ text（str）/ json / msgpack / pickle
+    - compressor: none / zlib / lz4，只有序列化後超過 compress_threshold 且壓縮後
+      確實變小才壓縮，值的第一個 byte 記錄壓縮方式
+    並在 process 內累計每個 namespace 的 hit / miss、bytes 與延遲，
+    每 CACHE_METRICS_FLUSH_INTERVAL 秒以 HINCRBY 合併到 Redis，供 get_metrics() 查詢。
+
+    key 與預設 cache 相同（不會自動加上 namespace 前綴），namespace 只決定編碼方式與統計分類。
+    """
+
+    METRICS_KEY_PATTERN = 'cache_metrics:{namespace}'
+    METRIC_FIELDS = (
+        'hits',
+        'misses',
+        'sets',
+        'bytes_read',
+        'bytes_written',
+        'compressed',
+        'get_seconds',
+        'set_seconds',
+    )
+
+    _registry = {}
+
+    def __init__(
+        self, namespace, serializer='pickle', compressor='none', compress_threshold=None
+    ):
+        """
+        :param namespace: 名稱，用於統計分類
+        :param serializer: SERIALIZERS 的 key
+        :param compressor: COMPRESSORS 的 key
+        :param compress_threshold: 超過此 bytes 數才壓縮，預設 CACHE_COMPRESS_THRESHOLD
+        """
+        if serializer not in SERIALIZERS:
+            raise ImproperlyConfigured(
+                f"Cache serializer {serializer!r} of {namespace} is not available"
+            )
+        if compressor not in COMPRESSORS:
+            raise ImproperlyConfigured(
+                f"Cache compressor {compressor!r} of {namespace} is not available"
+            )
+        self.namespace = namespace
+        self.serializer = serializer
+        self.compressor = compressor
+        self.compress_threshold = (
+            compress_threshold
+            if compress_threshold is not None
+            else settings.CACHE_COMPRESS_THRESHOLD
+        )
+        self._dumps, self._loads = SERIALIZERS[serializer]
+        self._compress_flag, self._compress = COMPRESSORS[compressor]
+
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(self.METRIC_FIELDS, 0)
+        self._flushed_at = time.monotonic()
+        NamespacedCache._registry[namespace] = self
+
+    @property
+    def backend(self):
+        return caches[settings.RAW_CACHE_ALIAS]
+
+    def make_key(self, key):
+        return self.backend.make_key(key)
+
+    def get(self, key, default=None):
+        start = time.perf_counter()
+        data = self.backend.get(key)
+        value = default if data is None else self._decode(key, data, default)
+        self._record(
+            'hits' if data is not None and value is not default else 'misses',
+            get_seconds=time.perf_counter() - start,
+            bytes_read=len(data) if isinstance(data, bytes) else 0,
+        )
+        return value
+
+    def set(self, key, value, timeout):
+        """
+        :param timeout: 秒數，None 表示不過期
+        """
+        start = time.perf_counter()
+        data = self._encode(value)
+        self.backend.set(key, data, timeout=timeout)
+        self._record_set(data, time.perf_counter() - start)
+
+    def add(self, key, value, timeout):
+        """
+        key 不存在時才寫入（可作為分散式鎖）
+
+        :return: bool，True 表示寫入成功
+        """
+        start = time.perf_counter()
+        data = self._encode(value)
+        added = self.backend.add(key, data, timeout=timeout)
+        self._record_set(data, time.perf_counter() - start)
+        return added
+
+    def delete(self, key):
+        self.backend.delete(key)
+
+    # KEYS[1]: key
+    # ARGV[1]: 編碼後的值
+    DELETE_IF_EQUAL_SCRIPT = RedisScript(
+        """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+    )
+
+    def delete_if_equal(self, key, value):
+        """
+        值等於 value 時才刪除（compare-and-delete，例如只釋放自己持有的鎖）
+
+        :return: bool，True 表示已刪除
+        """
+        try:
+            deleted = self.DELETE_IF_EQUAL_SCRIPT(
+                keys=[self.make_key(key)],
+                args=[self._encode(value)],
+                alias=settings.RAW_CACHE_ALIAS,
+            )
+        except NotImplementedError:
+            # 非 Redis backend（例如測試用的 locmem）沒有原子操作，先讀再刪
+            if self.get(key) != value:
+                return False
+            self.delete(key)
+            return True
+        except RedisError as e:
+            logger.warning(f"Failed to delete cache {self.namespace} {key}: {e}")
+            return False
+        return bool(deleted)
+
+    def ttl(self, key):
+        """
+        :return: 剩餘秒數；None 表示不過期或 backend 不支援
+        """
+        backend = self.backend
+        return backend.ttl(key) if hasattr(backend, 'ttl') else None
+
+    def _encode(self, value):
+        payload = self._dumps(value)
+        if self._compress is not None and len(payload) > self.compress_threshold:
+            compressed = self._compress(payload)
+            if len(compressed) < len(payload):
+                return self._compress_flag + compressed
+        return FLAG_PLAIN + payload
+
+    def _decode(self, key, data, default):
+        try:
+            if isinstance(data, int):
+                # django-redis 會把純數字的值直接轉成 int
+                return data
+            flag, payload = data[:1], data[1:]
+            if flag == FLAG_PLAIN:
+                return self._loads(payload)
+            if flag in DECOMPRESSORS:
+                return self._loads(DECOMPRESSORS[flag](payload))
+            return self._decode_legacy(data)
+        except Exception as e:
+            logger.warning(f"Failed to decode cache {self.namespace} {key}: {e}")
+            return default
+
+    @staticmethod
+    def _decode_legacy(data):
+        """改用 NamespacedCache 前由預設 cache（pickle + ZlibCompressor）寫入的值"""
+        try:
+            data = zlib.decompress(data)
+        except zlib.error:
+            pass  # 太小的值沒有壓縮
+        return pickle.loads(data)
+
+    def _record_set(self, data, seconds):
+        self._record(
+            'sets',
+            set_seconds=seconds,
+            bytes_written=len(data),
+            compressed=int(data[:1] != FLAG_PLAIN),
+        )
+
+    def _record(self, counter, **amounts):
+        now = time.monotonic()
+        with self._lock:
+            self._stats[counter] = self._stats.get(counter, 0) + 1
+            for field, amount in amounts.items():
+                self._stats[field] += amount
+            if now - self._flushed_at < settings.CACHE_METRICS_FLUSH_INTERVAL:
+                return
+            stats = self._stats
+            self._stats = dict.fromkeys(self.METRIC_FIELDS, 0)
+            self._flushed_at = now
+        self._flush(stats)
+
+    def incr_metric(self, name):
+        """
+        累加自訂計數（例如 SWRCache 的 stale_hits），與內建統計一起 flush
+
+        :param name: 計數名稱
+        """
+        self._record(name)
+
+    def _flush(self, stats):
+        """將 process 內累計的統計合併到 Redis"""
+        metrics_key = self.METRICS_KEY_PATTERN.format(namespace=self.namespace)
+        try:
+            pipeline = get_redis_connection(settings.RAW_CACHE_ALIAS).pipeline(
+                transaction=False
+            )
+            for field, amount in stats.items():
+                if not amount:
+                    continue
+                if isinstance(amount, float):
+                    pipeline.hincrbyfloat(metrics_key, field, amount)
+                else:
+                    pipeline.hincrby(metrics_key, field, amount)
+            pipeline.execute()
+        except (RedisError, NotImplementedError) as e:
+            logger.warning(f"Failed to flush cache metrics {self.namespace}: {e}")
+
+    def get_metrics(self):
+        """
+        取得所有 process 合併後的統計（尚未 flush 的部分不包含在內）
+
+        :return: dict，METRIC_FIELDS 加上 hit_rate、avg_get_ms、avg_set_ms、
+            avg_bytes_read、avg_bytes_written
+        """
+        metrics_key = self.METRICS_KEY_PATTERN.format(namespace=self.namespace)
+        try:
+            raw = get_redis_connection(settings.RAW_CACHE_ALIAS).hgetall(metrics_key)
+        except (RedisError, NotImplementedError) as e:
+            logger.warning(f"Failed to read cache metrics {self.namespace}: {e}")
+            raw = {}
+        metrics = dict.fromkeys(self.METRIC_FIELDS, 0)
+        for field, amount in raw.items():
+            field = field.decode() if isinstance(field, bytes) else field
+            metrics[field] = (
+                float(amount) if field.endswith('_seconds') else int(amount)
+            )
+
+        gets = metrics['hits'] + metrics['misses']
+        sets = metrics['sets']
+        metrics['hit_rate'] = round(metrics['hits'] / gets, 4) if gets else None
+        metrics['avg_get_ms'] = (
+            round(metrics['get_seconds'] / gets * 1000, 3) if gets else None
+        )
+        metrics['avg_set_ms'] = (
+            round(metrics['set_seconds'] / sets * 1000, 3) if sets else None
+        )
+        metrics['avg_bytes_read'] = (
+            round(metrics['bytes_read'] / metrics['hits']) if metrics['hits'] else None
+        )
+        metrics['avg_bytes_written'] = (
+            round(metrics['bytes_written'] / sets) if sets else None
+        )
+        return metrics
+
+    def reset_metrics(self):
+        metrics_key = self.METRICS_KEY_PATTERN.format(namespace=self.namespace)
+        with self._lock:
+            self._stats = dict.fromkeys(self.METRIC_FIELDS, 0)
+        try:
+            get_redis_connection(settings.RAW_CACHE_ALIAS).delete(metrics_key)
+        except (RedisError, NotImplementedError) as e:
+            logger.warning(f"Failed to reset cache metrics {self.namespace}: {e}")
+
+    @classmethod
+    def get_namespaces(cls):
+        """
+        :return: {namespace: NamespacedCache}，已 import 的所有 namespace
+        """
+        return dict(cls._registry)
+
+
+@dataclass
+class CacheEntry:
+    """
+    SWRCache 的值與剩餘秒數
+
+    loader 也可以回傳 CacheEntry 來為單筆值指定 soft_ttl / hard_ttl（例如 token 的剩餘效期）。
+    """
+
+    value: Any
+    soft_ttl: float | None = None
+    hard_ttl: float | None = None
+
+
+class SWRCache:
+    """
+    Stale-while-revalidate 的 read-through cache（建立在 NamespacedCache 上）
+
+    值以 [value, soft_expires_at, hard_expires_at, delta] 存放，delta 為上次計算耗時：
+    - soft TTL 內直接回傳；並以 XFetch（now - delta * beta * ln(rand) >= soft_expires_at）
+      讓少數 caller 提早重算，熱門 key 不會在同一瞬間一起過期
+    - soft TTL 過期、hard TTL 之前：取得重算鎖的 caller 重算，其餘 caller 先回傳舊值
+    - 完全沒有值：只有取得鎖的 caller 呼叫 loader，其餘等待結果（逾時後自行計算）
+    - loader 回傳 None 時以 negative_ttl 快取（None 表示不快取 None）
+    - 重算失敗且有舊值時回傳舊值
+    事件透過 metrics(name) 回報，預設累加到 NamespacedCache 的統計。
+    """
+
+    LOCK_KEY_PATTERN = 'lock:swr:{key}'
+    WAIT_INTERVAL = 0.05
+
+    def __init__(
+        self,
+        store,
+        soft_ttl,
+        hard_ttl=None,
+        negative_ttl=None,
+        beta=1.0,
+        lock_timeout=10,
+        wait_timeout=3,
+        metrics=None,
+    ):
+        """
+        :param store: NamespacedCache
+        :param soft_ttl: 值視為新鮮的秒數
+        :param hard_ttl: 值在 Redis 的存活秒數，None 表示不過期
+        :param negative_ttl: loader 回傳 None 時的快取秒數，None 表示不快取
+        :param beta: XFetch 提早重算的強度，0 表示不提早
+        :param lock_timeout: 重算鎖的存活秒數
+        :param wait_timeout: 沒有值時等待其他 caller 計算的最長秒數
+        :param metrics: callable(name)，預設為 store.incr_metric
+        """
+        self.store = store
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = hard_ttl
+        self.negative_ttl = negative_ttl
+        self.beta = beta
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.metrics = metrics or store.incr_metric
+
+    def get(self, key, loader):
+        """
+        :param key: cache key
+        :param loader: callable()，回傳值、None 或 CacheEntry
+        :return: 值（或 None）
+        """
+        return self.get_entry(key, loader).value
+
+    def get_entry(self, key, loader):
+        """
+        :return: CacheEntry，soft_ttl / hard_ttl 為剩餘秒數
+        """
+        cached = self._read(key)
+        if cached is None:
+            return self._load_missing(key, loader)
+
+        value, soft_expires_at, hard_expires_at, delta = cached
+        now = time.time()
+        entry = CacheEntry(
+            value,
+            soft_ttl=soft_expires_at - now,
+            hard_ttl=hard_expires_at - now if hard_expires_at else None,
+        )
+        if now < soft_expires_at and not self._should_refresh_early(
+            now, soft_expires_at, delta
+        ):
+            self.metrics('negative_hits' if value is None else 'fresh_hits')
+            return entry
+
+        token = self._acquire(key)
+        if token is None:
+            self.metrics('stale_hits')
+            return entry
+
+        self.metrics('stale_refreshes' if now >= soft_expires_at else 'early_refreshes')
+        try:
+            return self._compute(key, loader)
+        except Exception as e:
+            self.metrics('compute_errors')
+            logger.warning(f"Failed to refresh cache {key}, serving stale: {e}")
+            return entry
+        finally:
+            self._release(key, token)
+
+    def set(self, key, value, soft_ttl=None, hard_ttl=None, delta=0):
+        """
+        直接寫入（例如 token refresh 後 write-through）
+
+        :param soft_ttl: 預設為 self.soft_ttl
+        :param hard_ttl: 預設為 self.hard_ttl，<= 0 時刪除既有的值（同 cache.set timeout=0）
+        :param delta: 計算耗時（秒），供 XFetch 使用
+        :return: CacheEntry
+        """
+        hard_ttl = hard_ttl if hard_ttl is not None else self.hard_ttl
+        soft_ttl = soft_ttl if soft_ttl is not None else self.soft_ttl
+        if hard_ttl is not None:
+            if hard_ttl <= 0:
+                self.store.delete(key)
+                return CacheEntry(value, soft_ttl=0, hard_ttl=0)
+            soft_ttl = min(soft_ttl, hard_ttl)
+
+        now = time.time()
+        self.store.set(
+            key,
+            [
+                value,
+                now + soft_ttl,
+                now + hard_ttl if hard_ttl is not None else None,
+                round(delta, 4),
+            ],
+            timeout=math.ceil(hard_ttl) if hard_ttl is not None else None,
+        )
+        return CacheEntry(value, soft_ttl=soft_ttl, hard_ttl=hard_ttl)
+
+    def delete(self, key):
+        self.store.delete(key)
+
+    def peek(self, key):
+        """
+        只讀取目前存放的值，不呼叫 loader、不重算（不論是否已過 soft TTL）
+
+        :return: CacheEntry，沒有值時為 None
+        """
+        cached = self._read(key)
+        if cached is None:
+            return None
+        value, soft_expires_at, hard_expires_at, _ = cached
+        now = time.time()
+        return CacheEntry(
+            value,
+            soft_ttl=soft_expires_at - now,
+            hard_ttl=hard_expires_at - now if hard_expires_at else None,
+        )
+
+    def cached(self, key_func):
+        """
+        Decorator：以 key_func(*args, **kwargs) 為 key，函式本身為 loader
+
+        :param key_func: callable，參數與被裝飾的函式相同，回傳 cache key
+        """
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                return self.get(
+                    key_func(*args, **kwargs), lambda: func(*args, **kwargs)
+                )
+
+            return wrapper
+
+        return decorator
+
+    def _read(self, key):
+        cached = self.store.get(key)
+        if isinstance(cached, list) and len(cached) == 4:
+            return cached
+        return None  # 不存在，或是改用 SWRCache 前寫入的舊格式
+
+    def _should_refresh_early(self, now, soft_expires_at, delta):
+        if not self.beta or not delta:
+            return False
+        return now - delta * self.beta * math.log(random.random()) >= soft_expires_at
+
+    def _load_missing(self, key, loader):
+        token = self._acquire(key)
+        if token is not None:
+            self.metrics('recomputes')
+            try:
+                return self._compute(key, loader)
+            finally:
+                self._release(key, token)
+
+        self.metrics('lock_waits')
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.WAIT_INTERVAL)
+            cached = self._read(key)
+            if cached is not None:
+                self.metrics('collapsed')
+                value, soft_expires_at, hard_expires_at, _ = cached
+                now = time.time()
+                return CacheEntry(
+                    value,
+                    soft_ttl=soft_expires_at - now,
+                    hard_ttl=hard_expires_at - now if hard_expires_at else None,
+                )
+            if not self._is_locked(key):
+                break  # 持有鎖的 caller 計算失敗
+
+        # 等不到結果，自行計算（不阻擋 caller）
+        self.metrics('wait_timeouts')
+        return self._compute(key, loader)
+
+    def _compute(self, key, loader):
+        start = time.monotonic()
+        result = loader()
+        delta = time.monotonic() - start
+        entry = result if isinstance(result, CacheEntry) else CacheEntry(result)
+
+        if entry.value is None:
+            if self.negative_ttl is None:
+                return CacheEntry(None, soft_ttl=0, hard_ttl=0)
+            return self.set(
+                key,
+                None,
+                soft_ttl=self.negative_ttl,
+                hard_ttl=self.negative_ttl,
+                delta=delta,
+            )
+        return self.set(
+            key,
+            entry.value,
+            soft_ttl=entry.soft_ttl,
+            hard_ttl=entry.hard_ttl,
+            delta=delta,
+        )
+
+    def _compose_lock_key(self, key):
+        return self.LOCK_KEY_PATTERN.format(key=key)
+
+    def _acquire(self, key):
+        """
+        :return: 鎖的 token（釋放時比對），None 表示鎖已被其他 caller 持有
+        """
+        token = uuid.uuid4().hex
+        added = self.store.add(
+            self._compose_lock_key(key), token, timeout=self.lock_timeout
+        )
+        # Redis 無法連線時（IGNORE_EXCEPTIONS）回傳 None，視為取得鎖，直接計算
+        return token if added is not False else None
+
+    def _is_locked(self, key):
+        return self.store.backend.get(self._compose_lock_key(key)) is not None
+
+    def _release(self, key, token):
+        # 只刪除自己的 token，計算超過 lock_timeout 時不會刪掉其他 caller 取得的鎖
+        self.store.delete_if_equal(self._compose_lock_key(key), token)
@@ -0,0 +1,190 @@
+from django.db import connections, router
+
+DEFAULT_UPSERT_BATCH_SIZE = 1000
+
+
+def bulk_upsert(
+    model,
+    objs,
+    unique_fields,
+    update_fields=None,
+    batch_size=DEFAULT_UPSERT_BATCH_SIZE,
+    return_existing=False,
+):
+    """
+    PostgreSQL 批次 upsert：INSERT ... ON CONFLICT ... RETURNING
+
+    - update_fields 有值：ON CONFLICT DO UPDATE，只刷新指定欄位，新增與既有的 row 都會回傳
+    - update_fields 為空：ON CONFLICT DO NOTHING，只回傳實際新增的 row
+      （return_existing=True 時一併回傳既有的 row）
+
+    DO UPDATE 只在指定欄位（auto_now 的時間欄位除外）實際有變動時才寫入，
+    沒有變動的既有 row 不會產生 dead tuple，並在同一個 statement 內一併取回。
+
+    同一批次中 unique key 重複的物件只保留最後一筆
+    （ON CONFLICT DO UPDATE 不允許同一 statement 更新同一 row 兩次），
+    並依 unique key 排序後再分批，讓並行的 upsert 以相同順序鎖定 row，避免 deadlock。
+
+    :param model: Django model class
+    :param objs: 尚未存入 DB 的 model instance 列表
+    :param unique_fields: ON CONFLICT 使用的欄位名稱（須對應 unique constraint）
+    :param update_fields: 衝突時要以新值覆蓋的欄位名稱
+    :param batch_size: 每個 statement 的最大筆數
+    :param return_existing: DO NOTHING 時是否也回傳既有的 row
+    :return: List[(instance, inserted)]，instance 為 DB 回傳的完整資料，
+        inserted 表示該 row 是這次新增（False 代表既有 row 被更新）
+    """
+    if not objs:
+        return []
+
+    opts = model._meta
+    connection = connections[router.db_for_write(model)]
+    quote_name = connection.ops.quote_name
+
+    insert_fields = [field for field in opts.concrete_fields if not field.primary_key]
+    returning_fields = list(opts.concrete_fields)
+    unique_attnames = [opts.get_field(name).attname for name in unique_fields]
+
+    # 依 unique key 去重（保留最後一筆）並排序
+    deduped = {}
+    for obj in objs:
+        key = tuple(getattr(obj, attname) for attname in unique_attnames)
+        deduped[key] = obj
+    objs = [deduped[key] for key in sorted(deduped, key=_null_safe_sort_key)]
+
+    table_sql = quote_name(opts.db_table)
+    columns_sql = ', '.join(quote_name(field.column) for field in insert_fields)
+    row_sql = f"({', '.join(['%s'] * len(insert_fields))})"
+    conflict_sql = ', '.join(
+        quote_name(opts.get_field(name).column) for name in unique_fields
+    )
+    if update_fields:
+        update_columns = [opts.get_field(name).column for name in update_fields]
+        action_sql = 'DO UPDATE SET ' + ', '.join(
+            f"{quote_name(column)} = EXCLUDED.{quote_name(column)}"
+            for column in update_columns
+        )
+        compare_columns = [
+            opts.get_field(name).column
+            for name in update_fields
+            if not getattr(opts.get_field(name), 'auto_now', False)
+        ]
+        if compare_columns:
+            action_sql += (
+                ' WHERE ('
+                + ', '.join(
+                    f"{table_sql}.{quote_name(column)}" for column in compare_columns
+                )
+                + ') IS DISTINCT FROM ('
+                + ', '.join(
+                    f"EXCLUDED.{quote_name(column)}" for column in compare_columns
+                )
+                + ')'
+            )
+    else:
+        action_sql = 'DO NOTHING'
+    fetch_existing = bool(update_fields) or return_existing
+    returning_sql = ', '.join(quote_name(field.column) for field in returning_fields)
+    field_names = [field.attname for field in returning_fields]
+    converters = [
+        (index, field.get_db_converters(connection))
+        for index, field in enumerate(returning_fields)
+        if field.get_db_converters(connection)
+    ]
+    key_fields = [opts.get_field(name) for name in unique_fields]
+    key_columns = [quote_name(field.column) for field in key_fields]
+    key_row_sql = f"({', '.join(['%s'] * len(key_fields))})"
+
+    def key_of(obj):
+        return tuple(getattr(obj, attname) for attname in unique_attnames)
+
+    def key_in_sql(alias, keys):
+        """(key columns) IN (VALUES ...)：以一個 row-value 條件比對整批 key"""
+        columns_sql = ', '.join(f"{alias}.{column}" for column in key_columns)
+        params = [
+            field.get_db_prep_value(value, connection)
+            for key in keys
+            for field, value in zip(key_fields, key)
+        ]
+        return (
+            f"({columns_sql}) IN (VALUES {', '.join([key_row_sql] * len(keys))})",
+            params,
+        )
+
+    def to_instance(row):
+        values = list(row)
+        for index, field_converters in converters:
+            for converter in field_converters:
+                values[index] = converter(
+                    values[index], returning_fields[index], connection
+                )
+        return model.from_db(connection.alias, field_names, values)
+
+    results = []
+    with connection.cursor() as cursor:
+        for start in range(0, len(objs), batch_size):
+            batch = objs[start : start + batch_size]
+            params = [
+                field.get_db_prep_save(field.pre_save(obj, True), connection)
+                for obj in batch
+                for field in insert_fields
+            ]
+            sql = (
+                f"INSERT INTO {table_sql} ({columns_sql}) "
+                f"VALUES {', '.join([row_sql] * len(batch))} "
+                f"ON CONFLICT ({conflict_sql}) {action_sql} "
+                f"RETURNING {returning_sql}, (xmax = 0) AS inserted"
+            )
+            if fetch_existing:
+                # 同一個 statement 一併取回沒有寫入的既有 row（DO UPDATE 的 WHERE 不成立，
+                # 或 DO NOTHING）：外層 SELECT 讀的是 statement 開始時的 snapshot，
+                # 這次新增 / 更新的 row 已由 upserted 回傳，以 NOT EXISTS 排除
+                existing_sql, existing_params = key_in_sql(
+                    'existing', [key_of(obj) for obj in batch]
+                )
+                matches_sql = ' AND '.join(
+                    f"upserted.{column} = existing.{column}" for column in key_columns
+                )
+                existing_columns_sql = ', '.join(
+                    f"existing.{quote_name(field.column)}" for field in returning_fields
+                )
+                sql = (
+                    f"WITH upserted AS ({sql}) "
+                    f"SELECT * FROM upserted "
+                    f"UNION ALL "
+                    f"SELECT {existing_columns_sql}, false "
+                    f"FROM {table_sql} AS existing "
+                    f"WHERE {existing_sql} "
+                    f"AND NOT EXISTS (SELECT 1 FROM upserted WHERE {matches_sql})"
+                )
+                params += existing_params
+            cursor.execute(sql, params)
+
+            returned_keys = set()
+            for row in cursor.fetchall():
+                instance = to_instance(row[:-1])
+                results.append((instance, row[-1]))
+                returned_keys.add(key_of(instance))
+
+            if not fetch_existing:
+                continue
+
+            # statement 開始後才由其他 transaction commit 的 row 不在 snapshot 內，
+            # 只有並行寫入同一個 key 時才會發生，以一次 SELECT 補回
+            missing_keys = [
+                key_of(obj) for obj in batch if key_of(obj) not in returned_keys
+            ]
+            if missing_keys:
+                missing_sql, missing_params = key_in_sql('existing', missing_keys)
+                cursor.execute(
+                    f"SELECT {returning_sql} FROM {table_sql} AS existing "
+                    f"WHERE {missing_sql}",
+                    missing_params,
+                )
+                results.extend((to_instance(row), False) for row in cursor.fetchall())
+
+    return results
+
+
+def _null_safe_sort_key(key):
+    return tuple((value is None, value) for value in key)
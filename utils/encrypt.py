@@ -1,10 +1,25 @@
-from cryptography.fernet import Fernet
+from functools import lru_cache
+
+from cryptography.fernet import Fernet, MultiFernet
 from django.conf import settings
 
 
+def get_secret_keys():
+    """
+    目前使用的加密 key 列表（第一把用於加密，其餘只用於解密舊資料）
+    """
+    return tuple(settings.MEMBER_API_TOKEN_SECRET_KEYS) or (
+        settings.MEMBER_API_TOKEN_SECRET_KEY,
+    )
+
+
+@lru_cache(maxsize=8)
+def _build_fernet(keys):
+    return MultiFernet([Fernet(key) for key in keys])
+
+
 def get_fernet():
-    key = settings.MEMBER_API_TOKEN_SECRET_KEY
-    return Fernet(key)
+    return _build_fernet(get_secret_keys())
 
 
 def encrypt_value(value: str) -> str:
@@ -15,3 +30,9 @@ def encrypt_value(value: str) -> str:
 def decrypt_value(token: str) -> str:
     f = get_fernet()
     return f.decrypt(token.encode()).decode()
+
+
+def rotate_value(token: str) -> str:
+    """以目前第一把 key 重新加密（可由任一把 key 解密的）密文"""
+    f = get_fernet()
+    return f.rotate(token.encode()).decode()
@@ -0,0 +1,118 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models
+from django.db.models import Case, ExpressionWrapper, F, Value, When
+from django.db.models.functions import Least, Power
+from django.utils import timezone
+
+
+class EnrichmentStatusOptions(models.TextChoices):
+    PENDING = ('pending', 'Pending')
+    DONE = ('done', 'Done')
+    FAILED = ('failed', 'Failed')
+
+
+# 尚未完成補齊的狀態，partial index 與 sweep 都只看這些 row
+ENRICHMENT_OPEN_STATUSES = [
+    EnrichmentStatusOptions.PENDING,
+    EnrichmentStatusOptions.FAILED,
+]
+
+
+class EnrichmentQuerySet(models.QuerySet):
+    """
+    外部資料補齊（enrichment）的狀態查詢與更新
+
+    - due(): 到期需要處理的 row（走 enrichment_next_attempt_at 的 partial index）
+    - lease(): sweep 派送後先把 next_attempt_at 往後推，task 尚未完成前不會重複派送
+    - mark_enrichment_done() / mark_enrichment_failed(): task 完成後回寫結果，
+      失敗以指數退避延後下次嘗試，超過 ENRICHMENT_MAX_ATTEMPTS 次後不再嘗試
+    """
+
+    def due(self, now=None):
+        return self.filter(
+            enrichment_status__in=ENRICHMENT_OPEN_STATUSES,
+            enrichment_next_attempt_at__lte=now or timezone.now(),
+        )
+
+    def lease(self, now=None):
+        """
+        :return: 更新的筆數
+        """
+        now = now or timezone.now()
+        return self.update(
+            enrichment_next_attempt_at=now
+            + timedelta(seconds=settings.ENRICHMENT_LEASE_SECONDS)
+        )
+
+    def mark_enrichment_done(self):
+        return self.update(
+            enrichment_status=EnrichmentStatusOptions.DONE,
+            enrichment_next_attempt_at=None,
+        )
+
+    def mark_enrichment_failed(self, now=None):
+        """
+        attempts + 1，下次嘗試時間為 now + min(base * 2^attempts, max)，全部在一個 UPDATE 內計算
+
+        :return: 更新的筆數
+        """
+        now = now or timezone.now()
+        backoff_seconds = Least(
+            Value(float(settings.ENRICHMENT_RETRY_BASE_DELAY))
+            * Power(Value(2.0), F('enrichment_attempts')),
+            Value(float(settings.ENRICHMENT_RETRY_MAX_DELAY)),
+        )
+        next_attempt_at = ExpressionWrapper(
+            Value(now) + Value(timedelta(seconds=1)) * backoff_seconds,
+            output_field=models.DateTimeField(),
+        )
+        return self.update(
+            enrichment_status=EnrichmentStatusOptions.FAILED,
+            enrichment_attempts=F('enrichment_attempts') + 1,
+            enrichment_next_attempt_at=Case(
+                When(
+                    enrichment_attempts__gte=settings.ENRICHMENT_MAX_ATTEMPTS - 1,
+                    then=Value(None),
+                ),
+                default=next_attempt_at,
+                output_field=models.DateTimeField(),
+            ),
+        )
+
+
+class EnrichmentModel(models.Model):
+    """
+    需要向外部 API 補齊資料的 model
+
+    子類別需在 Meta.indexes 加上 enrichment_due_index() 回傳的 partial index。
+    """
+
+    EnrichmentStatusOptions = EnrichmentStatusOptions
+
+    enrichment_status = models.CharField(
+        max_length=10,
+        choices=EnrichmentStatusOptions.choices,
+        default=EnrichmentStatusOptions.PENDING,
+    )
+    enrichment_attempts = models.PositiveSmallIntegerField(default=0)
+    enrichment_next_attempt_at = models.DateTimeField(
+        null=True, blank=True, default=timezone.now
+    )
+
+    class Meta:
+        abstract = True
+
+
+def enrichment_due_index(name):
+    """
+    只包含尚未完成補齊的 row，已完成的大多數 row 不佔 index
+
+    :param name: index 名稱
+    """
+    return models.Index(
+        fields=['enrichment_next_attempt_at'],
+        name=name,
+        condition=models.Q(enrichment_status__in=ENRICHMENT_OPEN_STATUSES),
+    )
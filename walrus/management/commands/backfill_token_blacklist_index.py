@@ -0,0 +1,62 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django_redis import get_redis_connection
+
+from account.caches import TokenBlacklistCache
+
+
+class Command(BaseCommand):
+    help = (
+        'Add blacklisted JWT ids that only exist as per-jti keys to the '
+        'token blacklist ZSET, so the Bloom filter can be trusted right away'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        client = get_redis_connection(settings.DEFAULT_ALIAS)
+        prefix = TokenBlacklistCache.store.make_key(
+            TokenBlacklistCache.CACHE_KEY_PATTERN.format(token_jti='')
+        )
+
+        # 開始之後加入的 jti 已由 add_token_to_blacklist 寫入 ZSET
+        started_at = time.time()
+        count = 0
+        batch = []
+        for key in client.scan_iter(match=f"{prefix}*", count=batch_size):
+            batch.append(key.decode() if isinstance(key, bytes) else key)
+            if len(batch) >= batch_size:
+                count += self._index_batch(client, prefix, batch)
+                batch = []
+        if batch:
+            count += self._index_batch(client, prefix, batch)
+
+        TokenBlacklistCache.mark_index_ready(started_at)
+        self.stdout.write(f"🔐 Indexed {count} blacklisted tokens")
+        self.stdout.write(self.style.SUCCESS('🎉 Done.'))
+
+    def _index_batch(self, client, prefix, keys):
+        """
+        以 key 的剩餘 TTL 作為 ZSET score
+
+        :return: 寫入 ZSET 的筆數
+        """
+        pipeline = client.pipeline()
+        for key in keys:
+            pipeline.ttl(key)
+        ttls = pipeline.execute()
+
+        now = time.time()
+        entries = {
+            key[len(prefix) :]: now + ttl for key, ttl in zip(keys, ttls) if ttl > 0
+        }
+        if entries:
+            client.zadd(TokenBlacklistCache.INDEX_KEY, entries)
+            client.expire(
+                TokenBlacklistCache.INDEX_KEY, TokenBlacklistCache.CACHE_TIMEOUT
+            )
+        return len(entries)
@@ -0,0 +1,38 @@
+import importlib
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from utils.caches import NamespacedCache
+
+
+class Command(BaseCommand):
+    help = 'Show per-namespace hit/miss, size and latency of NamespacedCache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='顯示後清除已累計的統計')
+
+    def handle(self, *args, **options):
+        # 載入各 app 的 caches.py，註冊所有 namespace
+        for app_config in apps.get_app_configs():
+            try:
+                importlib.import_module(f"{app_config.name}.caches")
+            except ModuleNotFoundError:
+                continue  # app 沒有 caches.py 就跳過
+
+        for namespace, store in sorted(NamespacedCache.get_namespaces().items()):
+            metrics = store.get_metrics()
+            self.stdout.write(
+                f"📦 {namespace} ({store.serializer}/{store.compressor}): "
+                f"hits={metrics['hits']} misses={metrics['misses']} "
+                f"hit_rate={metrics['hit_rate']} sets={metrics['sets']} "
+                f"compressed={metrics['compressed']} "
+                f"avg_bytes_read={metrics['avg_bytes_read']} "
+                f"avg_bytes_written={metrics['avg_bytes_written']} "
+                f"avg_get_ms={metrics['avg_get_ms']} "
+                f"avg_set_ms={metrics['avg_set_ms']}"
+            )
+            if options['reset']:
+                store.reset_metrics()
+
+        self.stdout.write(self.style.SUCCESS('🎉 Done.'))
@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from provider.models import MemberAPIToken, ProviderProxyAccountAPIToken
+from utils.encrypt import rotate_value
+
+
+class Command(BaseCommand):
+    help = (
+        'Re-encrypt all API token rows with the first key of '
+        'MEMBER_API_TOKEN_SECRET_KEYS (key rotation)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='只檢查所有 token 是否能以目前的 key 解密，不寫入',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+
+        for model in (MemberAPIToken, ProviderProxyAccountAPIToken):
+            count = self._reencrypt_model(model, batch_size, dry_run)
+            self.stdout.write(
+                f"{'🔍 Checked' if dry_run else '🔐 Re-encrypted'} "
+                f"{count} {model.__name__} rows"
+            )
+
+        self.stdout.write(self.style.SUCCESS('🎉 Done.'))
+
+    def _reencrypt_model(self, model, batch_size, dry_run):
+        """
+        依 id 分批處理，每批在 transaction 內以 select_for_update 鎖定後重新讀取、
+        bulk_update 一次，避免覆蓋同時間 token refresh 寫入的新 token
+
+        :return: 處理的筆數
+        """
+        count = 0
+        last_id = 0
+        while True:
+            ids = list(
+                model.objects.filter(id__gt=last_id)
+                .order_by('id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                return count
+
+            count += self._reencrypt_batch(model, ids, dry_run)
+            last_id = ids[-1]
+
+    def _reencrypt_batch(self, model, ids, dry_run):
+        with transaction.atomic():
+            queryset = model.objects.filter(id__in=ids).only(
+                'id', '_access_token', '_refresh_token'
+            )
+            if not dry_run:
+                queryset = queryset.select_for_update()
+
+            batch = list(queryset)
+            for token in batch:
+                token._access_token = (
+                    rotate_value(token._access_token) if token._access_token else None
+                )
+                token._refresh_token = (
+                    rotate_value(token._refresh_token) if token._refresh_token else None
+                )
+
+            if not dry_run:
+                model.objects.bulk_update(batch, ['_access_token', '_refresh_token'])
+        return len(batch)
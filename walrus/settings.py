@@ -164,10 +164,33 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
 }
 
+# Stateless JWT 認證：信任 token claims（member_id），不再每個 request 查詢 Member / User，
+# 只以 process 內短 TTL 快取檢查 member 狀態（Member / User 變更時透過 Redis pub/sub 清除）
+JWT_STATELESS_AUTH = os.environ.get('JWT_STATELESS_AUTH', 'False') == 'True'
+JWT_MEMBER_STATUS_CACHE_SIZE = int(
+    os.environ.get('JWT_MEMBER_STATUS_CACHE_SIZE', 10000)
+)
+JWT_MEMBER_STATUS_CACHE_TIMEOUT = int(
+    os.environ.get('JWT_MEMBER_STATUS_CACHE_TIMEOUT', 30)
+)
+# JWT 黑名單的 process 內 Bloom filter（只有命中時才查詢 Redis）
+JWT_BLACKLIST_BLOOM_CAPACITY = int(
+    os.environ.get('JWT_BLACKLIST_BLOOM_CAPACITY', 100000)
+)
+JWT_BLACKLIST_BLOOM_ERROR_RATE = 0.001
+JWT_BLACKLIST_SYNC_INTERVAL = int(os.environ.get('JWT_BLACKLIST_SYNC_INTERVAL', 5))
+
 # should add in dove env
 MEMBER_API_TOKEN_SECRET_KEY = os.getenv(
     'MEMBER_API_TOKEN_SECRET_KEY', 'NjlsG_iWylZuptss7l5yihbmjYTkxtww98mcXmLcluQ='
 )
+# key rotation：以逗號分隔，第一把用於加密，其餘只用於解密
+# 設定後以 `python manage.py reencrypt_api_tokens` 將既有資料改用第一把 key 加密
+MEMBER_API_TOKEN_SECRET_KEYS = [
+    key.strip()
+    for key in os.getenv('MEMBER_API_TOKEN_SECRET_KEYS', '').split(',')
+    if key.strip()
+]
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -198,6 +221,7 @@ REDIS_CACHE_LOCATION = f'redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}'
 
 
 DEFAULT_ALIAS = 'default'
+RAW_CACHE_ALIAS = 'raw'
 
 CACHES = {
     DEFAULT_ALIAS: {
@@ -209,7 +233,23 @@ CACHES = {
             'IGNORE_EXCEPTIONS': True,
         },
     },
+    # 與 default 共用同一個 Redis 與 key 格式，值原樣存取，
+    # 序列化 / 壓縮由 utils.caches.NamespacedCache 依 namespace 決定
+    RAW_CACHE_ALIAS: {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': REDIS_CACHE_LOCATION,
+        'TIMEOUT': 259200,
+        'OPTIONS': {
+            'SERIALIZER': 'utils.caches.BytesSerializer',
+            'COMPRESSOR': 'django_redis.compressors.identity.IdentityCompressor',
+            'IGNORE_EXCEPTIONS': True,
+        },
+    },
 }
+# NamespacedCache 序列化後超過此 bytes 數才壓縮
+CACHE_COMPRESS_THRESHOLD = int(os.environ.get('CACHE_COMPRESS_THRESHOLD', 1024))
+# NamespacedCache 每個 process 將 hit / miss 等統計合併到 Redis 的間隔（秒）
+CACHE_METRICS_FLUSH_INTERVAL = int(os.environ.get('CACHE_METRICS_FLUSH_INTERVAL', 30))
 
 SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
 SESSION_CACHE_ALIAS = 'default'
@@ -229,6 +269,76 @@ CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 
 SPOTIFY_LISTENING_PROFILE_DAYS = 30
 
+# HistoryPlayLogContext (type, external_id) -> pk 的 process 內 LRU cache
+PLAYLOG_CONTEXT_CACHE_SIZE = int(os.environ.get('PLAYLOG_CONTEXT_CACHE_SIZE', 10000))
+PLAYLOG_CONTEXT_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Playlist context details 的並行請求數，以及 404（官方歌單）的 negative cache 秒數
+PLAYLIST_CONTEXT_FETCH_MAX_WORKERS = int(
+    os.environ.get('PLAYLIST_CONTEXT_FETCH_MAX_WORKERS', 8)
+)
+PLAYLIST_NOT_FOUND_CACHE_TIMEOUT = int(
+    os.environ.get('PLAYLIST_NOT_FOUND_CACHE_TIMEOUT', 60 * 60 * 24 * 7)
+)
+
+# Provider HTTP 連線池（每個 provider / base_url 一組 keep-alive 連線）
+PROVIDER_HTTP_POOL_CONNECTIONS = int(
+    os.environ.get('PROVIDER_HTTP_POOL_CONNECTIONS', 10)
+)
+PROVIDER_HTTP_POOL_MAXSIZE = int(os.environ.get('PROVIDER_HTTP_POOL_MAXSIZE', 10))
+
+# Provider API rate limit（每個 client_id 一個 Redis token bucket，可在 Provider.extra_details['rate_limit'] 覆寫）
+PROVIDER_RATE_LIMIT_CAPACITY = float(os.environ.get('PROVIDER_RATE_LIMIT_CAPACITY', 10))
+PROVIDER_RATE_LIMIT_REFILL_RATE = float(
+    os.environ.get('PROVIDER_RATE_LIMIT_REFILL_RATE', 3)
+)  # tokens per second
+PROVIDER_RATE_LIMIT_MAX_WAIT = float(os.environ.get('PROVIDER_RATE_LIMIT_MAX_WAIT', 30))
+PROVIDER_RATE_LIMIT_WEB_MAX_WAIT = float(
+    os.environ.get('PROVIDER_RATE_LIMIT_WEB_MAX_WAIT', 2)
+)  # 不在 Celery task 內（web request）時的最長等待秒數
+
+# 背景 token refresh：在 access token 到期前主動 refresh，請求路徑不必同步等待 refresh
+PROVIDER_TOKEN_REFRESH_AHEAD = int(
+    os.environ.get('PROVIDER_TOKEN_REFRESH_AHEAD', 60 * 15)
+)  # 剩餘秒數低於此值就 refresh（需大於排程間隔）
+PROVIDER_TOKEN_REFRESH_GRACE = int(
+    os.environ.get('PROVIDER_TOKEN_REFRESH_GRACE', 60 * 60 * 24)
+)  # 已過期超過此秒數的 token 不再背景 refresh，交由請求路徑的 reauth 流程處理
+PROVIDER_TOKEN_REFRESH_BATCH_SIZE = int(
+    os.environ.get('PROVIDER_TOKEN_REFRESH_BATCH_SIZE', 50)
+)
+PROVIDER_TOKEN_REFRESH_RATE = float(
+    os.environ.get('PROVIDER_TOKEN_REFRESH_RATE', 2)
+)  # 每個 provider 每秒最多 refresh 次數
+
+# Artist / playlist context 向 Spotify 補齊資料（enrichment）的重試策略
+ENRICHMENT_LEASE_SECONDS = int(
+    os.environ.get('ENRICHMENT_LEASE_SECONDS', 60 * 60)
+)  # sweep 派送後，task 沒回寫結果時多久後可再次派送
+ENRICHMENT_RETRY_BASE_DELAY = int(
+    os.environ.get('ENRICHMENT_RETRY_BASE_DELAY', 60 * 60)
+)  # 第 n 次失敗後等待 base * 2^(n-1) 秒
+ENRICHMENT_RETRY_MAX_DELAY = int(
+    os.environ.get('ENRICHMENT_RETRY_MAX_DELAY', 60 * 60 * 24 * 7)
+)
+ENRICHMENT_MAX_ATTEMPTS = int(
+    os.environ.get('ENRICHMENT_MAX_ATTEMPTS', 8)
+)  # 失敗達此次數後不再嘗試
+ARTIST_ENRICHMENT_FLUSH_DEADLINE = int(
+    os.environ.get('ARTIST_ENRICHMENT_FLUSH_DEADLINE', 120)
+)  # 新 artist 在緩衝區累積不滿 50 個時，最多等待的秒數
+
+# get_verified_access_token 驗證通過後，同一個 token 在這段時間內不再呼叫 provider 驗證
+PROVIDER_TOKEN_VERIFY_TTL = int(os.environ.get('PROVIDER_TOKEN_VERIFY_TTL', 60))
+
+# access token 的 process 內 L1 cache（在 Redis 之前），跨 process 失效透過 Redis pub/sub
+PROVIDER_TOKEN_LOCAL_CACHE_SIZE = int(
+    os.environ.get('PROVIDER_TOKEN_LOCAL_CACHE_SIZE', 1000)
+)
+PROVIDER_TOKEN_LOCAL_CACHE_TIMEOUT = int(
+    os.environ.get('PROVIDER_TOKEN_LOCAL_CACHE_TIMEOUT', 60)
+)
+
 CLIP_DURATION_MS = int(os.environ.get('CLIP_DURATION_MS', 45000))
 
 HERON_BASE_URL = os.environ.get('HERON_BASE_URL')